@@ -10,10 +10,9 @@ Created on Tue May 28 15:42:00 2024
 
 import numpy as np
 import pandas as pd
-from CommonTools import get_top_dir
+from CommonTools import get_top_dir, get_stage_key, run_cached_stage
+from MakeChargingLoadByZone import TOTAL_LABEL
 import matplotlib.pyplot as plt
-import glob
-import re
 
 zone_mapping = {
     "north": "NORTH",
@@ -26,6 +25,23 @@ zone_mapping = {
     "coast": "COAST",
 }
 
+# Years of ERCOT native load data to read in
+LOAD_DATA_YEARS = [2023, 2024]
+
+MONTHS_PER_YEAR = 12
+HOURS_PER_DAY = 24
+
+# Day types that the hourly load statistics are evaluated over
+DAY_TYPES = ["all", "weekday", "weekend"]
+
+# Percentiles of the hourly load included in the statistics cube
+CUBE_PERCENTILES = [5, 25, 50, 75, 95]
+
+# Statistics of the hourly load included in the statistics cube
+CUBE_STATISTICS = ["mean", "std", "min", "max"] + [
+    f"p{percentile:02d}" for percentile in CUBE_PERCENTILES
+]
+
 month_names = {
     1: "January",
     2: "February",
@@ -42,38 +58,300 @@ month_names = {
 }
 
 
+def parse_hour_ending(hour_ending):
+    """
+    Converts ERCOT 'Hour Ending' strings (e.g. '01/01/2023 24:00') into timestamps in one go, rolling '24:00' over to '00:00' of the next day
+
+    Parameters
+    ----------
+    hour_ending (pd.Series): 'Hour Ending' strings, in the format '%m/%d/%Y %H:%M'
+
+    Returns
+    -------
+    timestamps (pd.Series): Timestamp at the end of each hour
+    """
+    date_time_parts = hour_ending.str.split(" ", n=1, expand=True)
+    time_parts = date_time_parts[1].str.split(":", expand=True).astype(int)
+
+    # Adding the time to midnight of the date takes care of the '24:00' rollover
+    return pd.to_datetime(date_time_parts[0], format="%m/%d/%Y") + pd.to_timedelta(
+        time_parts[0] * 60 + time_parts[1], unit="min"
+    )
+
+
 def read_load_data(paths):
-    load_data = pd.DataFrame()
-    for path in paths:
-        data = pd.read_excel(path)
-        load_data = pd.concat([load_data, data], ignore_index=True)
+    """
+    Reads in the ERCOT hourly native load workbooks and converts them into a single typed time series
 
-    # Remove any 'Hour Ending' rows where time shifts to DST
-    load_data = load_data[~load_data["Hour Ending"].str.contains("DST")]
+    Parameters
+    ----------
+    paths (list of strings): Paths to the annual ERCOT native load workbooks
 
-    # Adjust 'Hour Ending' for '24:00'
-    load_data["Hour Ending"] = load_data["Hour Ending"].apply(correct_datetime)
+    Returns
+    -------
+    load_data (pd.DataFrame): Dataframe containing the hourly load in each weather zone (MW), with the end of each hour in the 'Hour Ending' column, sorted in time
+
+    NOTE: The repeated hour when clocks fall back (flagged with 'DST') is dropped, so the timestamps are unique local times.
+    """
+    load_data = pd.concat([pd.read_excel(path) for path in paths], ignore_index=True)
+
+    # Remove any 'Hour Ending' rows where time shifts to DST
+    hour_ending = load_data["Hour Ending"].astype(str).str.strip()
+    is_dst = hour_ending.str.contains("DST")
+    load_data = load_data[~is_dst]
 
     # Convert 'Hour Ending' to datetime
-    load_data["Hour Ending"] = pd.to_datetime(
-        load_data["Hour Ending"], format="%m/%d/%Y %H:%M"
+    load_data["Hour Ending"] = parse_hour_ending(hour_ending[~is_dst])
+
+    # Store the loads with a consistent numerical type
+    zone_columns = load_data.columns.drop("Hour Ending")
+    load_data[zone_columns] = load_data[zone_columns].astype(float)
+
+    return load_data.sort_values("Hour Ending", ignore_index=True)
+
+
+def get_load_data_paths(top_dir, years=LOAD_DATA_YEARS):
+    """
+    Gets the paths to the annual ERCOT native load workbooks
+
+    Parameters
+    ----------
+    top_dir (string): Path to top-level directory of the repository
+    years (list of ints): Years to get the workbooks for
+
+    Returns
+    -------
+    paths (list of strings): Path to the workbook for each year
+    """
+    return [
+        f"{top_dir}/data/Native_Load_{year}/Native_Load_{year}.xlsx" for year in years
+    ]
+
+
+def get_load_data(top_dir, paths, cache_dir=None):
+    """
+    Gets the ERCOT hourly load data, only reading in the workbooks if they changed since they were last read in
+
+    Parameters
+    ----------
+    top_dir (string): Path to top-level directory of the repository
+    paths (list of strings): Paths to the annual ERCOT native load workbooks
+    cache_dir (string): Directory to cache the load data in. Defaults to data/cache.
+
+    Returns
+    -------
+    load_data (pd.DataFrame): Dataframe containing the hourly load in each weather zone (MW), with the end of each hour in the 'Hour Ending' column, sorted in time
+    """
+    if cache_dir is None:
+        cache_dir = f"{top_dir}/data/cache"
+
+    stage_key = get_stage_key(
+        input_paths=paths, functions=[parse_hour_ending, read_load_data]
+    )
+    return run_cached_stage(
+        "ercot_native_load",
+        stage_key,
+        lambda: read_load_data(paths),
+        cache_dir,
+        geo=False,
+    )
+
+
+def make_load_stats_cube(load_data_df):
+    """
+    Evaluates statistics of the hourly load in each zone for every month, hour of the day and day type, in a single grouped pass over the load data
+
+    Parameters
+    ----------
+    load_data_df (pd.DataFrame): Dataframe containing the hourly load in each weather zone (MW), with the end of each hour in the 'Hour Ending' column
+
+    Returns
+    -------
+    cube (dict): Dictionary containing:
+        - stats (np.array): Array of shape (number of zones, 12 months, 24 hours, number of day types, number of statistics) containing each statistic of the load (NaN where there's no data)
+        - zones (np.array): Name of each zone (e.g. 'COAST')
+        - day_types (np.array): Name of each day type (DAY_TYPES)
+        - statistics (np.array): Name of each statistic (CUBE_STATISTICS)
+
+    NOTE: The month and hour are those of the 'Hour Ending' timestamp, so the hour ending at midnight falls in hour 0 of the next day.
+    """
+    zones = load_data_df.columns.drop("Hour Ending")
+    hour_ending = load_data_df["Hour Ending"]
+    n_rows = len(load_data_df)
+
+    # Include every row twice: once for all days, and once for its own day type (weekday or weekend)
+    day_type_indices = np.where(
+        hour_ending.dt.dayofweek.to_numpy() >= 5,
+        DAY_TYPES.index("weekend"),
+        DAY_TYPES.index("weekday"),
+    )
+    group_keys = [
+        np.tile(hour_ending.dt.month.to_numpy(), 2),
+        np.tile(hour_ending.dt.hour.to_numpy(), 2),
+        np.concatenate(
+            [np.full(n_rows, DAY_TYPES.index("all")), day_type_indices]
+        ),
+    ]
+    grouped = pd.DataFrame(
+        np.tile(load_data_df[zones].to_numpy(dtype=float), (2, 1)), columns=zones
+    ).groupby(group_keys)
+
+    results = [grouped.mean(), grouped.std(), grouped.min(), grouped.max()] + [
+        grouped.quantile(percentile / 100.0) for percentile in CUBE_PERCENTILES
+    ]
+
+    # Arrange the statistics into the cube, including any (month, hour, day type) without data
+    full_index = pd.MultiIndex.from_product(
+        [range(1, MONTHS_PER_YEAR + 1), range(HOURS_PER_DAY), range(len(DAY_TYPES))]
+    )
+    stats = np.stack(
+        [result.reindex(full_index).to_numpy() for result in results], axis=-1
+    )
+    stats = stats.reshape(
+        MONTHS_PER_YEAR, HOURS_PER_DAY, len(DAY_TYPES), len(zones), len(results)
+    ).transpose(3, 0, 1, 2, 4)
+
+    return {
+        "stats": stats,
+        "zones": np.asarray(zones, dtype=str),
+        "day_types": np.asarray(DAY_TYPES),
+        "statistics": np.asarray(CUBE_STATISTICS),
+    }
+
+
+def save_load_stats_cube(cube, save_path):
+    """
+    Saves a load statistics cube to a compressed .npz file
+
+    Parameters
+    ----------
+    cube (dict): Load statistics cube, as produced by make_load_stats_cube()
+    save_path (string): Path to the .npz file to save the cube to
+
+    Returns
+    -------
+    None
+    """
+    np.savez_compressed(save_path, **cube)
+
+
+def read_load_stats_cube(cube_path):
+    """
+    Reads in a load statistics cube saved by save_load_stats_cube()
+
+    Parameters
+    ----------
+    cube_path (string): Path to the .npz file containing the cube
+
+    Returns
+    -------
+    cube (dict): Load statistics cube, as produced by make_load_stats_cube()
+    """
+    with np.load(cube_path) as cube_file:
+        return {key: cube_file[key] for key in cube_file.files}
+
+
+def get_load_stats(cube, zone, statistic, day_type="all"):
+    """
+    Gets one statistic of the hourly load in a zone from the cube
+
+    Parameters
+    ----------
+    cube (dict): Load statistics cube, as produced by make_load_stats_cube()
+    zone (string): Name of the zone in the cube (e.g. 'COAST')
+    statistic (string): Name of the statistic (one of CUBE_STATISTICS)
+    day_type (string): Name of the day type (one of DAY_TYPES)
+
+    Returns
+    -------
+    zone_stats (np.array): Array of shape (12 months, 24 hours) containing the statistic for each month and hour of the day
+    """
+    zone_index = list(cube["zones"]).index(zone)
+    day_type_index = list(cube["day_types"]).index(day_type)
+    statistic_index = list(cube["statistics"]).index(statistic)
+
+    return cube["stats"][zone_index, :, :, day_type_index, statistic_index]
+
+
+def get_excess_capacity_df(cube, zone, month, day_type="all"):
+    """
+    Evaluates the excess capacity in a zone over each hour of the day for the given month, relative to the maximum load over the month and over the full period
+
+    Parameters
+    ----------
+    cube (dict): Load statistics cube, as produced by make_load_stats_cube()
+    zone (string): Name of the zone in the cube (e.g. 'COAST')
+    month (int): Month of the year (1-12)
+    day_type (string): Name of the day type (one of DAY_TYPES) to evaluate the hourly load statistics over
+
+    Returns
+    -------
+    excess_capacity_df (pd.DataFrame): Dataframe containing the maximum load over the month, and the mean (+/-std), max and min excess relative to the maximum load over the month and over the full period, for each hour of the day
+
+    NOTE: The maximum loads are always taken over all days, regardless of the day type.
+    """
+    mean = get_load_stats(cube, zone, "mean", day_type)[month - 1]
+    std = get_load_stats(cube, zone, "std", day_type)[month - 1]
+    min_load = get_load_stats(cube, zone, "min", day_type)[month - 1]
+    max_hourly_load = get_load_stats(cube, zone, "max", day_type)[month - 1]
+
+    ##### Get the absolute maximum power demand over the full period (approximation of nameplate capacity) #####
+    all_max_load = get_load_stats(cube, zone, "max")
+    max_load = np.nanmax(all_max_load)
+    month_max_load = np.nanmax(all_max_load[month - 1])
+
+    return pd.DataFrame(
+        {
+            "Hour": np.arange(HOURS_PER_DAY),
+            "Max Load (MW)": month_max_load,
+            # Calculate the mean (+/-std), max and min excess based on the maximum load over the month
+            "Mean Excess (Month) (MW)": month_max_load - mean,
+            "Mean Excess (Month) + std (MW)": month_max_load - mean + std,
+            "Mean Excess (Month) - std (MW)": month_max_load - mean - std,
+            "Max Excess (Month) (MW)": month_max_load - min_load,
+            "Min Excess (Month) (MW)": month_max_load - max_hourly_load,
+            # Calculate the mean (+/-std), max and min excess based on the maximum load over the year
+            "Mean Excess (Year) (MW)": max_load - mean,
+            "Mean Excess (Year) + std (MW)": max_load - mean + std,
+            "Mean Excess (Year) - std (MW)": max_load - mean - std,
+            "Max Excess (Year) (MW)": max_load - min_load,
+            "Min Excess (Year) (MW)": max_load - max_hourly_load,
+        }
     )
 
-    return load_data
 
+def read_daily_ev_demands(top_dir, profile="extreme"):
+    """
+    Reads in the daily EV load for each ERCOT weather zone produced by MakeChargingLoadByZone.py
 
-def correct_datetime(time_str):
-    # Check if time is '24:00' and adjust to '00:00' of the next day
-    if time_str.endswith("24:00"):
-        # Parse the date part and increment the day
-        new_time_str = pd.to_datetime(time_str[:-5]).date() + pd.Timedelta(days=1)
-        return new_time_str.strftime("%m/%d/%Y") + " 00:00"
-    return time_str
+    Parameters
+    ----------
+    top_dir (string): Path to top-level directory of the repository
+    profile (string): Name of the daily load profile to read in
 
+    Returns
+    -------
+    daily_ev_demands_dict (dict of pd.DataFrames): Dataframe for each zone, with the hours in the 'Hours' column, the load from each charging site (MW) in a column named after the site, and the total over all sites in the 'Total (MW)' column
+    """
+    daily_ev_load_df = pd.read_csv(f"{top_dir}/data/daily_ev_load_by_zone.csv")
+    daily_ev_load_df = daily_ev_load_df[daily_ev_load_df["Profile"] == profile]
 
-def make_daily_ev_demands_fig(top_dir, filename, zone, include_all_centers=True):
-    daily_ev_demands = pd.read_csv(filename)
-    
+    daily_ev_demands_dict = {}
+    for zone, zone_df in daily_ev_load_df.groupby("zone", sort=False):
+        daily_ev_demands = zone_df.pivot(
+            index="Hours", columns="Nearest Center", values="Power (MW)"
+        )
+        centers = list(zone_df["Nearest Center"].unique())
+        centers.remove(TOTAL_LABEL)
+        daily_ev_demands = daily_ev_demands[centers + [TOTAL_LABEL]].reset_index()
+        daily_ev_demands_dict[zone] = daily_ev_demands.rename(
+            columns={TOTAL_LABEL: "Total (MW)"}
+        )[centers + ["Hours", "Total (MW)"]]
+
+    return daily_ev_demands_dict
+
+
+def make_daily_ev_demands_fig(top_dir, daily_ev_demands, zone, include_all_centers=True):
     fig, ax = plt.subplots(figsize=(12, 8))
     ax.set_xlabel('Hours', fontsize=24)
     ax.set_ylabel('Power (MW)', fontsize=24)
@@ -123,22 +401,17 @@ def make_daily_ev_demands_fig(top_dir, filename, zone, include_all_centers=True)
 
 
 def plot_with_historical_daily_load(top_dir, load_data_df, include_all_centers=True):
-    pattern = re.compile(r"daily_ev_load_([^\.]+).csv")
-    for filename in glob.glob(f"{top_dir}/data/daily_ev_load_*.csv"):
-        match = pattern.search(filename)
-        if match:
-            zone = match.group(1)
+    # Extract the date for filtering (without modifying the shared load data)
+    dates = load_data_df["Hour Ending"].dt.date
 
-        fig, ax = make_daily_ev_demands_fig(top_dir, filename, zone, include_all_centers)
+    # Get unique dates that are the first of the month
+    first_days = dates[
+        (load_data_df["Hour Ending"].dt.day == 1)
+        & (load_data_df["Hour Ending"].dt.year == 2023)
+    ].unique()
 
-        # Extract the date for filtering
-        load_data_df["Date"] = load_data_df["Hour Ending"].dt.date
-
-        # Get unique dates that are the first of the month
-        first_days = load_data_df[
-            (load_data_df["Hour Ending"].dt.day == 1)
-            & (load_data_df["Hour Ending"].dt.year == 2023)
-        ]["Date"].unique()
+    for zone, daily_ev_demands in read_daily_ev_demands(top_dir).items():
+        fig, ax = make_daily_ev_demands_fig(top_dir, daily_ev_demands, zone, include_all_centers)
 
         # Filter data for each first of the month
         cmap = plt.get_cmap("winter")
@@ -147,7 +420,7 @@ def plot_with_historical_daily_load(top_dir, load_data_df, include_all_centers=T
         i_month = 0
         for date in first_days:
             # Filter data for the specific day
-            daily_data = load_data_df[load_data_df["Date"] == date]
+            daily_data = load_data_df[dates == date]
             if i_month == 0 or i_month == 11:
                 ax.plot(
                     daily_data["Hour Ending"].dt.hour,
@@ -175,87 +448,14 @@ def plot_with_historical_daily_load(top_dir, load_data_df, include_all_centers=T
         else:
             plt.savefig(f'{top_dir}/plots/daily_ev_load_{zone}.png')
 
-def plot_with_excess_capacity(top_dir, load_data_df, include_all_centers=True):
-    pattern = re.compile(r"daily_ev_load_([^\.]+).csv")
-    for filename in glob.glob(f"{top_dir}/data/daily_ev_load_*.csv"):
-        match = pattern.search(filename)
-        if match:
-            zone = match.group(1)
-
-        # Extract the date for filtering
-        load_data_df["Date"] = pd.to_datetime(load_data_df["Hour Ending"].dt.date)
-
-        # Drop zones we're not interested in
-        load_data_zone_df = load_data_df[["Hour Ending", "Date", zone_mapping[zone]]]
-
-        ##### Get the absolute maximum power demand over the full period (approximation of nameplate capacity) #####
-        max_load = load_data_zone_df[zone_mapping[zone]].max()
-
-        # Extract the hour and month components
-        load_data_zone_df["Hour"] = load_data_zone_df["Hour Ending"].dt.hour
-        load_data_zone_df["Month"] = load_data_zone_df["Date"].dt.month
-
+def plot_with_excess_capacity(top_dir, cube, include_all_centers=True):
+    for zone, daily_ev_demands in read_daily_ev_demands(top_dir).items():
         for month in range(1, 13):
-            # Group by the 'Hour' column
-            grouped = load_data_zone_df[load_data_zone_df["Month"] == month].groupby(
-                "Hour"
-            )
-
-            # Aggregate the data to get mean, max, min, and std dev
-            aggregated_data_df = grouped[zone_mapping[zone]].agg(
-                ["mean", "max", "min", "std"]
-            )
-
-            # Calculate the mean (+/-std), max and min excess based on the maximum load over the month
-            aggregated_data_df["Max Load (MW)"] = load_data_zone_df[
-                load_data_zone_df["Month"] == month
-            ][zone_mapping[zone]].max()
-            aggregated_data_df["Mean Excess (Month) (MW)"] = (
-                aggregated_data_df["Max Load (MW)"] - aggregated_data_df["mean"]
-            )
-            aggregated_data_df["Mean Excess (Month) + std (MW)"] = (
-                aggregated_data_df["Max Load (MW)"]
-                - aggregated_data_df["mean"]
-                + aggregated_data_df["std"]
-            )
-            aggregated_data_df["Mean Excess (Month) - std (MW)"] = (
-                aggregated_data_df["Max Load (MW)"]
-                - aggregated_data_df["mean"]
-                - aggregated_data_df["std"]
-            )
-            aggregated_data_df["Max Excess (Month) (MW)"] = (
-                aggregated_data_df["Max Load (MW)"] - aggregated_data_df["min"]
-            )
-            aggregated_data_df["Min Excess (Month) (MW)"] = (
-                aggregated_data_df["Max Load (MW)"] - aggregated_data_df["max"]
-            )
-
-            # Calculate the mean (+/-std), max and min excess based on the maximum load over the year
-            aggregated_data_df["Mean Excess (Year) (MW)"] = (
-                max_load - aggregated_data_df["mean"]
-            )
-            aggregated_data_df["Mean Excess (Year) + std (MW)"] = (
-                max_load - aggregated_data_df["mean"] + aggregated_data_df["std"]
-            )
-            aggregated_data_df["Mean Excess (Year) - std (MW)"] = (
-                max_load - aggregated_data_df["mean"] - aggregated_data_df["std"]
-            )
-            aggregated_data_df["Max Excess (Year) (MW)"] = (
-                max_load - aggregated_data_df["min"]
-            )
-            aggregated_data_df["Min Excess (Year) (MW)"] = (
-                max_load - aggregated_data_df["max"]
-            )
-
-            # Reset the index to make 'Hour' a regular column
-            aggregated_data_df.reset_index(inplace=True)
-
-            aggregated_data_df = aggregated_data_df.drop(
-                ["mean", "max", "min", "std"], axis=1
-            )
+            # Get the mean (+/-std), max and min excess based on the maximum load over the month and over the year
+            aggregated_data_df = get_excess_capacity_df(cube, zone_mapping[zone], month)
 
             # Plot excess relative to monthly max, along with the EV demand curves
-            fig, ax = make_daily_ev_demands_fig(top_dir, filename, zone, include_all_centers)
+            fig, ax = make_daily_ev_demands_fig(top_dir, daily_ev_demands, zone, include_all_centers)
 
             ax.axhline(
                 aggregated_data_df["Max Load (MW)"].iloc[0],
@@ -312,7 +512,7 @@ def plot_with_excess_capacity(top_dir, load_data_df, include_all_centers=True):
             plt.close()
 
             # Plot excess relative to yearly max, along with the EV demand curves
-            fig, ax = make_daily_ev_demands_fig(top_dir, filename, zone, include_all_centers)
+            fig, ax = make_daily_ev_demands_fig(top_dir, daily_ev_demands, zone, include_all_centers)
 
 #            ax.axhline(
 #                max_load,
@@ -365,87 +565,19 @@ def plot_with_excess_capacity(top_dir, load_data_df, include_all_centers=True):
             plt.close()
 
 
-def plot_coast_load(top_dir, load_data_df):
+def plot_coast_load(top_dir, cube):
     aggregated_data_dicts = {}
     for zone in zone_mapping:
-        # Extract the date for filtering
-        load_data_df["Date"] = pd.to_datetime(load_data_df["Hour Ending"].dt.date)
-
-        # Drop zones we're not interested in
-        load_data_zone_df = load_data_df[["Hour Ending", "Date", zone_mapping[zone]]]
-
-        ##### Get the absolute maximum power demand over the full period (approximation of nameplate capacity) #####
-        max_load = load_data_zone_df[zone_mapping[zone]].max()
-
-        # Extract the hour and month components
-        load_data_zone_df = load_data_zone_df.copy()
-        load_data_zone_df.loc[:, "Hour"] = load_data_zone_df.loc[
-            :, "Hour Ending"
-        ].dt.hour
-        load_data_zone_df = load_data_zone_df.copy()
-        load_data_zone_df.loc[:, "Month"] = load_data_zone_df.loc[:, "Date"].dt.month
-
         aggregated_data_dicts[zone] = {}
-
         for month in range(1, 13):
-            # Group by the 'Hour' column
-            grouped = load_data_zone_df[load_data_zone_df["Month"] == month].groupby(
-                "Hour"
-            )
-
-            # Aggregate the data to get mean, max, min, and std dev
-            aggregated_data_df = grouped[zone_mapping[zone]].agg(
-                ["mean", "max", "min", "std"]
-            )
-            aggregated_data_dicts[zone][month] = aggregated_data_df
-
-            # Calculate the mean (+/-std), max and min excess based on the maximum load over the month
-            aggregated_data_df["Max Load (MW)"] = load_data_zone_df[
-                load_data_zone_df["Month"] == month
-            ][zone_mapping[zone]].max()
-            aggregated_data_df["Mean Excess (Month) (MW)"] = (
-                aggregated_data_df["Max Load (MW)"] - aggregated_data_df["mean"]
-            )
-            aggregated_data_df["Mean Excess (Month) + std (MW)"] = (
-                aggregated_data_df["Max Load (MW)"]
-                - aggregated_data_df["mean"]
-                + aggregated_data_df["std"]
-            )
-            aggregated_data_df["Mean Excess (Month) - std (MW)"] = (
-                aggregated_data_df["Max Load (MW)"]
-                - aggregated_data_df["mean"]
-                - aggregated_data_df["std"]
-            )
-            aggregated_data_df["Max Excess (Month) (MW)"] = (
-                aggregated_data_df["Max Load (MW)"] - aggregated_data_df["min"]
+            # Get the mean (+/-std), max and min excess based on the maximum load over the month and over the year
+            aggregated_data_dicts[zone][month] = get_excess_capacity_df(
+                cube, zone_mapping[zone], month
             )
-            aggregated_data_df["Min Excess (Month) (MW)"] = (
-                aggregated_data_df["Max Load (MW)"] - aggregated_data_df["max"]
-            )
-
-            # Calculate the mean (+/-std), max and min excess based on the maximum load over the year
-            aggregated_data_df["Mean Excess (Year) (MW)"] = (
-                max_load - aggregated_data_df["mean"]
-            )
-            aggregated_data_df["Mean Excess (Year) + std (MW)"] = (
-                max_load - aggregated_data_df["mean"] + aggregated_data_df["std"]
-            )
-            aggregated_data_df["Mean Excess (Year) - std (MW)"] = (
-                max_load - aggregated_data_df["mean"] - aggregated_data_df["std"]
-            )
-            aggregated_data_df["Max Excess (Year) (MW)"] = (
-                max_load - aggregated_data_df["min"]
-            )
-            aggregated_data_df["Min Excess (Year) (MW)"] = (
-                max_load - aggregated_data_df["max"]
-            )
-
-            # Reset the index to make 'Hour' a regular column
-            aggregated_data_df.reset_index(inplace=True)
 
-            aggregated_data_df = aggregated_data_df.drop(
-                ["mean", "max", "min", "std"], axis=1
-            )
+    ##### Get the absolute maximum power demand over the full period in the coast zone (approximation of nameplate capacity) #####
+    zone = "coast"
+    max_load = np.nanmax(get_load_stats(cube, zone_mapping[zone], "max"))
 
     for month in range(1, 13):
         # Plot excess in coast zone relative to monthly max, overlaid with the other zones for comparison
@@ -593,17 +725,18 @@ def main():
     # Get the path to the top level of the Git repo
     top_dir = get_top_dir()
 
-    load_data_paths = [
-        f"{top_dir}/data/Native_Load_2023/Native_Load_2023.xlsx",
-        f"{top_dir}/data/Native_Load_2024/Native_Load_2024.xlsx",
-    ]
-    load_data_df = read_load_data(load_data_paths)
+    load_data_df = get_load_data(top_dir, get_load_data_paths(top_dir))
+
+    # Evaluate the load statistics for every zone, month, hour and day type in one go, and save them for reuse
+    cube = make_load_stats_cube(load_data_df)
+    save_load_stats_cube(cube, f"{top_dir}/data/ercot_load_stats_cube.npz")
         
     plot_with_historical_daily_load(top_dir, load_data_df)
     plot_with_historical_daily_load(top_dir, load_data_df, include_all_centers=False)
 
-    plot_with_excess_capacity(top_dir, load_data_df)
-    plot_with_excess_capacity(top_dir, load_data_df, include_all_centers=False)
-    #plot_coast_load(top_dir, load_data_df)
+    plot_with_excess_capacity(top_dir, cube)
+    plot_with_excess_capacity(top_dir, cube, include_all_centers=False)
+    #plot_coast_load(top_dir, cube)
 
-main()
+if __name__ == "__main__":
+    main()
@@ -5,23 +5,37 @@ Associated publication: MacDonell, D. and Borrero, M. (2024) - https://dspace.mi
 """
 
 import geopandas as gpd
-from shapely.ops import nearest_points
-from CommonTools import get_top_dir, saveShapefile
-from geopy.distance import great_circle
+import shapely
+from CommonTools import (
+    get_top_dir,
+    saveShapefile,
+    get_stage_key,
+    run_cached_stage,
+)
+from ChargingQueueTools import (
+    HOURS_PER_DAY,
+    QUEUE_MODELS,
+    set_queue_wait_table_path,
+    p_x_trucks_at_stop_vectorized,
+    average_wait_time_vectorized,
+    solve_min_chargers_erlang,
+)
 import concurrent.futures
-import scipy.special
-from scipy.integrate import quad
+import scipy.sparse
+from scipy.spatial import cKDTree
+import pandas as pd
 import numpy as np
-from scipy.stats import norm
 from functools import lru_cache
 import argparse
-import os
 
+EARTH_RADIUS_MILES = 3958.8
+DEFAULT_RADII_MILES = [100.0, 200.0, 300.0, 400.0]
+
+# Number of standard deviations above the average number of trucks charging at once used to bracket the minimum number of chargers
+BRACKET_N_SIGMA = 6.0
 
-# Define the process_truck_stop_wrapper function outside of other functions
-def process_truck_stop_wrapper(row, highways_gdf, attribute_name, distance_threshold):
-    idx, truck_stop = row
-    process_truck_stop(truck_stop, highways_gdf, attribute_name, distance_threshold)
+# Memo of minimum chargers already solved for, keyed by (charges per day, charging time, max wait time, queue model)
+_min_chargers_memo = {}
 
 
 def filter_points_by_distance(points_gdf, highways_gdf, distance_threshold):
@@ -32,291 +46,331 @@ def filter_points_by_distance(points_gdf, highways_gdf, distance_threshold):
     ----------
     points_gdf (gpd.DataFrame): Geopandas dataframe containing the points of interest
     highways_gdf (gpd.DataFrame): Geopandas dataframe containing the highways
-    distance_threshold (float): Maximum distance (in meters) that a point can be from a highway, beyond which it gets removed
+    distance_threshold (float): Maximum distance (in units of the coordinate reference system, i.e. meters for EPSG:3857) that a point can be from a highway, beyond which it gets removed
 
     Returns
     -------
     filtered_points_gdf (gpd.DataFrame): Points of interest, with points more than the distance threshold from a highway removed
 
-    NOTE: None
+    NOTE: The 'dwithin' spatial predicate requires shapely>=2.0 built against GEOS>=3.10.
     """
-    # Buffer the highways by the given threshold to create a buffer around them
-    buffered_highways = highways_gdf.buffer(distance_threshold)
-
-    # Create a GeoDataFrame of the buffered highways
-    buffered_highways_gdf = gpd.GeoDataFrame(
-        geometry=buffered_highways, crs=highways_gdf.crs
+    # Bulk query a spatial index of the highways for all pairs of points and highways lying within the distance threshold of each other
+    highways_tree = shapely.STRtree(highways_gdf.geometry.values)
+    point_indices, _ = highways_tree.query(
+        points_gdf.geometry.values, predicate="dwithin", distance=distance_threshold
     )
 
-    # Iterate over each point
-    filtered_points = []
-    for idx, point in points_gdf.iterrows():
-        # Check if the truck stop is within 100 meters of any buffered highway
-        if buffered_highways_gdf.intersects(point["geometry"]).any():
-            filtered_points.append(point)
-
-    # Create a GeoDataFrame from the filtered truck stops
-    filtered_points_gdf = gpd.GeoDataFrame(filtered_points, crs=points_gdf.crs)
+    # Keep each point that lies within the distance threshold of at least one highway
+    within_threshold = np.zeros(len(points_gdf), dtype=bool)
+    within_threshold[point_indices] = True
+    filtered_points_gdf = points_gdf[within_threshold]
 
     return filtered_points_gdf
 
 
-def select_truck_stops(gdf, min_distance=80500, target_avg_distance=160934):
-    """
-    Randomly select truck stops from the geodataframe.
-    Parameters:
-        - gdf: input geodataframe
-        - min_distance: minimum distance between truck stops in meters (default is 50 miles)
-        - target_avg_distance: target average distance between truck stops in meters (default is 100 miles)
-    Returns:
-        - selected_gdf: geodataframe of selected truck stops
+def get_truck_stop_neighbors(gdf, min_distance):
     """
+    Finds all pairs of truck stops lying closer together than the given minimum distance, using a KD-tree of the truck stop coordinates.
 
-    # Start with an empty list to store selected stops
-    selected_stops = []
-
-    # Randomly shuffle the geodataframe
-    gdf = gdf.sample(frac=1).reset_index(drop=True)
-
-    for i, row in gdf.iterrows():
-        if not selected_stops:
-            # Select the first point randomly
-            selected_stops.append(row)
-            continue
-
-        # Calculate distances from the current point to all selected points
-        distances = np.array(
-            [row["geometry"].distance(stop["geometry"]) for stop in selected_stops]
-        )
+    Parameters
+    ----------
+    gdf (gpd.DataFrame): Geopandas dataframe containing the truck stops, in a projected coordinate reference system
+    min_distance (float): Minimum allowed distance between truck stops (in units of the coordinate reference system)
 
-        # Check if the current point satisfies the minimum distance condition
-        if np.all(distances >= min_distance):
-            # Calculate what the new average distance would be if this point is added
-            new_avg_distance = np.mean(distances)
+    Returns
+    -------
+    neighbors (scipy.sparse.csr_matrix): Symmetric boolean adjacency matrix, whose row i lists the truck stops closer than min_distance to truck stop i
+    """
+    coords = np.column_stack([gdf.geometry.x, gdf.geometry.y])
+    n_stops = len(coords)
 
-            # Only add this point if it would bring the average distance closer to the target
-            if abs(new_avg_distance - target_avg_distance) <= abs(
-                np.mean(distances) - target_avg_distance
-            ):
-                selected_stops.append(row)
+    # query_pairs includes pairs exactly at the given distance, so query just below it since such pairs are allowed
+    pairs = cKDTree(coords).query_pairs(
+        r=np.nextafter(min_distance, 0), output_type="ndarray"
+    )
 
-    # Convert the list of selected stops back to a geodataframe
-    selected_gdf = gpd.GeoDataFrame(selected_stops, columns=gdf.columns).set_crs(
-        "EPSG:3857"
+    rows = np.concatenate([pairs[:, 0], pairs[:, 1]])
+    cols = np.concatenate([pairs[:, 1], pairs[:, 0]])
+    neighbors = scipy.sparse.csr_matrix(
+        (np.ones(len(rows), dtype=bool), (rows, cols)), shape=(n_stops, n_stops)
     )
 
-    return selected_gdf
+    return neighbors
 
 
-def find_nearest_highway_attribute(truck_stop_point, highways_gdf, attribute_name):
-    nearest_distance = float("inf")  # Initialize with a large value
-    nearest_highway_attribute = None
+def sample_min_distance_indices(neighbors_indptr, neighbors_indices, seed=None):
+    """
+    Greedily samples truck stops in a random order, accepting each one that isn't closer than the minimum distance to an already accepted stop (Poisson-disk sampling).
 
-    for idx, highway in highways_gdf.iterrows():
-        # Find the nearest point on this highway to the truck stop
-        nearest_point_on_highway = nearest_points(
-            truck_stop_point, highway["geometry"]
-        )[0]
+    Parameters
+    ----------
+    neighbors_indptr (np.array): Index pointer array of the CSR neighbor matrix produced by get_truck_stop_neighbors()
+    neighbors_indices (np.array): Column index array of the CSR neighbor matrix produced by get_truck_stop_neighbors()
+    seed (int or np.random.SeedSequence): Seed for the random ordering of the truck stops
 
-        # Calculate the distance between the truck stop and the nearest point on the highway
-        distance_to_highway = truck_stop_point.distance(nearest_point_on_highway)
+    Returns
+    -------
+    selected_indices (np.array): Sorted positional indices of the selected truck stops
+    """
+    rng = np.random.default_rng(seed)
+    n_stops = len(neighbors_indptr) - 1
+
+    # Once a stop is accepted, all stops within the minimum distance of it are blocked
+    blocked = np.zeros(n_stops, dtype=bool)
+    selected_indices = []
+    for i_stop in rng.permutation(n_stops):
+        if blocked[i_stop]:
+            continue
+        selected_indices.append(i_stop)
+        blocked[
+            neighbors_indices[neighbors_indptr[i_stop] : neighbors_indptr[i_stop + 1]]
+        ] = True
 
-        # Check if this highway is closer than the previously found one
-        if distance_to_highway < nearest_distance:
-            nearest_distance = distance_to_highway
-            nearest_highway_attribute = highway[attribute_name]
+    return np.sort(np.array(selected_indices, dtype=int))
 
-    return nearest_highway_attribute
 
+def select_truck_stops(gdf, min_distance=80500, seed=None):
+    """
+    Randomly select truck stops from the geodataframe such that no two selected stops lie closer together than the minimum distance.
+    Parameters:
+        - gdf: input geodataframe (in EPSG:3857)
+        - min_distance: minimum distance between truck stops in meters (default is 50 miles)
+        - seed: seed for the random selection, to make the selection reproducible
+    Returns:
+        - selected_gdf: geodataframe of selected truck stops
+    """
+    neighbors = get_truck_stop_neighbors(gdf, min_distance)
+    selected_indices = sample_min_distance_indices(
+        neighbors.indptr, neighbors.indices, seed
+    )
 
-def add_trips_per_day(
-    truck_stops_gdf, highways_gdf, attribute_name, distance_threshold
-):
-    print("Starting add_trips_per_day_serial function")
-
-    for truck_stop_index, truck_stop in truck_stops_gdf.iterrows():
-        try:
-            print(f"Processing truck stop: {truck_stop.name}")
-            nearby_highways_gdf = highways_gdf[
-                highways_gdf.distance(truck_stop["geometry"]) <= distance_threshold
-            ]
-
-            if not nearby_highways_gdf.empty:
-                nearest_highway_attribute = find_nearest_highway_attribute(
-                    truck_stop["geometry"], nearby_highways_gdf, attribute_name
-                )
-                if nearest_highway_attribute is not None:
-                    truck_stops_gdf.at[truck_stop_index, attribute_name] = (
-                        nearest_highway_attribute
-                    )
-
-            else:
-                print(f"No nearby highways for truck stop: {truck_stop.name}")
-
-        except Exception as e:
-            print(f"Exception occurred: {e}")
+    selected_gdf = gdf.iloc[selected_indices].reset_index(drop=True)
 
-    return truck_stops_gdf
+    return selected_gdf
 
 
-def count_truck_stops_within_radius(truck_stops_gdf, radius_miles):
+def select_truck_stops_ensemble(
+    gdf, n_realizations, min_distance=80500, seed=None, num_processes=None
+):
     """
-    Count the number of other truck stops within the specified radius (in miles) of each truck stop using spatial indexing.
-
+    Produces independent random selections of truck stops (as in select_truck_stops), in parallel across the given number of processes.
     Parameters:
-    - truck_stops_gdf (gpd.GeoDataFrame): GeoDataFrame containing truck stop locations in EPSG:3857.
-    - radius_miles (float): Radius in miles within which to count other truck stops.
-
+        - gdf: input geodataframe (in EPSG:3857)
+        - n_realizations: number of independent selections to produce
+        - min_distance: minimum distance between truck stops in meters (default is 50 miles)
+        - seed: seed from which the seeds for each realization are spawned, to make the ensemble reproducible
+        - num_processes: number of processes to use (default is the number of CPUs)
     Returns:
-    - gpd.GeoDataFrame: GeoDataFrame with an additional 'N_in_200mi' attribute.
+        - selected_gdfs: list of geodataframes of selected truck stops, one per realization
     """
-    # Convert radius from miles to meters
-    radius_miles = 200
-    radius_meters = radius_miles * 1609.34  # 1 mile = 1609.34 meters
+    # The neighbor lists only depend on the truck stop locations, so are shared between all realizations
+    neighbors = get_truck_stop_neighbors(gdf, min_distance)
 
-    # Create a spatial index for the truck stops GeoDataFrame
-    truck_stops_gdf.sindex
+    realization_seeds = np.random.SeedSequence(seed).spawn(n_realizations)
 
-    # Create an empty list to store the counts
-    counts = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=num_processes) as executor:
+        selections = list(
+            executor.map(
+                sample_min_distance_indices,
+                [neighbors.indptr] * n_realizations,
+                [neighbors.indices] * n_realizations,
+                realization_seeds,
+            )
+        )
 
-    # Iterate over each truck stop
-    n_stops = len(truck_stops_gdf)
-    for idx, truck_stop in truck_stops_gdf.iterrows():
-        if idx % 100 == 0:
-            print("Processed %d of %d stops" % (idx, n_stops))
+    selected_gdfs = [
+        gdf.iloc[selected_indices].reset_index(drop=True)
+        for selected_indices in selections
+    ]
 
-        # Create a Point geometry for the current truck stop
-        current_point = truck_stop["geometry"]
+    return selected_gdfs
 
-        # Use spatial indexing to find candidate truck stops within the bounding box of the radius
-        possible_neighbors = list(
-            truck_stops_gdf.sindex.intersection(
-                current_point.buffer(radius_meters).bounds
-            )
-        )
 
-        # Initialize a count for truck stops within the radius
-        count_within_radius = 0
+def assign_nearest_link_attributes(
+    points_gdf, links_gdf, attribute_names, max_distance, k_nearest=1, aggfunc="mean"
+):
+    """
+    Assigns attributes of the nearest link(s) within the given maximum distance to each point, using a single bulk query of a spatial index of the links.
 
-        # Iterate over potential neighbors and check if they are within the radius
-        for neighbor_idx in possible_neighbors:
-            if idx != neighbor_idx:  # Skip the current truck stop
-                neighbor_point = truck_stops_gdf.loc[neighbor_idx, "geometry"]
+    Parameters
+    ----------
+    points_gdf (gpd.DataFrame): Geopandas dataframe containing the points of interest
+    links_gdf (gpd.DataFrame): Geopandas dataframe containing the links (e.g. highways), in the same coordinate reference system as points_gdf
+    attribute_names (string or list of strings): Name(s) of the link attribute(s) to assign to each point
+    max_distance (float): Maximum distance (in units of the coordinate reference system) between a point and a link for the link to be considered
+    k_nearest (int): Number of nearest links to consider for each point (e.g. 2 to consider both directions of a divided interstate)
+    aggfunc (string): Function used to combine the attributes of the k nearest links (e.g. 'mean', 'sum', 'max'), which must support the dtype of each attribute. Has no effect if k_nearest is 1, so any attribute (including strings) can be assigned from the single nearest link.
 
-                # Calculate the great-circle distance in meters between the two truck stops
-                distance = current_point.distance(neighbor_point)
+    Returns
+    -------
+    points_gdf (gpd.DataFrame): Points of interest, with the link attribute(s) added. Points with no link within the maximum distance get NaN.
+    """
+    if isinstance(attribute_names, str):
+        attribute_names = [attribute_names]
 
-                # Check if the distance is within the specified radius
-                if distance <= radius_meters:
-                    count_within_radius += 1
+    points = np.asarray(points_gdf.geometry.values)
+    links = np.asarray(links_gdf.geometry.values)
 
-        # Append the count to the list
-        counts.append(count_within_radius)
+    # Find all pairs of points and links within the maximum distance of each other, and evaluate their separations
+    links_tree = shapely.STRtree(links)
+    point_indices, link_indices = links_tree.query(
+        points, predicate="dwithin", distance=max_distance
+    )
+    distances = shapely.distance(points[point_indices], links[link_indices])
+
+    # Sort the pairs by point, then by distance, and keep the k nearest links for each point
+    order = np.lexsort((distances, point_indices))
+    point_indices = point_indices[order]
+    link_indices = link_indices[order]
+    rank = np.arange(len(point_indices)) - np.searchsorted(point_indices, point_indices)
+    nearest = rank < k_nearest
+
+    # Combine the attributes of the nearest links for each point
+    nearest_df = links_gdf[attribute_names].iloc[link_indices[nearest]]
+    nearest_df = nearest_df.reset_index(drop=True)
+    nearest_df["point_index"] = point_indices[nearest]
+    if k_nearest == 1:
+        # Each point has at most one nearest link, so there's nothing to combine (this also works for non-numeric attributes)
+        aggregated_df = nearest_df.set_index("point_index")[attribute_names]
+    else:
+        aggregated_df = nearest_df.groupby("point_index")[attribute_names].agg(aggfunc)
 
-    # Create a new GeoDataFrame with the 'N_in_200mi' attribute
-    truck_stops_with_counts_gdf = truck_stops_gdf.copy()
-    truck_stops_with_counts_gdf["N_in_200mi"] = counts
+    # Add the attributes to the points, keeping the dtype of each link attribute where possible and leaving NaN for points without any link nearby
+    for attribute_name in attribute_names:
+        values = pd.Series(
+            index=points_gdf.index, dtype=links_gdf[attribute_name].dtype
+        )
+        values.iloc[aggregated_df.index.to_numpy()] = aggregated_df[
+            attribute_name
+        ].to_numpy()
+        points_gdf[attribute_name] = values
 
-    return truck_stops_with_counts_gdf
+    return points_gdf
 
 
-def count_truck_stops_within_radius_parallel(
-    truck_stops_gdf, radius_miles, num_processes
+def add_trips_per_day(
+    truck_stops_gdf,
+    highways_gdf,
+    attribute_name,
+    distance_threshold,
+    k_nearest=1,
+    aggfunc="mean",
 ):
     """
-    Count the number of other truck stops within the specified radius (in miles) of each truck stop using parallel processing.
+    Adds the given attribute(s) (e.g. 'Tot Trips') of the nearest highway link(s) to each truck stop.
 
-    Parameters:
-    - truck_stops_gdf (gpd.GeoDataFrame): GeoDataFrame containing truck stop locations.
-    - radius_miles (float): Radius in miles within which to count other truck stops.
-    - num_processes (int): Number of processes to use for parallelization.
+    Parameters
+    ----------
+    truck_stops_gdf (gpd.DataFrame): Geopandas dataframe containing the truck stops
+    highways_gdf (gpd.DataFrame): Geopandas dataframe containing the highway links
+    attribute_name (string or list of strings): Name(s) of the highway attribute(s) to add to each truck stop
+    distance_threshold (float): Maximum distance (in meters) between a truck stop and a highway link for the link to be considered
+    k_nearest (int): Number of nearest highway links to consider for each truck stop
+    aggfunc (string): Function used to combine the attributes of the k nearest links
 
-    Returns:
-    - gpd.GeoDataFrame: GeoDataFrame with an additional 'N_in_200mi' attribute.
+    Returns
+    -------
+    truck_stops_gdf (gpd.DataFrame): Truck stops, with the highway attribute(s) added
     """
-    # Ensure the GeoDataFrame is in EPSG:4326 (WGS 84)
-    truck_stops_gdf = truck_stops_gdf.to_crs("EPSG:4326")
-
-    # Create a copy of the GeoDataFrame to avoid potential issues with indexing
-    truck_stops_gdf = truck_stops_gdf.copy()
+    truck_stops_gdf = assign_nearest_link_attributes(
+        truck_stops_gdf,
+        highways_gdf,
+        attribute_name,
+        distance_threshold,
+        k_nearest=k_nearest,
+        aggfunc=aggfunc,
+    )
 
-    # Initialize a ProcessPoolExecutor with the specified number of processes
-    with concurrent.futures.ProcessPoolExecutor(max_workers=num_processes) as executor:
-        # Create a list to store future objects for each truck stop
-        futures = []
+    first_attribute_name = (
+        attribute_name if isinstance(attribute_name, str) else attribute_name[0]
+    )
+    n_without_highways = truck_stops_gdf[first_attribute_name].isna().sum()
+    print(
+        f"No nearby highways for {n_without_highways} of {len(truck_stops_gdf)} truck stops"
+    )
 
-        # Iterate over each truck stop and submit it for processing
-        for idx, truck_stop in truck_stops_gdf.iterrows():
-            future = executor.submit(
-                process_truck_stop, truck_stop, truck_stops_gdf, radius_miles
-            )
-            futures.append(future)
+    return truck_stops_gdf
 
-        # Wait for all futures to complete and retrieve the results
-        concurrent.futures.wait(futures)
 
-        # Extract the results from the completed futures
-        counts = [future.result() for future in futures]
+def get_radius_column_name(radius_miles):
+    """
+    Gets the name of the attribute containing the number of other truck stops within the given radius
 
-    # Create a new GeoDataFrame with the 'N_in_200mi' attribute
-    truck_stops_with_counts_gdf = truck_stops_gdf.copy()
-    truck_stops_with_counts_gdf["N_in_200mi"] = counts
-    print(truck_stops_with_counts_gdf)
+    Parameters
+    ----------
+    radius_miles (float): Radius (in miles)
 
-    return truck_stops_with_counts_gdf.to_crs("EPSG:3857")
+    Returns
+    -------
+    column_name (string): Name of the attribute (e.g. 'N_in_200mi' for a radius of 200 miles)
+    """
+    return f"N_in_{radius_miles:g}mi"
 
 
-def process_truck_stop(truck_stop, truck_stops_gdf, radius_miles):
+def count_truck_stops_within_radius(truck_stops_gdf, radius_miles=DEFAULT_RADII_MILES):
     """
-    Process a single truck stop to count the number of other truck stops within the specified radius.
+    Count the number of other truck stops within each of the specified radii (in miles) of each truck stop, in a single pass over the pairs of truck stops found with a KD-tree.
 
     Parameters:
-    - truck_stop (Series): A single row (truck stop) from the GeoDataFrame.
-    - truck_stops_gdf (gpd.GeoDataFrame): GeoDataFrame containing all truck stops.
-    - radius_miles (float): Radius in miles within which to count other truck stops.
+    - truck_stops_gdf (gpd.GeoDataFrame): GeoDataFrame containing truck stop locations.
+    - radius_miles (float or list of floats): Radius or radii in miles within which to count other truck stops.
 
     Returns:
-    - int: The count of other truck stops within the radius.
-    """
-    current_point = truck_stop["geometry"]
+    - gpd.GeoDataFrame: GeoDataFrame with an additional 'N_in_<r>mi' attribute for each radius r (e.g. 'N_in_200mi').
 
-    # Use spatial indexing to find candidate truck stops within the bounding box of the radius
-    possible_neighbors = list(
-        truck_stops_gdf.sindex.intersection(current_point.buffer(radius_miles).bounds)
+    NOTE: Distances are great-circle distances. The truck stops are placed on the unit sphere, where the straight-line (chord) distance between two points increases monotonically with their great-circle distance, so each radius can be converted to an equivalent chord length.
+    """
+    radii_miles = np.unique(np.atleast_1d(np.asarray(radius_miles, dtype=float)))
+
+    # Convert the truck stop locations to 3D unit vectors
+    truck_stops_lonlat = truck_stops_gdf.geometry.to_crs("EPSG:4326")
+    lon = np.radians(truck_stops_lonlat.x.to_numpy())
+    lat = np.radians(truck_stops_lonlat.y.to_numpy())
+    unit_vectors = np.column_stack(
+        [np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)]
     )
 
-    # Initialize a count for truck stops within the radius
-    count_within_radius = 0
-
-    # Iterate over potential neighbors and check if they are within the radius
-    for neighbor_idx in possible_neighbors:
-        if truck_stop.name != neighbor_idx:  # Skip the current truck stop
-            neighbor_point = truck_stops_gdf.loc[neighbor_idx, "geometry"]
+    # Convert the radii from great-circle distances to chord lengths on the unit sphere
+    radii_chord = 2 * np.sin(radii_miles / (2 * EARTH_RADIUS_MILES))
 
-            # Calculate the great-circle distance in miles between the two truck stops
-            distance = great_circle(
-                (current_point.y, current_point.x), (neighbor_point.y, neighbor_point.x)
-            ).miles
+    # Find all pairs of truck stops within the largest radius of each other
+    tree = cKDTree(unit_vectors)
+    pairs = tree.query_pairs(r=radii_chord[-1], output_type="ndarray")
+    pair_distances = np.linalg.norm(
+        unit_vectors[pairs[:, 0]] - unit_vectors[pairs[:, 1]], axis=1
+    )
 
-            # Check if the distance is within the specified radius
-            if distance <= radius_miles:
-                count_within_radius += 1
+    # Bin each pair by the smallest radius containing it, count the pairs in each bin for both truck stops in the pair, then accumulate over bins to get the counts within each radius
+    n_stops = len(unit_vectors)
+    n_radii = len(radii_miles)
+    radius_bins = np.searchsorted(radii_chord, pair_distances, side="left")
+    bin_counts = np.bincount(
+        np.concatenate([pairs[:, 0], pairs[:, 1]]) * n_radii
+        + np.concatenate([radius_bins, radius_bins]),
+        minlength=n_stops * n_radii,
+    ).reshape(n_stops, n_radii)
+    counts = np.cumsum(bin_counts, axis=1)
+
+    # Create a new GeoDataFrame with an 'N_in_<r>mi' attribute for each radius
+    truck_stops_with_counts_gdf = truck_stops_gdf.copy()
+    for i_radius, radius in enumerate(radii_miles):
+        truck_stops_with_counts_gdf[get_radius_column_name(radius)] = counts[
+            :, i_radius
+        ]
 
-    return count_within_radius
+    return truck_stops_with_counts_gdf
 
 
-@lru_cache(maxsize=None)
 def calculate_charges_per_day(trucks_per_day, n_stops_in_range, range_miles):
     """
     Calculates the average number of trucks expected to arrive at a station each day to charge
 
     Parameters:
-    trucks_per_day (float): Average number of trucks stopping to charge per day
-    n_stops_in_range (float): Number of other truck stops within EV truck driving range (200 miles by default)
+    trucks_per_day (float or np.array): Average number of trucks stopping to charge per day
+    n_stops_in_range (float or np.array): Number of other truck stops within EV truck driving range (200 miles by default)
 
     Returns:
-    charges_per_day (float): Average number of truck charges at the station per day
+    charges_per_day (float or np.array): Average number of truck charges at the station per day
     """
     # charges_per_day = trucks_per_day / 2.#/ (1+n_stops_in_range)
     charges_per_day = trucks_per_day * 100.0 / range_miles
@@ -324,7 +378,6 @@ def calculate_charges_per_day(trucks_per_day, n_stops_in_range, range_miles):
     return charges_per_day
 
 
-@lru_cache(maxsize=None)
 def p_x_trucks_at_stop(charges_per_day, x_trucks, charging_time=0.5):
     """
     Calculates the binomial probability of there being x_trucks other trucks charging at the stop when a given truck arrives
@@ -339,35 +392,9 @@ def p_x_trucks_at_stop(charges_per_day, x_trucks, charging_time=0.5):
     -------
     p_x_at_stop (float): Binomial probability
     """
-    # Probability that any given truck is charging at the stop is just given by the ratio of charging time to the number of hours (24) in a day
-    p_given_truck_at_stop = charging_time / 24.0
-
-    # Convert charges per day to an integer
-    charges_per_day = int(charges_per_day)
-
-    # If np>5 and n(1-p)>5, use the gaussian approximation of the binomial distribution
-    if (
-        charges_per_day * p_given_truck_at_stop > 5
-        and charges_per_day * (1 - p_given_truck_at_stop) > 5
-    ):
-        # Calculate mean (μ) and standard deviation (σ) of the binomial distribution
-        mean = charges_per_day * p_given_truck_at_stop
-        std_dev = np.sqrt(
-            charges_per_day * p_given_truck_at_stop * (1 - p_given_truck_at_stop)
-        )
-
-        # Calculate the Gaussian approximation using norm.pdf
-        gaussian_appx = norm.pdf(x_trucks, loc=mean, scale=std_dev)
-
-        p_x_at_stop = gaussian_appx
-    else:
-        p_x_at_stop = (
-            scipy.special.binom(charges_per_day - 1, x_trucks)
-            * p_given_truck_at_stop**x_trucks
-            * (1.0 - p_given_truck_at_stop) ** (charges_per_day - 1 - x_trucks)
-        )
-
-    return p_x_at_stop
+    return float(
+        p_x_trucks_at_stop_vectorized(charges_per_day, x_trucks, charging_time)
+    )
 
 
 @lru_cache(maxsize=None)
@@ -405,25 +432,23 @@ def mu_queue_lt_chargers(trucks_queued, n_chargers, charging_time=0.5):
     mu_queue (float): Average time the truck spends waiting for a charger to free up
     """
 
-    # Define the probability of waiting for a charger to integrate over, for the given values of n_chargers and charging_time
-    def this_p_waiting_for_charger(t):
-        return p_waiting_for_charger(t, n_chargers, charging_time)
+    # The probability of waiting for a charger with k chargers in use, p_waiting_for_charger(t, k, charging_time), integrates from a to the full charging time to charging_time / (k+1) * (1 - a/charging_time)^(k+1)
+    def integrate_p_waiting_for_charger(t_start, n_chargers_in_use):
+        return (
+            charging_time
+            / (n_chargers_in_use + 1)
+            * (1 - t_start / charging_time) ** (n_chargers_in_use + 1)
+        )
 
     # Integrate over the probability from 0 to the full charging time to evaluate the average time spent mu_0 waiting for a charger for the first truck in the queue
-    mu_0, res = quad(this_p_waiting_for_charger, 0, charging_time)
+    mu_0 = integrate_p_waiting_for_charger(0, n_chargers)
     mu_last = mu_0  # Update the time that the truck at the front of the queue waited to start charging
     mu_queue = mu_0  # Update the total time the truck of interest has spent waiting in the queue to mu_0
 
     # Go through all subsequent trucks in the queue and evaluate the average length of time they wait for a charger
     for i in range(1, trucks_queued + 1):
-        # The ith truck in the queue is now waiting for n_chargers-i chargers, i of the chargers are in use by the trucks that were queued in front of it
-        def this_p_waiting_for_charger(t):
-            return p_waiting_for_charger(t, n_chargers - i, charging_time)
-
-        # Now we integrate starting from when the last truck started charging (mu_last) to the total charging time to get the average that the truck now at the start of the queue waits to start charging
-        mu_front_of_queue, res = quad(
-            this_p_waiting_for_charger, mu_last, charging_time
-        )
+        # The ith truck in the queue is now waiting for n_chargers-i chargers, i of the chargers are in use by the trucks that were queued in front of it. We integrate starting from when the last truck started charging (mu_last) to the total charging time to get the average that the truck now at the start of the queue waits to start charging
+        mu_front_of_queue = integrate_p_waiting_for_charger(mu_last, n_chargers - i)
         mu_last = mu_front_of_queue  # Update the time that the truck at the front of the queue waited to start charging
         mu_queue = (
             mu_last + mu_front_of_queue
@@ -472,15 +497,119 @@ def average_wait_time(charges_per_day, n_chargers, charging_time=0.5):
     -------
     mu_queue (float): Average time the truck spends waiting for a charger to free up
     """
-    x_trucks_arr = np.arange(n_chargers, charges_per_day)
-    p_x_values = np.array(
-        [p_x_trucks_at_stop(charges_per_day, x, charging_time) for x in x_trucks_arr]
+    return float(
+        average_wait_time_vectorized(charges_per_day, n_chargers, charging_time)
     )
-    mu_values = np.array(
-        [mu_queue(int(x - n_chargers), n_chargers, charging_time) for x in x_trucks_arr]
+
+
+def solve_min_chargers(
+    charges_per_day, charging_time=4.0, max_wait_time=1.0, queue_model="binomial"
+):
+    """
+    Calculates the minimum number of chargers needed to keep the average wait time below the given value, for an array of truck stops at once.
+
+    Since the average wait time decreases monotonically with the number of chargers, the minimum is found by bisection between one charger and the number of charges per day, simultaneously for all stops. Each unique number of charges per day is only solved once, and solutions are memoized for the rest of the run.
+
+    Parameters
+    ----------
+    charges_per_day (np.array): Number of truck charges at each station per day (integer)
+    charging_time (float): Average amount of time needed for each truck to charge (in hours)
+    max_wait_time (float): Maximum allowable average wait time (in hours)
+    queue_model (string): Queue model used to evaluate the average wait time. One of 'binomial' (the default model in this script), 'mmc' or 'mdc' (Erlang-C, solved with solve_min_chargers_erlang() in ChargingQueueTools.py).
+
+    Returns
+    -------
+    min_chargers (np.array): Minumum number of chargers needed at each station. If no number of chargers smaller than the number of charges per day keeps the average wait time below the maximum, this is the number of charges per day.
+    """
+    charges_per_day = np.maximum(np.asarray(charges_per_day).astype(int), 1)
+    unique_charges, inverse = np.unique(charges_per_day, return_inverse=True)
+
+    # Look up the unique charges per day that were already solved for with the same charging and wait times
+    min_chargers_unique = np.array(
+        [
+            _min_chargers_memo.get(
+                (charges, charging_time, max_wait_time, queue_model), 0
+            )
+            for charges in unique_charges
+        ],
+        dtype=int,
     )
-    av_t_wait = np.sum(p_x_values * mu_values)
-    return av_t_wait
+    to_solve = min_chargers_unique == 0
+    charges_to_solve = unique_charges[to_solve]
+
+    if queue_model == "binomial":
+        solved_min_chargers = bisect_min_chargers(
+            charges_to_solve, charging_time, max_wait_time
+        )
+    elif queue_model in QUEUE_MODELS:
+        solved_min_chargers = solve_min_chargers_erlang(
+            charges_to_solve, charging_time, max_wait_time, queue_model
+        )
+    else:
+        raise ValueError(
+            f"Unknown queue model {queue_model}. Options are {QUEUE_MODELS}."
+        )
+
+    min_chargers_unique[to_solve] = solved_min_chargers
+    for charges, min_chargers in zip(charges_to_solve, solved_min_chargers):
+        _min_chargers_memo[(charges, charging_time, max_wait_time, queue_model)] = (
+            min_chargers
+        )
+
+    return min_chargers_unique[inverse].reshape(charges_per_day.shape)
+
+
+def bisect_min_chargers(charges_to_solve, charging_time=4.0, max_wait_time=1.0):
+    """
+    Calculates the minimum number of chargers needed to keep the average wait time (with the binomial queue model) below the given value by bisection, for an array of truck stops at once
+
+    Parameters
+    ----------
+    charges_to_solve (np.array): Number of truck charges at each station per day (integer, at least 1)
+    charging_time (float): Average amount of time needed for each truck to charge (in hours)
+    max_wait_time (float): Maximum allowable average wait time (in hours)
+
+    Returns
+    -------
+    min_chargers (np.array): Minumum number of chargers needed at each station
+    """
+    # Bisect between one charger (lower bound) and the number of charges per day (which is taken to always keep the wait below the maximum)
+    lower = np.ones(len(charges_to_solve), dtype=int)
+    upper = charges_to_solve.copy()
+
+    # Narrow the upper bound to well above the average number of trucks charging at once where that already keeps the wait below the maximum, to avoid tabulating queue waits for needlessly many chargers
+    trucks_charging = charges_to_solve * charging_time / HOURS_PER_DAY
+    bracket = np.ceil(
+        trucks_charging + BRACKET_N_SIGMA * np.sqrt(trucks_charging) + 1
+    ).astype(int)
+    bracketed = bracket < upper
+    bracket_meets_max_wait = (
+        average_wait_time_vectorized(
+            charges_to_solve[bracketed], bracket[bracketed], charging_time
+        )
+        < max_wait_time
+    )
+    upper[bracketed] = np.where(
+        bracket_meets_max_wait, bracket[bracketed], upper[bracketed]
+    )
+    lower[bracketed] = np.where(
+        bracket_meets_max_wait, lower[bracketed], bracket[bracketed] + 1
+    )
+
+    active = lower < upper
+    while np.any(active):
+        middle = (lower[active] + upper[active]) // 2
+        meets_max_wait = (
+            average_wait_time_vectorized(
+                charges_to_solve[active], middle, charging_time
+            )
+            < max_wait_time
+        )
+        upper[active] = np.where(meets_max_wait, middle, upper[active])
+        lower[active] = np.where(meets_max_wait, lower[active], middle + 1)
+        active = lower < upper
+
+    return lower
 
 
 def get_min_chargers(
@@ -489,6 +618,7 @@ def get_min_chargers(
     range_miles=200.0,
     charging_time=4.0,
     max_wait_time=1.0,
+    queue_model="binomial",
 ):
     """
     Calculates the minimum number of chargers and charger-to-truck ratio (where the trucks in the ratio is the number of trucks stopping at the station to charge per day)
@@ -498,6 +628,7 @@ def get_min_chargers(
     trucks_per_day (float): Average number of trucks stopping to charge per day
     n_stops_in_range (float): Number of other truck stops within EV truck driving range (200 miles by default)
     charging_time (float): Average amount of time needed for each truck to charge (in hours)
+    queue_model (string): Queue model used to evaluate the average wait time (one of 'binomial', 'mmc' or 'mdc')
 
     Returns
     -------
@@ -513,16 +644,11 @@ def get_min_chargers(
     if charges_per_day == 0:
         charges_per_day = 1
 
-    # Make an array of possible numbers of chargers, ranging from one to the number of trucks charging per day
-    n_chargers_arr = np.arange(1, charges_per_day)
-
-    # Initialize the minimum number of chargers to the number of charges per day
-    min_chargers = charges_per_day
-    for n_chargers in n_chargers_arr:
-        av_wait = average_wait_time(charges_per_day, n_chargers, charging_time)
-        if av_wait < max_wait_time:
-            min_chargers = n_chargers
-            break
+    min_chargers = int(
+        solve_min_chargers(
+            [charges_per_day], charging_time, max_wait_time, queue_model
+        )[0]
+    )
 
     min_ratio = 1.0 * min_chargers / (1.0 * charges_per_day)
 
@@ -530,131 +656,173 @@ def get_min_chargers(
 
 
 def apply_min_chargers(
-    truck_stops_gdf, range_miles, charging_time=4.0, max_wait_time=1.0
+    truck_stops_gdf,
+    range_miles,
+    charging_time=4.0,
+    max_wait_time=1.0,
+    queue_model="binomial",
 ):
     """
-    Apply the get_min_chargers function to each truck stop in the GeoDataFrame and add the results as attributes.
+    Evaluate the minimum number of chargers (as in get_min_chargers) for all truck stops in the GeoDataFrame at once and add the results as attributes.
 
     Parameters:
-    - truck_stops_gdf (gpd.GeoDataFrame): GeoDataFrame containing truck stop locations with 'Tot Trips' and 'N_in_200mi' attributes.
+    - truck_stops_gdf (gpd.GeoDataFrame): GeoDataFrame containing truck stop locations with 'Tot Trips' and 'N_in_<range_miles>mi' attributes.
+    - queue_model (string): Queue model used to evaluate the average wait time (one of 'binomial', 'mmc' or 'mdc').
 
     Returns:
-    - gpd.GeoDataFrame: GeoDataFrame with additional 'Min Chargers' and 'Charger-to-Truck Ratio' attributes.
-    """
-    # Initialize empty lists to store the results
-    min_chargers_list = []
-    charger_to_truck_ratio_list = []
-    CPD_list = []
-
-    # Iterate over each truck stop
-    n_stops = len(truck_stops_gdf)
-    for idx, truck_stop in truck_stops_gdf.iterrows():
-        print("Processing stop %d of %d" % (idx, n_stops))
-        #        if idx > 1:
-        #            min_chargers_list.append(0)
-        #            charger_to_truck_ratio_list.append(0)
-        #            CPD_list.append(0)
-        #        else:
-        trucks_per_day = truck_stop["Tot Trips"]
-        n_stops_in_range = truck_stop["N_in_200mi"]
-
-        # Call the get_min_chargers function to calculate min chargers and ratio
-        min_chargers, charger_to_truck_ratio, charges_per_day = get_min_chargers(
-            trucks_per_day, n_stops_in_range, range_miles, charging_time, max_wait_time
-        )
+    - gpd.GeoDataFrame: GeoDataFrame with additional 'Min_Charge' (minimum chargers), 'Min_Ratio' (charger-to-truck ratio) and 'CPD' (charges per day) attributes.
+    """
+    trucks_per_day = truck_stops_gdf["Tot Trips"].fillna(0).to_numpy(dtype=float)
+    n_stops_in_range = truck_stops_gdf[get_radius_column_name(range_miles)].to_numpy()
 
-        # Append the results to the lists
-        min_chargers_list.append(min_chargers)
-        charger_to_truck_ratio_list.append(charger_to_truck_ratio)
-        CPD_list.append(charges_per_day)
+    # Calculate the average number of trucks that will need to stop and charge at each truck stop per day
+    charges_per_day = calculate_charges_per_day(
+        trucks_per_day, n_stops_in_range, range_miles
+    ).astype(int)
+    charges_per_day[charges_per_day == 0] = 1
+
+    min_chargers = solve_min_chargers(
+        charges_per_day, charging_time, max_wait_time, queue_model
+    )
+
+    print(
+        f"Evaluated minimum chargers for {len(charges_per_day)} stops ({len(np.unique(charges_per_day))} unique charges per day)"
+    )
 
     # Add the results as new attributes to the GeoDataFrame
-    truck_stops_gdf["Min_Charge"] = min_chargers_list
-    truck_stops_gdf["Min_Ratio"] = charger_to_truck_ratio_list
-    truck_stops_gdf["CPD"] = CPD_list
+    truck_stops_gdf["Min_Charge"] = min_chargers
+    truck_stops_gdf["Min_Ratio"] = min_chargers / charges_per_day
+    truck_stops_gdf["CPD"] = charges_per_day
 
     return truck_stops_gdf
 
 
-parser = argparse.ArgumentParser()
-parser.add_argument(
-    "-c", "--charging_time", default="4", type=float, help="Charging time (hours)"
-)
-parser.add_argument(
-    "-m",
-    "--max_wait_time",
-    default="1",
-    type=float,
-    help="Maximum allowable wait time (hours)",
-)
-parser.add_argument(
-    "-r", "--range_miles", default="200", type=float, help="Truck range (miles)"
-)
+def get_truck_stops_with_trips(top_dir, distance_threshold=1000, cache_dir=None):
+    """
+    Gets the truck stops near interstates, with the trips per day for the nearest highway link to each truck stop.
 
-if __name__ == "__main__":
-    args = parser.parse_args()
+    Each stage is cached as GeoParquet, keyed by the contents of its input shapefiles, its parameters and the source code of the functions it runs, so a stage is only rerun when one of these changes.
 
-    # Get the path to the top level of the Git repo
-    top_dir = get_top_dir()
+    Parameters
+    ----------
+    top_dir (string): Path to top-level directory of the repository
+    distance_threshold (float): Maximum distance (in meters) between a truck stop and an interstate, also used as the maximum distance to the nearest highway link
+    cache_dir (string): Directory containing the cached stage outputs. Defaults to data/cache.
 
-    # Filter for truck stops within 1 km of interstates
-    stops_along_interstate_save_path = (
-        f"{top_dir}/data/Truck_Stop_Parking/Truck_Stop_Parking_Along_Interstate.shp"
-    )
-    if not os.path.isfile(stops_along_interstate_save_path):
+    Returns
+    -------
+    truck_stops_gdf (gpd.GeoDataFrame): Truck stops along interstates with the trips per day (Tot Trips), in EPSG:3857
+    """
+    if cache_dir is None:
+        cache_dir = f"{top_dir}/data/cache"
+
+    truck_stops_path = f"{top_dir}/data/Truck_Stop_Parking/Truck_Stop_Parking.shp"
+    highways_path = f"{top_dir}/data/highway_assignment_links/highway_assignment_links_interstate.shp"
+
+    # The highways are only read in if one of the stages needs to be rerun, and then only once
+    @lru_cache(maxsize=None)
+    def read_highways():
+        return gpd.read_file(highways_path).to_crs("EPSG:3857")
+
+    # Filter for truck stops within the distance threshold of interstates
+    def filter_stage():
         # Read the shapefiles and ensure the CRS is a projected coordinate system to evaluate separation distances
-        truck_stops_gdf = gpd.read_file(
-            f"{top_dir}/data/Truck_Stop_Parking/Truck_Stop_Parking.shp"
-        ).to_crs("EPSG:3857")
-        highways_gdf = gpd.read_file(
-            f"{top_dir}/data/highway_assignment_links/highway_assignment_links_interstate.shp"
-        ).to_crs("EPSG:3857")
-
-        # Distance threshold between truck stops and highways set to 1km
-        truck_stops_gdf = filter_points_by_distance(
+        truck_stops_gdf = gpd.read_file(truck_stops_path).to_crs("EPSG:3857")
+        return filter_points_by_distance(
             points_gdf=truck_stops_gdf,
-            highways_gdf=highways_gdf,
-            distance_threshold=1000,
+            highways_gdf=read_highways(),
+            distance_threshold=distance_threshold,
         )
 
-        # Save the points along interstates
-        saveShapefile(truck_stops_gdf, stops_along_interstate_save_path)
+    filter_key = get_stage_key(
+        input_paths=[truck_stops_path, highways_path],
+        params={"distance_threshold": distance_threshold},
+        functions=[filter_points_by_distance],
+    )
+    truck_stops_gdf = run_cached_stage(
+        "truck_stops_along_interstate", filter_key, filter_stage, cache_dir
+    )
 
     # Add the trips per day for the nearest highway link to each truck stop
-    with_tot_trips_save_path = f"{top_dir}/data/Truck_Stop_Parking/Truck_Stop_Parking_Along_Interstate_with_Tot_Trips.shp"
-    if not os.path.isfile(with_tot_trips_save_path):
-        truck_stops_gdf = gpd.read_file(
-            f"{top_dir}/data/Truck_Stop_Parking/Truck_Stop_Parking_Along_Interstate.shp"
-        ).to_crs("EPSG:3857")
-        truck_stops_gdf = add_trips_per_day(
+    def trips_stage():
+        return add_trips_per_day(
             truck_stops_gdf,
-            highways_gdf,
+            read_highways(),
             attribute_name="Tot Trips",
-            distance_threshold=1000,
+            distance_threshold=distance_threshold,
         )
 
-        # Save the augmented truck_stops_gdf as a shapefile
-        saveShapefile(truck_stops_gdf, with_tot_trips_save_path)
+    trips_key = get_stage_key(
+        input_paths=[highways_path],
+        params={
+            "upstream_key": filter_key,
+            "attribute_name": "Tot Trips",
+            "distance_threshold": distance_threshold,
+        },
+        functions=[add_trips_per_day, assign_nearest_link_attributes],
+    )
+    truck_stops_gdf = run_cached_stage(
+        "truck_stops_along_interstate_with_trips", trips_key, trips_stage, cache_dir
+    )
 
-    # Randomly sparsify truck stops so their typical spatial separation is appropriate for the given truck range
-    truck_stops_gdf = gpd.read_file(
-        f"{top_dir}/data/Truck_Stop_Parking/Truck_Stop_Parking_Along_Interstate_with_Tot_Trips.shp"
-    ).to_crs("EPSG:3857")
+    return truck_stops_gdf.to_crs("EPSG:3857")
 
-    truck_stops_gdf = select_truck_stops(truck_stops_gdf)
 
+def get_min_chargers_save_path(
+    top_dir, range_miles, charging_time, max_wait_time, queue_model="binomial"
+):
+    """
+    Gets the path (without extension) that the truck stops with minimum chargers are saved to for the given options
+
+    Parameters
+    ----------
+    top_dir (string): Path to top-level directory of the repository
+    range_miles (float): Truck range (miles)
+    charging_time (float): Average amount of time needed for each truck to charge (in hours)
+    max_wait_time (float): Maximum allowable average wait time (in hours)
+    queue_model (string): Queue model used to evaluate the average wait time. Models other than the default binomial model are appended to the file name.
+
+    Returns
+    -------
+    save_path_base (string): Path to save to, without the file extension
+    """
+    save_path_base = f"{top_dir}/data/Truck_Stop_Parking/Truck_Stop_Parking_Along_Interstate_with_min_chargers_range_{range_miles}_chargingtime_{charging_time}_maxwait_{max_wait_time}"
+    if queue_model != "binomial":
+        save_path_base = f"{save_path_base}_queue_{queue_model}"
+
+    return save_path_base
+
+
+def evaluate_charger_needs(
+    truck_stops_gdf, range_miles, charging_time, max_wait_time, queue_model="binomial"
+):
+    """
+    Evaluates the minimum number of chargers needed at each truck stop, both for the full highway flows and for half the flows (equivalent to splitting the flows between two companies)
+
+    Parameters
+    ----------
+    truck_stops_gdf (gpd.GeoDataFrame): GeoDataFrame containing the (sparsified) truck stops with the 'Tot Trips' attribute, in EPSG:3857
+    range_miles (float): Truck range (miles)
+    charging_time (float): Average amount of time needed for each truck to charge (in hours)
+    max_wait_time (float): Maximum allowable average wait time (in hours)
+    queue_model (string): Queue model used to evaluate the average wait time (one of 'binomial', 'mmc' or 'mdc')
+
+    Returns
+    -------
+    truck_stops_gdf (gpd.GeoDataFrame): GeoDataFrame with additional attributes for the number of truck stops in range, and the minimum chargers and charger-to-truck ratio for the full and half flows
+    """
     # Reset the index and drop the old index and ensure the CRS is projection
     truck_stops_gdf = truck_stops_gdf.reset_index(drop=True).to_crs("EPSG:3857")
 
-    # Call the function to count truck stops within the radius and add the count as an attribute
-    truck_stops_gdf = count_truck_stops_within_radius(truck_stops_gdf, args.range_miles)
+    # Count the truck stops within the truck range, along with the default set of radii, and add the counts as attributes (unless they were already counted)
+    if get_radius_column_name(range_miles) not in truck_stops_gdf.columns:
+        truck_stops_gdf = count_truck_stops_within_radius(
+            truck_stops_gdf, np.union1d(DEFAULT_RADII_MILES, [range_miles])
+        )
 
-    # For each truck stop, calculate the number of chargers needed to keep quick charging wait times below 30 minutes and add it as an attribute, along with the charger-to-truck ratio
+    # For each truck stop, calculate the number of chargers needed to keep quick charging wait times below the maximum and add it as an attribute, along with the charger-to-truck ratio
     truck_stops_gdf = apply_min_chargers(
-        truck_stops_gdf,
-        args.range_miles,
-        float(args.charging_time),
-        float(args.max_wait_time),
+        truck_stops_gdf, range_miles, charging_time, max_wait_time, queue_model
     )
 
     # Now suppose we only have half the highway flows (equivalent to splitting the flows between two companies). Calculate the updated min_chargers
@@ -662,10 +830,7 @@ if __name__ == "__main__":
     truck_stops_gdf_half["Tot Trips"] = truck_stops_gdf_half["Tot Trips"] / 2.0
 
     truck_stops_gdf_half = apply_min_chargers(
-        truck_stops_gdf_half,
-        args.range_miles,
-        float(args.charging_time),
-        float(args.max_wait_time),
+        truck_stops_gdf_half, range_miles, charging_time, max_wait_time, queue_model
     )
 
     truck_stops_gdf["Half_CPD"] = truck_stops_gdf_half["CPD"]
@@ -675,7 +840,113 @@ if __name__ == "__main__":
         1.0 - truck_stops_gdf["Min_Ratio"] / truck_stops_gdf["Half_Ratio"]
     )
 
-    saveShapefile(
-        truck_stops_gdf,
-        f"{top_dir}/data/Truck_Stop_Parking/Truck_Stop_Parking_Along_Interstate_with_min_chargers_range_{args.range_miles}_chargingtime_{args.charging_time}_maxwait_{args.max_wait_time}.shp",
+    return truck_stops_gdf
+
+
+def summarize_charger_ensemble(truck_stops_gdfs):
+    """
+    Summarizes the charger needs for each realization in an ensemble of truck stop selections
+
+    Parameters
+    ----------
+    truck_stops_gdfs (list of gpd.GeoDataFrame): Truck stops for each realization, as produced by evaluate_charger_needs()
+
+    Returns
+    -------
+    ensemble_summary_df (pd.DataFrame): Dataframe with one row per realization containing the number of selected stops, the total minimum chargers and charges per day for the full and half flows, and the mean collective savings
+    """
+    ensemble_summary_df = pd.DataFrame(
+        {
+            "N Stops": [len(gdf) for gdf in truck_stops_gdfs],
+            "Tot CPD": [gdf["CPD"].sum() for gdf in truck_stops_gdfs],
+            "Tot Min_Charge": [gdf["Min_Charge"].sum() for gdf in truck_stops_gdfs],
+            "Tot Half_CPD": [gdf["Half_CPD"].sum() for gdf in truck_stops_gdfs],
+            "Tot Half_Charge": [gdf["Half_Charge"].sum() for gdf in truck_stops_gdfs],
+            "Av Col_Save": [gdf["Col_Save"].mean() for gdf in truck_stops_gdfs],
+        }
+    )
+
+    return ensemble_summary_df
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "-c", "--charging_time", default="4", type=float, help="Charging time (hours)"
+)
+parser.add_argument(
+    "-m",
+    "--max_wait_time",
+    default="1",
+    type=float,
+    help="Maximum allowable wait time (hours)",
+)
+parser.add_argument(
+    "-r", "--range_miles", default="200", type=float, help="Truck range (miles)"
+)
+parser.add_argument(
+    "-q",
+    "--queue_model",
+    default="binomial",
+    choices=QUEUE_MODELS,
+    help="Queue model used to evaluate the average wait time",
+)
+parser.add_argument(
+    "-s",
+    "--seed",
+    default=None,
+    type=int,
+    help="Seed for the random selection of truck stops",
+)
+parser.add_argument(
+    "-n",
+    "--n_realizations",
+    default="1",
+    type=int,
+    help="Number of independent random selections of truck stops to evaluate",
+)
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    # Get the path to the top level of the Git repo
+    top_dir = get_top_dir()
+
+    # Persist the tabulated queue wait times so they can be reused between runs
+    set_queue_wait_table_path(f"{top_dir}/data/queue_wait_table.npy")
+
+    # Randomly sparsify truck stops so their typical spatial separation is appropriate for the given truck range
+    truck_stops_gdf = get_truck_stops_with_trips(top_dir)
+
+    if args.n_realizations > 1:
+        truck_stops_gdfs = select_truck_stops_ensemble(
+            truck_stops_gdf, args.n_realizations, seed=args.seed
+        )
+    else:
+        truck_stops_gdfs = [select_truck_stops(truck_stops_gdf, seed=args.seed)]
+
+    save_path_base = get_min_chargers_save_path(
+        top_dir,
+        args.range_miles,
+        args.charging_time,
+        args.max_wait_time,
+        args.queue_model,
     )
+
+    for i_realization in range(len(truck_stops_gdfs)):
+        # For each truck stop, calculate the number of chargers needed to keep quick charging wait times below the maximum, for both the full and half highway flows
+        truck_stops_gdfs[i_realization] = evaluate_charger_needs(
+            truck_stops_gdfs[i_realization],
+            args.range_miles,
+            float(args.charging_time),
+            float(args.max_wait_time),
+            args.queue_model,
+        )
+
+    # Save the truck stops for the first realization
+    saveShapefile(truck_stops_gdfs[0], f"{save_path_base}.shp")
+
+    # Report the charger needs as statistics over the ensemble of realizations
+    if len(truck_stops_gdfs) > 1:
+        ensemble_summary_df = summarize_charger_ensemble(truck_stops_gdfs)
+        ensemble_summary_df.to_csv(f"{save_path_base}_ensemble.csv", index=False)
+        print(ensemble_summary_df.agg(["mean", "std"]))
@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Created on Mon Oct 19 13:05:00 2026
+
+@author: danikam
+
+Vectorized evaluation of the queueing model used in AnalyzeTruckStopCharging.py to estimate the average time trucks wait for a charger at a truck stop.
+"""
+
+import numpy as np
+from scipy.stats import binom, norm
+import os
+
+HOURS_PER_DAY = 24.0
+
+# Minimum expected number of successes (and failures) for the gaussian approximation of the binomial distribution to be used
+GAUSSIAN_APPROX_MIN = 5
+
+# Queue models available to size the number of chargers: the custom binomial model implemented here, and the standard M/M/c and M/D/c (Erlang-C) models
+QUEUE_MODELS = ["binomial", "mmc", "mdc"]
+
+# Allen-Cunneen factor (c_a^2 + c_s^2) / 2 scaling the M/M/c wait to approximate the M/D/c wait, for Poisson arrivals (c_a = 1) and fixed charging times (c_s = 0)
+MDC_WAIT_FACTOR = 0.5
+
+# Maximum number of (element, queue length) cells evaluated at once in average_wait_time_vectorized()
+MAX_CELLS_PER_CHUNK = 2**22
+
+# Cache of the normalized queue wait table, grown as needed, and the default path to persist it to
+_queue_wait_table = None
+_queue_wait_table_path = None
+
+
+def set_queue_wait_table_path(table_path):
+    """
+    Sets the default path of the .npy file that the normalized queue wait table is loaded from and saved to
+
+    Parameters
+    ----------
+    table_path (string): Path to the .npy file, or None to only cache the table in memory
+
+    Returns
+    -------
+    None
+    """
+    global _queue_wait_table_path
+    _queue_wait_table_path = table_path
+
+
+def make_queue_wait_table(max_chargers):
+    """
+    Tabulates the average time that a truck at the back of a queue waits for a charger to free up, in units of the charging time, for every number of chargers n up to max_chargers and every queue length r < n.
+
+    The time for the first truck in a queue to get a charger satisfies the closed-form integral
+        int_a^T (1 - t/T)^k dt = T / (k+1) * (1 - a/T)^(k+1),
+    so in units of the charging time T the recursion in mu_queue_lt_chargers() becomes u_0 = 1/(n+1), u_i = (1 - u_(i-1))^(n-i+1) / (n-i+1), independent of T.
+
+    Parameters
+    ----------
+    max_chargers (int): Maximum number of chargers to tabulate
+
+    Returns
+    -------
+    table (np.array): Array of shape (max_chargers+1, max_chargers), whose entry [n, r] is the average wait (in units of the charging time) for a truck with r trucks queued in front of it at a stop with n chargers, for r < n. Entries with r >= n are NaN.
+
+    NOTE: For r > 0, the table matches mu_queue_lt_chargers() in AnalyzeTruckStopCharging.py, which sums the wait of the last truck to reach the front of the queue with the wait of the truck at the front of the queue (i.e. 2 u_r).
+    """
+    max_chargers = max(int(max_chargers), 1)
+    table = np.full((max_chargers + 1, max_chargers), np.nan)
+
+    n_chargers = np.arange(max_chargers + 1, dtype=float)
+
+    # Average wait for the first truck in the queue, for every number of chargers at once
+    u_front = np.zeros(max_chargers + 1)
+    u_front[1:] = 1.0 / (n_chargers[1:] + 1.0)
+    table[1:, 0] = u_front[1:]
+
+    # Step through the queue, updating all numbers of chargers with more chargers than trucks queued
+    for i_queued in range(1, max_chargers):
+        valid = n_chargers > i_queued
+        exponent = n_chargers[valid] - i_queued + 1
+        u_front[valid] = (1.0 - u_front[valid]) ** exponent / exponent
+        table[valid, i_queued] = 2.0 * u_front[valid]
+
+    return table
+
+
+def get_queue_wait_table(max_chargers, table_path=None):
+    """
+    Gets a normalized queue wait table (see make_queue_wait_table()) covering at least the given number of chargers, reusing the cached table or the one persisted at table_path if they are large enough.
+
+    Parameters
+    ----------
+    max_chargers (int): Maximum number of chargers the table needs to cover
+    table_path (string): Path to a .npy file to load the table from (memory-mapped) and save newly built tables to. Defaults to the path set with set_queue_wait_table_path(). If neither is set, the table is only cached in memory.
+
+    Returns
+    -------
+    table (np.array): Normalized queue wait table
+    """
+    global _queue_wait_table
+    max_chargers = int(max_chargers)
+    if table_path is None:
+        table_path = _queue_wait_table_path
+
+    if _queue_wait_table is not None and _queue_wait_table.shape[0] > max_chargers:
+        return _queue_wait_table
+
+    if table_path is not None and os.path.isfile(table_path):
+        table = np.load(table_path, mmap_mode="r")
+        if table.shape[0] > max_chargers:
+            _queue_wait_table = table
+            return table
+
+    # Grow the table geometrically so that repeated requests for slightly larger tables don't rebuild it each time
+    current_size = 0 if _queue_wait_table is None else _queue_wait_table.shape[1]
+    table = make_queue_wait_table(max(max_chargers, 2 * current_size))
+
+    if table_path is not None:
+        table_dir = os.path.dirname(table_path)
+        if table_dir and not os.path.exists(table_dir):
+            os.makedirs(table_dir)
+        # Write to a temporary file first so that other processes never load a partially written table
+        temp_path = f"{table_path}.{os.getpid()}.tmp.npy"
+        np.save(temp_path, table)
+        os.replace(temp_path, table_path)
+
+    _queue_wait_table = table
+    return table
+
+
+def p_x_trucks_at_stop_vectorized(charges_per_day, x_trucks, charging_time=0.5):
+    """
+    Vectorized version of p_x_trucks_at_stop() in AnalyzeTruckStopCharging.py. Calculates the binomial probability of there being x_trucks other trucks charging at the stop when a given truck arrives, using the gaussian approximation where it applies.
+
+    Parameters
+    ----------
+    charges_per_day (np.array): Average number of truck charges at the station per day (truncated to integers)
+    x_trucks (np.array): Number of trucks already at the station when a truck arrives
+    charging_time (np.array): Average amount of time needed for each truck to charge (in hours)
+
+    All parameters are broadcast against each other.
+
+    Returns
+    -------
+    p_x_at_stop (np.array): Binomial probabilities
+    """
+    charges_per_day, x_trucks, charging_time = np.broadcast_arrays(
+        np.asarray(charges_per_day).astype(int),
+        np.asarray(x_trucks),
+        np.asarray(charging_time, dtype=float),
+    )
+
+    # Probability that any given truck is charging at the stop is just given by the ratio of charging time to the number of hours (24) in a day
+    p_given_truck_at_stop = charging_time / HOURS_PER_DAY
+
+    # If np>5 and n(1-p)>5, use the gaussian approximation of the binomial distribution
+    use_gaussian = (charges_per_day * p_given_truck_at_stop > GAUSSIAN_APPROX_MIN) & (
+        charges_per_day * (1 - p_given_truck_at_stop) > GAUSSIAN_APPROX_MIN
+    )
+
+    p_x_at_stop = np.empty(charges_per_day.shape)
+    mean = charges_per_day[use_gaussian] * p_given_truck_at_stop[use_gaussian]
+    p_x_at_stop[use_gaussian] = norm.pdf(
+        x_trucks[use_gaussian],
+        loc=mean,
+        scale=np.sqrt(mean * (1 - p_given_truck_at_stop[use_gaussian])),
+    )
+    p_x_at_stop[~use_gaussian] = binom.pmf(
+        x_trucks[~use_gaussian],
+        charges_per_day[~use_gaussian] - 1,
+        p_given_truck_at_stop[~use_gaussian],
+    )
+
+    return p_x_at_stop
+
+
+def mu_queue_vectorized(trucks_queued, n_chargers, charging_time=0.5, table=None):
+    """
+    Vectorized, closed-form version of mu_queue() in AnalyzeTruckStopCharging.py. Calculates the average time that a truck at the back of a queue spends waiting for a charger to free up.
+
+    Parameters
+    ----------
+    trucks_queued (np.array): Trucks queued in front of the truck we're interested in
+    n_chargers (np.array): Number of chargers at the truck stop
+    charging_time (np.array): Average amount of time needed for each truck to charge (in hours)
+    table (np.array): Normalized queue wait table. If None, the cached table is used (and grown if needed).
+
+    All parameters are broadcast against each other.
+
+    Returns
+    -------
+    mu_queue (np.array): Average time the truck spends waiting for a charger to free up
+    """
+    trucks_queued, n_chargers, charging_time = np.broadcast_arrays(
+        np.asarray(trucks_queued).astype(int),
+        np.asarray(n_chargers).astype(int),
+        np.asarray(charging_time, dtype=float),
+    )
+    if table is None:
+        table = get_queue_wait_table(np.max(n_chargers, initial=1))
+
+    # Each full set of n_chargers trucks in the queue adds a full charging time to the wait, and the remaining trucks are handled by the tabulated wait
+    full_sets = trucks_queued // n_chargers
+    remainder = trucks_queued - full_sets * n_chargers
+
+    return charging_time * (table[n_chargers, remainder] + full_sets)
+
+
+def average_wait_time_vectorized(
+    charges_per_day, n_chargers, charging_time=0.5, table=None
+):
+    """
+    Vectorized version of average_wait_time() in AnalyzeTruckStopCharging.py. Calculates the average time that a truck will spend waiting for a charger, for arrays of truck stops.
+
+    Parameters
+    ----------
+    charges_per_day (np.array): Average number of truck charges at the station per day (truncated to integers)
+    n_chargers (np.array): Number of chargers at the truck stop
+    charging_time (np.array): Average amount of time needed for each truck to charge (in hours)
+    table (np.array): Normalized queue wait table. If None, the cached table is used (and grown if needed).
+
+    All parameters are broadcast against each other.
+
+    Returns
+    -------
+    av_t_wait (np.array): Average time each truck spends waiting for a charger to free up, with the broadcast shape of the inputs
+    """
+    charges_per_day, n_chargers, charging_time = np.broadcast_arrays(
+        np.asarray(charges_per_day).astype(int),
+        np.asarray(n_chargers).astype(int),
+        np.asarray(charging_time, dtype=float),
+    )
+    shape = charges_per_day.shape
+    charges_per_day = charges_per_day.ravel()
+    n_chargers = n_chargers.ravel()
+    charging_time = charging_time.ravel()
+
+    av_t_wait = np.zeros(len(charges_per_day))
+    if len(av_t_wait) == 0:
+        return av_t_wait.reshape(shape)
+
+    if table is None:
+        table = get_queue_wait_table(np.max(n_chargers, initial=1))
+
+    # Sort by the number of charges per day, and split into chunks whose (element, queue length) grid stays within MAX_CELLS_PER_CHUNK cells
+    order = np.argsort(charges_per_day, kind="stable")
+    sorted_charges = np.maximum(charges_per_day[order], 1)
+    max_chunk_sizes = np.maximum(MAX_CELLS_PER_CHUNK // sorted_charges, 1)
+    chunk_slack = max_chunk_sizes - np.arange(1, len(order) + 1)
+
+    start = 0
+    while start < len(order):
+        end = max(start + 1, np.searchsorted(-chunk_slack, start, side="right"))
+        chunk = order[start:end]
+        start = end
+
+        chunk_charges = charges_per_day[chunk][:, np.newaxis]
+        chunk_chargers = n_chargers[chunk][:, np.newaxis]
+        chunk_time = charging_time[chunk][:, np.newaxis]
+
+        # Possible numbers of trucks already at the station, from n_chargers up to charges_per_day - 1
+        x_trucks = np.arange(max(int(chunk_charges.max()), 1))[np.newaxis, :]
+        in_queue = (x_trucks >= chunk_chargers) & (x_trucks < chunk_charges)
+        if not np.any(in_queue):
+            continue
+
+        p_x_values = np.where(
+            in_queue,
+            p_x_trucks_at_stop_vectorized(chunk_charges, x_trucks, chunk_time),
+            0.0,
+        )
+        mu_values = np.where(
+            in_queue,
+            mu_queue_vectorized(
+                np.where(in_queue, x_trucks - chunk_chargers, 0),
+                chunk_chargers,
+                chunk_time,
+                table,
+            ),
+            0.0,
+        )
+        av_t_wait[chunk] = np.sum(p_x_values * mu_values, axis=1)
+
+    return av_t_wait.reshape(shape)
+
+
+def get_erlang_wait_factor(queue_model):
+    """
+    Gets the factor scaling the M/M/c mean wait for the given Erlang-C queue model
+
+    Parameters
+    ----------
+    queue_model (string): Queue model, either 'mmc' or 'mdc'
+
+    Returns
+    -------
+    wait_factor (float): Factor scaling the M/M/c mean wait
+    """
+    if queue_model == "mmc":
+        return 1.0
+    elif queue_model == "mdc":
+        return MDC_WAIT_FACTOR
+    else:
+        raise ValueError(
+            f"Unknown Erlang-C queue model {queue_model}. Options are 'mmc' and 'mdc'."
+        )
+
+
+def erlang_c_vectorized(offered_load, n_chargers):
+    """
+    Calculates the Erlang-C probability that an arriving truck has to wait for a charger, for arrays of truck stops.
+
+    The Erlang-B blocking probability is evaluated with the numerically stable recurrence
+        B(0) = 1, B(k) = a B(k-1) / (k + a B(k-1)),
+    and converted to the Erlang-C probability with C = B / (1 - (a/n) (1 - B)).
+
+    Parameters
+    ----------
+    offered_load (np.array): Average number of trucks charging at once if there were unlimited chargers (in Erlangs), i.e. the arrival rate times the charging time
+    n_chargers (np.array): Number of chargers at the truck stop
+
+    All parameters are broadcast against each other.
+
+    Returns
+    -------
+    p_wait (np.array): Probability that an arriving truck waits for a charger. This is 1 where the offered load is at least the number of chargers, as the queue then grows without bound.
+    """
+    offered_load, n_chargers = np.broadcast_arrays(
+        np.asarray(offered_load, dtype=float), np.asarray(n_chargers).astype(int)
+    )
+
+    # Step the Erlang-B recurrence up to the largest number of chargers, freezing each element once it reaches its own number of chargers
+    erlang_b = np.ones(offered_load.shape)
+    for k in range(1, int(np.max(n_chargers, initial=0)) + 1):
+        update = n_chargers >= k
+        erlang_b = np.where(
+            update, offered_load * erlang_b / (k + offered_load * erlang_b), erlang_b
+        )
+
+    stable = offered_load < n_chargers
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p_wait = np.where(
+            stable,
+            erlang_b / (1.0 - offered_load / n_chargers * (1.0 - erlang_b)),
+            1.0,
+        )
+
+    return p_wait
+
+
+def average_wait_time_erlang(
+    charges_per_day, n_chargers, charging_time=0.5, queue_model="mmc"
+):
+    """
+    Calculates the average time that a truck will spend waiting for a charger with the M/M/c or M/D/c queue model, for arrays of truck stops. Trucks arrive as a Poisson process at a constant rate over the day.
+
+    Parameters
+    ----------
+    charges_per_day (np.array): Average number of truck charges at the station per day
+    n_chargers (np.array): Number of chargers at the truck stop
+    charging_time (np.array): Average amount of time needed for each truck to charge (in hours)
+    queue_model (string): 'mmc' for exponentially distributed charging times, or 'mdc' for fixed charging times (Allen-Cunneen approximation)
+
+    All parameters are broadcast against each other.
+
+    Returns
+    -------
+    av_t_wait (np.array): Average time each truck spends waiting for a charger to free up (inf where the offered load is at least the number of chargers)
+    """
+    wait_factor = get_erlang_wait_factor(queue_model)
+    charges_per_day, n_chargers, charging_time = np.broadcast_arrays(
+        np.asarray(charges_per_day, dtype=float),
+        np.asarray(n_chargers).astype(int),
+        np.asarray(charging_time, dtype=float),
+    )
+    offered_load = charges_per_day * charging_time / HOURS_PER_DAY
+
+    p_wait = erlang_c_vectorized(offered_load, n_chargers)
+    with np.errstate(divide="ignore"):
+        av_t_wait = np.where(
+            offered_load < n_chargers,
+            wait_factor * p_wait * charging_time / (n_chargers - offered_load),
+            np.inf,
+        )
+
+    return av_t_wait
+
+
+def solve_min_chargers_erlang(
+    charges_per_day, charging_time=4.0, max_wait_time=1.0, queue_model="mmc"
+):
+    """
+    Calculates the minimum number of chargers needed to keep the average wait time (with the M/M/c or M/D/c queue model) below the given value, for an array of truck stops at once.
+
+    The Erlang-B recurrence is stepped up one charger at a time for all truck stops together, and each stop drops out as soon as its wait falls below the maximum, so every stop is sized in a single pass.
+
+    Parameters
+    ----------
+    charges_per_day (np.array): Number of truck charges at each station per day
+    charging_time (float): Average amount of time needed for each truck to charge (in hours)
+    max_wait_time (float): Maximum allowable average wait time (in hours)
+    queue_model (string): 'mmc' for exponentially distributed charging times, or 'mdc' for fixed charging times (Allen-Cunneen approximation)
+
+    Returns
+    -------
+    min_chargers (np.array): Minumum number of chargers needed at each station. As in the binomial model, the number of charges per day is taken to always keep the wait below the maximum.
+    """
+    wait_factor = get_erlang_wait_factor(queue_model)
+    charges_per_day = np.asarray(charges_per_day, dtype=float)
+    offered_load = charges_per_day.ravel() * charging_time / HOURS_PER_DAY
+
+    min_chargers = np.zeros(len(offered_load), dtype=int)
+    unsolved = np.arange(len(offered_load))
+    erlang_b = np.ones(len(offered_load))
+
+    n_chargers = 0
+    while len(unsolved) > 0:
+        n_chargers += 1
+        load = offered_load[unsolved]
+        erlang_b = load * erlang_b / (n_chargers + load * erlang_b)
+
+        # Only stops with fewer trucks charging at once on average than chargers reach a steady state
+        stable = load < n_chargers
+        with np.errstate(divide="ignore", invalid="ignore"):
+            p_wait = erlang_b / (1.0 - load / n_chargers * (1.0 - erlang_b))
+            av_t_wait = np.where(
+                stable,
+                wait_factor * p_wait * charging_time / (n_chargers - load),
+                np.inf,
+            )
+
+        solved = (av_t_wait < max_wait_time) | (
+            stable & (n_chargers >= charges_per_day.ravel()[unsolved])
+        )
+        min_chargers[unsolved[solved]] = n_chargers
+        unsolved = unsolved[~solved]
+        erlang_b = erlang_b[~solved]
+
+    return min_chargers.reshape(charges_per_day.shape)
+
+
+def average_wait_time_by_model(
+    charges_per_day, n_chargers, charging_time=0.5, queue_model="binomial"
+):
+    """
+    Calculates the average time that a truck will spend waiting for a charger with the given queue model, for arrays of truck stops
+
+    Parameters
+    ----------
+    charges_per_day (np.array): Average number of truck charges at the station per day
+    n_chargers (np.array): Number of chargers at the truck stop
+    charging_time (np.array): Average amount of time needed for each truck to charge (in hours)
+    queue_model (string): One of QUEUE_MODELS
+
+    Returns
+    -------
+    av_t_wait (np.array): Average time each truck spends waiting for a charger to free up
+    """
+    if queue_model == "binomial":
+        return average_wait_time_vectorized(charges_per_day, n_chargers, charging_time)
+    elif queue_model in QUEUE_MODELS:
+        return average_wait_time_erlang(
+            charges_per_day, n_chargers, charging_time, queue_model
+        )
+    else:
+        raise ValueError(
+            f"Unknown queue model {queue_model}. Options are {QUEUE_MODELS}."
+        )
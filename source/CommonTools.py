@@ -1,7 +1,17 @@
 from pathlib import Path
 import os
+import re
+import hashlib
+import inspect
+import pandas as pd
 import geopandas as gpd
 
+# Extensions of the files making up a shapefile, which are all hashed when a shapefile is an input to a cached stage
+SHAPEFILE_EXTENSIONS = [".shp", ".shx", ".dbf", ".prj", ".cpg"]
+
+# Number of hexadecimal characters of the stage key included in cached file names
+STAGE_KEY_LENGTH = 16
+
 
 def get_top_dir():
     """
@@ -131,3 +141,100 @@ def state_names_to_abbr(df, state_header):
     df[state_header] = df[state_header].map(us_state_abbreviations)
 
     return df
+
+
+def hash_file(path, chunk_size=2**20):
+    """
+    Evaluates a hash of the contents of a file. For shapefiles, the contents of all the files making up the shapefile are included.
+
+    Parameters
+    ----------
+    path (string): Path to the file
+    chunk_size (int): Number of bytes read at a time
+
+    Returns
+    -------
+    file_hash (string): Hexadecimal SHA-256 hash of the file contents
+    """
+    paths = [path]
+    if path.endswith(".shp"):
+        paths = [
+            f"{path[:-4]}{extension}"
+            for extension in SHAPEFILE_EXTENSIONS
+            if os.path.isfile(f"{path[:-4]}{extension}")
+        ]
+
+    hasher = hashlib.sha256()
+    for file_path in paths:
+        with open(file_path, "rb") as file:
+            for chunk in iter(lambda: file.read(chunk_size), b""):
+                hasher.update(chunk)
+
+    return hasher.hexdigest()
+
+
+def get_stage_key(input_paths=(), params=None, functions=()):
+    """
+    Evaluates a key identifying the output of a processing stage, from the contents of its input files, its parameters and the source code of the functions it runs
+
+    Parameters
+    ----------
+    input_paths (list of strings): Paths to the input files of the stage
+    params (dict): Parameters of the stage (e.g. thresholds, attribute names, or the keys of upstream stages). Values are included via their repr().
+    functions (list of functions): Functions run by the stage, whose source code is included so that the key changes when the code does
+
+    Returns
+    -------
+    stage_key (string): Hexadecimal SHA-256 hash identifying the stage output
+    """
+    hasher = hashlib.sha256()
+    for input_path in input_paths:
+        hasher.update(hash_file(input_path).encode())
+    for name, value in sorted((params or {}).items()):
+        hasher.update(f"{name}={value!r}".encode())
+    for function in functions:
+        hasher.update(inspect.getsource(function).encode())
+
+    return hasher.hexdigest()
+
+
+def run_cached_stage(stage_name, stage_key, compute, cache_dir, geo=True):
+    """
+    Loads the output of a processing stage from the cache if it was already produced with the same key, and otherwise produces it and saves it to the cache (as GeoParquet, or plain Parquet for stages without geometry), replacing any stale outputs of the stage.
+
+    Parameters
+    ----------
+    stage_name (string): Name of the stage, used to name the cached file
+    stage_key (string): Key identifying the stage output, as produced by get_stage_key()
+    compute (function): Function with no arguments that produces the stage output as a GeoDataFrame (or a DataFrame if geo is False)
+    cache_dir (string): Directory containing the cached stage outputs
+    geo (bool): Whether the stage output is a GeoDataFrame
+
+    Returns
+    -------
+    stage_gdf (gpd.GeoDataFrame or pd.DataFrame): Output of the stage
+    """
+    cache_path = f"{cache_dir}/{stage_name}_{stage_key[:STAGE_KEY_LENGTH]}.parquet"
+    if os.path.isfile(cache_path):
+        print(f"Reading cached {stage_name} from {cache_path}")
+        if geo:
+            return gpd.read_parquet(cache_path)
+        return pd.read_parquet(cache_path)
+
+    print(f"Producing {stage_name}")
+    stage_gdf = compute()
+
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+
+    # Remove outputs of the stage produced with other keys, which are now stale
+    stage_file_pattern = re.compile(
+        f"{re.escape(stage_name)}_[0-9a-f]{{{STAGE_KEY_LENGTH}}}\\.parquet"
+    )
+    for file_name in os.listdir(cache_dir):
+        if stage_file_pattern.fullmatch(file_name):
+            os.remove(f"{cache_dir}/{file_name}")
+
+    stage_gdf.to_parquet(cache_path)
+
+    return stage_gdf
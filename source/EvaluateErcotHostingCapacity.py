@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Created on Mon Oct 19 20:15:00 2026
+
+@author: danikam
+
+Compares the hourly EV charging demand in each ERCOT weather zone with the headroom between the historical load and the observed peak load, for every historical hour in the ERCOT load data. The EV demand is scaled by a range of adoption multipliers in a single array broadcast, to find the adoption at which the combined load in each zone first exceeds its historical peak.
+"""
+
+import numpy as np
+import pandas as pd
+import argparse
+import os
+
+from CommonTools import get_top_dir
+from MakeChargingLoadByZone import TOTAL_LABEL
+from AnalyzeErcotData import zone_mapping, get_load_data, get_load_data_paths
+
+HOURS_PER_DAY = 24
+
+# Adoption multipliers applied to the EV charging demand by default
+ADOPTION_MULTIPLIERS = np.round(np.arange(0.25, 10.01, 0.25), 2)
+
+# Number of adoption multipliers whose hourly headroom is evaluated at once
+MULTIPLIER_CHUNK_SIZE = 16
+
+# Percentiles of the hourly headroom reported for each zone and adoption multiplier
+HEADROOM_PERCENTILES = [1, 5, 50]
+
+
+def get_hourly_zone_ev_demand(daily_ev_load_df, profile="extreme"):
+    """
+    Averages the total daily EV load in each zone, produced by MakeChargingLoadByZone.py, into hourly bins
+
+    Parameters
+    ----------
+    daily_ev_load_df (pd.DataFrame): Tidy dataframe of daily EV loads, as produced by MakeChargingLoadByZone.get_daily_ev_demands()
+    profile (string): Name of the daily load profile to use
+
+    Returns
+    -------
+    zones (list of strings): Name of each zone in the ERCOT load data (e.g. 'COAST')
+    ev_demand (np.array): Array of shape (number of zones, 24) containing the average EV demand in each zone over each hour of the day, starting at midnight (MW)
+    """
+    zone_totals_df = daily_ev_load_df[
+        (daily_ev_load_df["Profile"] == profile)
+        & (daily_ev_load_df["Nearest Center"] == TOTAL_LABEL)
+    ]
+
+    zones = []
+    ev_demand = []
+    for zone, zone_df in zone_totals_df.groupby("zone"):
+        # Average the finely sampled load over each hour of the day
+        hour_bins = np.minimum(
+            zone_df["Hours"].to_numpy(dtype=float).astype(int), HOURS_PER_DAY - 1
+        )
+        ev_demand.append(
+            np.bincount(
+                hour_bins,
+                weights=zone_df["Power (MW)"].to_numpy(dtype=float),
+                minlength=HOURS_PER_DAY,
+            )
+            / np.bincount(hour_bins, minlength=HOURS_PER_DAY)
+        )
+        zones.append(zone_mapping[zone])
+
+    return zones, np.array(ev_demand).reshape(len(zones), HOURS_PER_DAY)
+
+
+def align_ev_demand(ev_demand, hour_ending):
+    """
+    Lines up the EV demand with every historical hour of the load data
+
+    Parameters
+    ----------
+    ev_demand (np.array): Array of shape (number of zones, number of hours) containing the EV demand in each zone (MW), either for each hour of the day (24 hours, starting at midnight) or for each hour of the year (starting at midnight on January 1st)
+    hour_ending (pd.Series): End of each historical hour
+
+    Returns
+    -------
+    aligned_ev_demand (np.array): Array of shape (number of historical hours, number of zones) containing the EV demand in each zone during each historical hour (MW)
+
+    NOTE: For hourly demand over the year, hours past the end of the given demand (e.g. December 31st of leap years for 8760 hours) take the demand of the last hour.
+    """
+    ev_demand = np.asarray(ev_demand, dtype=float)
+    hour_beginning = hour_ending - pd.Timedelta(hours=1)
+
+    if ev_demand.shape[1] == HOURS_PER_DAY:
+        hour_indices = hour_beginning.dt.hour.to_numpy()
+    else:
+        hour_indices = np.minimum(
+            (hour_beginning.dt.dayofyear.to_numpy() - 1) * HOURS_PER_DAY
+            + hour_beginning.dt.hour.to_numpy(),
+            ev_demand.shape[1] - 1,
+        )
+
+    return ev_demand[:, hour_indices].T
+
+
+def evaluate_headroom(historical_load, aligned_ev_demand, multipliers):
+    """
+    Evaluates the headroom between the combined historical and EV load and the observed peak load in each zone, for every historical hour and adoption multiplier at once
+
+    Parameters
+    ----------
+    historical_load (np.array): Array of shape (number of historical hours, number of zones) containing the historical load in each zone (MW)
+    aligned_ev_demand (np.array): Array of the same shape containing the EV demand in each zone during each historical hour (MW)
+    multipliers (np.array): Adoption multipliers to scale the EV demand by
+
+    Returns
+    -------
+    headroom (np.array): Array of shape (number of multipliers, number of historical hours, number of zones) containing the observed peak load minus the combined load (MW). Negative values mean the combined load exceeds the historical peak.
+    """
+    peak_load = np.nanmax(historical_load, axis=0)
+    base_headroom = peak_load[np.newaxis, :] - historical_load
+
+    return (
+        base_headroom[np.newaxis, :, :]
+        - np.asarray(multipliers, dtype=float)[:, np.newaxis, np.newaxis]
+        * aligned_ev_demand[np.newaxis, :, :]
+    )
+
+
+def summarize_headroom(headroom, zones, multipliers):
+    """
+    Summarizes the hourly headroom in each zone for each adoption multiplier
+
+    Parameters
+    ----------
+    headroom (np.array): Array of shape (number of multipliers, number of historical hours, number of zones), as produced by evaluate_headroom()
+    zones (list of strings): Name of each zone
+    multipliers (np.array): Adoption multipliers
+
+    Returns
+    -------
+    headroom_df (pd.DataFrame): Dataframe with one row per multiplier and zone, containing the number and fraction of historical hours exceeding the peak, the minimum headroom, and the HEADROOM_PERCENTILES of the headroom
+    """
+    n_multipliers, n_hours, n_zones = headroom.shape
+    exceed_hours = np.sum(headroom < 0, axis=1)
+    headroom_percentiles = np.nanpercentile(headroom, HEADROOM_PERCENTILES, axis=1)
+
+    headroom_df = pd.DataFrame(
+        {
+            "Multiplier": np.repeat(multipliers, n_zones),
+            "zone": np.tile(zones, n_multipliers),
+            "Exceed Hours": exceed_hours.ravel(),
+            "Exceed Frac": exceed_hours.ravel() / n_hours,
+            "Min Headroom (MW)": np.nanmin(headroom, axis=1).ravel(),
+        }
+    )
+    for percentile, percentile_headroom in zip(
+        HEADROOM_PERCENTILES, headroom_percentiles
+    ):
+        headroom_df[f"P{percentile:02d} Headroom (MW)"] = percentile_headroom.ravel()
+
+    return headroom_df
+
+
+def evaluate_critical_adoption(
+    historical_load, aligned_ev_demand, hour_ending, zones, allowed_exceed_hours=0
+):
+    """
+    Evaluates the exact adoption multiplier at which the combined load in each zone exceeds its historical peak in more than the allowed number of historical hours, along with the historical hour that tips it over
+
+    Parameters
+    ----------
+    historical_load (np.array): Array of shape (number of historical hours, number of zones) containing the historical load in each zone (MW)
+    aligned_ev_demand (np.array): Array of the same shape containing the EV demand in each zone during each historical hour (MW)
+    hour_ending (pd.Series): End of each historical hour
+    zones (list of strings): Name of each zone
+    allowed_exceed_hours (int): Number of historical hours in which the combined load is allowed to exceed the historical peak
+
+    Returns
+    -------
+    critical_df (pd.DataFrame): Dataframe with one row per zone, containing the historical peak load, the critical adoption multiplier (inf if it's never exceeded) and the hour ending in which the peak is exceeded once the multiplier goes above it
+
+    NOTE: With no allowed exceedance hours, the critical multiplier is 0 for any zone with EV demand during the hour of its historical peak.
+    """
+    peak_load = np.nanmax(historical_load, axis=0)
+
+    # In each hour, the combined load reaches the peak when the multiplier equals the headroom divided by the EV demand
+    with np.errstate(divide="ignore", invalid="ignore"):
+        hourly_critical = np.where(
+            aligned_ev_demand > 0,
+            (peak_load[np.newaxis, :] - historical_load) / aligned_ev_demand,
+            np.inf,
+        )
+    hourly_critical = np.where(np.isnan(hourly_critical), np.inf, hourly_critical)
+
+    # The peak is exceeded in more than the allowed number of hours once the multiplier goes above the next smallest hourly critical multiplier
+    critical_hours = np.argpartition(hourly_critical, allowed_exceed_hours, axis=0)[
+        allowed_exceed_hours
+    ]
+    critical_multipliers = hourly_critical[critical_hours, np.arange(len(zones))]
+
+    return pd.DataFrame(
+        {
+            "zone": zones,
+            "Peak Load (MW)": peak_load,
+            "Critical Multiplier": critical_multipliers,
+            "Critical Hour Ending": np.where(
+                np.isfinite(critical_multipliers),
+                hour_ending.to_numpy()[critical_hours],
+                np.datetime64("NaT"),
+            ),
+        }
+    )
+
+
+def evaluate_hosting_capacity(
+    load_data_df,
+    zones,
+    ev_demand,
+    multipliers,
+    allowed_exceed_hours=0,
+    chunk_size=MULTIPLIER_CHUNK_SIZE,
+):
+    """
+    Evaluates the hourly headroom summary for each adoption multiplier, and the critical adoption multiplier, for each zone with EV demand
+
+    Parameters
+    ----------
+    load_data_df (pd.DataFrame): Dataframe containing the hourly load in each weather zone (MW), with the end of each hour in the 'Hour Ending' column
+    zones (list of strings): Name of each zone in the load data with EV demand
+    ev_demand (np.array): Array of shape (number of zones, number of hours) containing the EV demand in each zone (MW), for each hour of the day or of the year
+    multipliers (np.array): Adoption multipliers to scale the EV demand by
+    allowed_exceed_hours (int): Number of historical hours in which the combined load is allowed to exceed the historical peak when evaluating the critical multiplier
+    chunk_size (int): Number of multipliers to evaluate the headroom for at once, which limits the memory used
+
+    Returns
+    -------
+    headroom_df (pd.DataFrame): Dataframe with the headroom summary for each multiplier and zone, as produced by summarize_headroom()
+    critical_df (pd.DataFrame): Dataframe with the critical adoption multiplier for each zone, as produced by evaluate_critical_adoption()
+    """
+    hour_ending = load_data_df["Hour Ending"]
+    historical_load = load_data_df[zones].to_numpy(dtype=float)
+    aligned_ev_demand = align_ev_demand(ev_demand, hour_ending)
+
+    multipliers = np.asarray(multipliers, dtype=float)
+    headroom_dfs = []
+    for chunk_start in range(0, len(multipliers), chunk_size):
+        chunk_multipliers = multipliers[chunk_start : chunk_start + chunk_size]
+        headroom = evaluate_headroom(
+            historical_load, aligned_ev_demand, chunk_multipliers
+        )
+        headroom_dfs.append(summarize_headroom(headroom, zones, chunk_multipliers))
+    headroom_df = pd.concat(headroom_dfs, ignore_index=True)
+
+    critical_df = evaluate_critical_adoption(
+        historical_load, aligned_ev_demand, hour_ending, zones, allowed_exceed_hours
+    )
+
+    return headroom_df, critical_df
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "-m",
+    "--multipliers",
+    nargs="+",
+    default=ADOPTION_MULTIPLIERS,
+    type=float,
+    help="Adoption multipliers to scale the EV charging demand by",
+)
+parser.add_argument(
+    "-n",
+    "--allowed_exceed_hours",
+    default=0,
+    type=int,
+    help="Number of historical hours in which the combined load is allowed to exceed the historical peak when evaluating the critical adoption multiplier",
+)
+parser.add_argument(
+    "-p",
+    "--profile",
+    default="extreme",
+    help="Name of the daily load profile produced by MakeChargingLoadByZone.py to use for the EV demand",
+)
+parser.add_argument(
+    "-t",
+    "--zone_loads",
+    default=None,
+    help="Path to a csv file with the hourly EV load in each zone over a full year (e.g. data/stochastic_charger_loads/zone_loads.csv produced by GenerateStochasticChargerLoads.py), used instead of the daily load profile",
+)
+
+
+def main():
+    args = parser.parse_args()
+
+    # Get the path to the top level of the Git repo
+    top_dir = get_top_dir()
+
+    load_data_df = get_load_data(top_dir, get_load_data_paths(top_dir))
+
+    # Get the EV demand in each zone, either for each hour of the day or each hour of the year
+    if args.zone_loads is None:
+        zones, ev_demand = get_hourly_zone_ev_demand(
+            pd.read_csv(f"{top_dir}/data/daily_ev_load_by_zone.csv"), args.profile
+        )
+    else:
+        zone_loads_df = pd.read_csv(args.zone_loads)
+        ev_zones = [zone for zone in zone_loads_df.columns if zone in zone_mapping]
+        zones = [zone_mapping[zone] for zone in ev_zones]
+        ev_demand = zone_loads_df[ev_zones].to_numpy(dtype=float).T
+
+    headroom_df, critical_df = evaluate_hosting_capacity(
+        load_data_df,
+        zones,
+        ev_demand,
+        np.asarray(args.multipliers, dtype=float),
+        allowed_exceed_hours=args.allowed_exceed_hours,
+    )
+
+    save_dir = f"{top_dir}/data/ercot_hosting_capacity"
+    if not os.path.exists(save_dir):
+        os.makedirs(save_dir)
+    headroom_df.to_csv(f"{save_dir}/headroom_by_multiplier.csv", index=False)
+    critical_df.to_csv(f"{save_dir}/critical_adoption.csv", index=False)
+    print(critical_df)
+
+
+if __name__ == "__main__":
+    main()
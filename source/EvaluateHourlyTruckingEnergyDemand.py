@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Created on Mon Oct 19 10:12:00 2026
+
+@author: danikam
+"""
+
+import numpy as np
+import pandas as pd
+import os
+
+from CommonTools import get_top_dir, mergeShapefile, saveShapefile
+from EvaluateTruckingEnergyDemand import (
+    save_links_without_geo,
+    evaluate_average_payload,
+    evaluate_average_mileage,
+    evaluate_annual_e_demand_link,
+    evaluate_annual_e_demand_state,
+    add_gen_cap_ratios,
+)
+
+HOURS_PER_DAY = 24
+DAYS_PER_WEEK = 7
+MONTHS_PER_YEAR = 12
+MWH_PER_GWH = 1000.0
+PROFILE_YEAR = 2022
+
+
+def get_hourly_daily_profile(top_dir, load_profile_path=None):
+    """
+    Reads in the smoothed daily charging load profile produced by MakeChargingLoadByZone.py and averages it into hourly bins
+
+    Parameters
+    ----------
+    top_dir (string): Path to top-level directory of the repository
+    load_profile_path (string): Path to the csv file containing the smoothed load profile. Defaults to the extreme load profile derived from Borlaug et al.
+
+    Returns
+    -------
+    daily_profile (np.array): Daily load profile with one entry per hour of the day, normalized such that its average is 1
+
+    NOTE: If the smoothed load profile hasn't been produced yet, a flat daily profile is returned.
+    """
+    if load_profile_path is None:
+        load_profile_path = f"{top_dir}/data/extreme_load_profile_smooth.csv"
+
+    if not os.path.isfile(load_profile_path):
+        print(
+            f"No load profile found at {load_profile_path}. Assuming a flat daily charging profile."
+        )
+        return np.ones(HOURS_PER_DAY)
+
+    load_profile_df = pd.read_csv(load_profile_path)
+    hours = load_profile_df["Hours"].to_numpy()
+    power = load_profile_df["Power"].to_numpy()
+
+    # Average the finely sampled profile over each hour of the day
+    hour_bins = np.clip(np.floor(hours).astype(int), 0, HOURS_PER_DAY - 1)
+    daily_profile = np.bincount(
+        hour_bins, weights=power, minlength=HOURS_PER_DAY
+    ) / np.maximum(np.bincount(hour_bins, minlength=HOURS_PER_DAY), 1)
+
+    # Normalize the profile such that its average is 1
+    return daily_profile / np.mean(daily_profile)
+
+
+def make_annual_profile(
+    daily_profile, weekly_factors=None, monthly_factors=None, year=PROFILE_YEAR
+):
+    """
+    Combines normalized diurnal, weekly and seasonal charging profiles into a full-year hourly profile
+
+    Parameters
+    ----------
+    daily_profile (np.array): Relative charging load for each hour of the day (24 entries)
+    weekly_factors (np.array): Relative charging load for each day of the week, starting on Monday (7 entries). Defaults to a flat weekly profile.
+    monthly_factors (np.array): Relative charging load for each month of the year, starting in January (12 entries). Defaults to a flat seasonal profile.
+    year (int): Calendar year used to lay out the days of the week and months
+
+    Returns
+    -------
+    timestamps (pd.DatetimeIndex): Start of each hour in the year
+    annual_profile (np.array): Fraction of the annual energy demand falling in each hour of the year (sums to 1)
+    """
+    if weekly_factors is None:
+        weekly_factors = np.ones(DAYS_PER_WEEK)
+    if monthly_factors is None:
+        monthly_factors = np.ones(MONTHS_PER_YEAR)
+
+    # Hourly timestamps over the full year
+    timestamps = pd.DatetimeIndex(
+        np.arange(
+            np.datetime64(f"{year}-01-01T00"),
+            np.datetime64(f"{year + 1}-01-01T00"),
+            np.timedelta64(1, "h"),
+        )
+    )
+
+    # Look up the diurnal, weekly and seasonal factor for every hour in one go
+    annual_profile = (
+        np.asarray(daily_profile, dtype=float)[timestamps.hour.to_numpy()]
+        * np.asarray(weekly_factors, dtype=float)[timestamps.dayofweek.to_numpy()]
+        * np.asarray(monthly_factors, dtype=float)[timestamps.month.to_numpy() - 1]
+    )
+
+    # Normalize such that the hourly fractions add up to the full annual demand
+    annual_profile = annual_profile / np.sum(annual_profile)
+
+    return timestamps, annual_profile
+
+
+def evaluate_hourly_e_demand_state(state_data_df, annual_profile, save_path):
+    """
+    Distributes the annual energy demand for each state over every hour of the year, and stores the result as a memory-mapped array
+
+    Parameters
+    ----------
+    state_data_df (Pandas DataFrame): Pandas dataframe containing the annual energy demand (An E Dem, in MWh) for each state
+    annual_profile (np.array): Fraction of the annual energy demand falling in each hour of the year
+    save_path (string): Path to the .npy file to store the hourly demands in
+
+    Returns
+    -------
+    hourly_demand (np.memmap): Memory-mapped array of shape (number of states, hours in the year) containing the hourly energy demand (in MWh, equivalently the average power in MW over the hour) for each state, ordered as in state_data_df
+    """
+    save_dir = os.path.dirname(save_path)
+    if not os.path.exists(save_dir):
+        os.makedirs(save_dir)
+
+    annual_demand = state_data_df["An E Dem"].to_numpy(dtype=float)
+
+    hourly_demand = np.lib.format.open_memmap(
+        save_path,
+        mode="w+",
+        dtype=np.float32,
+        shape=(len(annual_demand), len(annual_profile)),
+    )
+
+    # Broadcast the annual demand for each state against the hourly profile
+    np.multiply(
+        annual_demand[:, np.newaxis], annual_profile[np.newaxis, :], out=hourly_demand
+    )
+    hourly_demand.flush()
+
+    return hourly_demand
+
+
+def add_hourly_gen_cap_ratios(state_data_df, hourly_demand):
+    """
+    Compares the hourly energy demand for electrified trucking in each state with the average hourly electricity generated, the hourly generating capacity, and the difference between the two. Adds the following columns:
+        - peak hourly demand (Pk Dem column, in MW)
+        - peak hourly demand as a percent of the average hourly generation (Pk Gen column)
+        - peak hourly demand as a percent of the hourly generating capacity (Pk Cap column)
+        - peak hourly demand as a percent of the hourly difference between capacity and generation (Pk Diff column)
+        - number of hours in the year for which the demand exceeds the difference between capacity and generation (Hrs Diff column)
+
+    Parameters
+    ----------
+    state_data_df (Pandas DataFrame): Pandas dataframe containing the annual generation and capacity info for each state, as produced by add_gen_cap_ratios()
+    hourly_demand (np.array): Hourly energy demand for each state, ordered as in state_data_df
+
+    Returns
+    -------
+    state_data_df (Pandas DataFrame): Pandas dataframe read in, with additional columns containing the hourly comparisons
+    """
+    n_hours = hourly_demand.shape[1]
+
+    # Ann_Gen, Ann_Cap and Ann_Diff are annual values in GWh, so convert them to average hourly values in MW
+    hourly_gen = state_data_df["Ann_Gen"].to_numpy(dtype=float) * MWH_PER_GWH / n_hours
+    hourly_cap = state_data_df["Ann_Cap"].to_numpy(dtype=float) * MWH_PER_GWH / n_hours
+    hourly_diff = (
+        state_data_df["Ann_Diff"].to_numpy(dtype=float) * MWH_PER_GWH / n_hours
+    )
+
+    # Compare the demand in every hour with the hourly generation and capacity
+    peak_demand = np.max(hourly_demand, axis=1)
+    state_data_df["Pk Dem"] = peak_demand
+    state_data_df["Pk Gen"] = 100 * peak_demand / hourly_gen
+    state_data_df["Pk Cap"] = 100 * peak_demand / hourly_cap
+    state_data_df["Pk Diff"] = 100 * peak_demand / hourly_diff
+    state_data_df["Hrs Diff"] = np.sum(
+        hourly_demand > hourly_diff[:, np.newaxis], axis=1
+    )
+
+    return state_data_df
+
+
+def main():
+    # Get the path to the top level of the Git repo
+    top_dir = get_top_dir()
+
+    # Save the highway links without geometry info to a csv file
+    save_links_without_geo(top_dir)
+
+    # Open the highway link data without geometry info
+    highway_data_df = pd.read_csv(
+        f"{top_dir}/data/highway_assignment_links/highway_assignment_links_nomin_nogeo.csv"
+    )
+
+    # Evaluate the annual energy demand per link, and aggregate it for each state
+    highway_data_df = evaluate_average_payload(highway_data_df)
+    highway_data_df = evaluate_average_mileage(top_dir, highway_data_df)
+    highway_data_df = evaluate_annual_e_demand_link(top_dir, highway_data_df)
+    state_data_df = evaluate_annual_e_demand_state(highway_data_df)
+
+    # Add in the annual electricity generated and generating capacity for each state
+    state_data_df = add_gen_cap_ratios(top_dir, state_data_df).reset_index(drop=True)
+
+    # Build the full-year hourly charging profile from the normalized daily charging profile
+    daily_profile = get_hourly_daily_profile(top_dir)
+    timestamps, annual_profile = make_annual_profile(daily_profile)
+
+    # Evaluate the hourly energy demand for each state
+    save_dir = f"{top_dir}/data/trucking_energy_demand"
+    hourly_demand = evaluate_hourly_e_demand_state(
+        state_data_df,
+        annual_profile,
+        f"{save_dir}/hourly_trucking_energy_demand.npy",
+    )
+
+    # Save the state ordering of the rows in the hourly demand array
+    state_data_df[["STUSPS"]].to_csv(
+        f"{save_dir}/hourly_trucking_energy_demand_states.csv", index=False
+    )
+
+    # Compare the hourly demand with the hourly generation and generating capacity
+    state_data_df = add_hourly_gen_cap_ratios(state_data_df, hourly_demand)
+
+    # Merge the hourly comparisons for each state with the state borders
+    merged_state_data_gdf = mergeShapefile(
+        state_data_df, f"{top_dir}/data/state_boundaries/tl_2012_us_state.shp", "STUSPS"
+    ).dropna()
+
+    merged_state_data_gdf = merged_state_data_gdf.drop(
+        columns=["ALAND", "AWATER", "Shape_Area"]
+    )
+
+    # Save the merged shapefile
+    saveShapefile(
+        merged_state_data_gdf,
+        f"{save_dir}/hourly_trucking_energy_demand.shp",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -7,19 +7,57 @@ Created on Fri Jun 30 09:28:26 2023
 """
 
 import geopandas as gpd
-import momepy
+import pandas as pd
 import networkx as nx
 import time
 import pickle
 import os
+import argparse
+import concurrent.futures
+import functools
+import heapq
+import numpy as np
+import scipy.sparse
+import shapely
+import matplotlib.pyplot as plt
 
 from scipy import spatial
+from pyproj import Transformer
+from scipy.sparse.csgraph import dijkstra
 
 from CommonTools import get_top_dir
+from PlottingTools import draw_lines, draw_graph
+from NetworkTools import (
+    DEFAULT_NODE_TOLERANCE,
+    PROJECTED_CRS,
+    snap_points,
+    build_csr_graph,
+    get_link_endpoints,
+    get_link_lengths,
+    get_node_components,
+    get_path_nodes,
+    get_path_edge_ids,
+    save_graph_arrays,
+    load_graph_arrays,
+    snap_points_to_nodes,
+)
 
 
 top_dir = get_top_dir()
 
+# Arrays of the sparse graph holding each edge attribute that can be used as a weight
+EDGE_WEIGHT_ARRAYS = {
+    "Tot Tons": "edge_tons",
+    "Scaled Tot Tons": "edge_scaled_tons",
+    "len_miles": "edge_lengths",
+}
+
+# Edge attribute used to weight the adjacency matrix stored with the sparse graph
+DEFAULT_WEIGHT = "Tot Tons"
+
+# Number of landmarks used to bound the remaining distance in A* route queries
+N_LANDMARKS = 16
+
 start = time.time()
 
 
@@ -99,12 +137,19 @@ def combinedStatisticalAreasCentroids():
     return cent
 
 
-def createGraph(highways):
+def createGraph(highways, tolerance=DEFAULT_NODE_TOLERANCE):
     """
+    Builds a NetworkX MultiGraph of the highways from the native link
+    topology, with each node keyed by its (longitude, latitude) and each edge
+    carrying the attributes (including the geometry) of its highway link.
+
     Parameters
     ----------
     highways : Geopandas DataFrame
         GeoDataFrame containing all of the filtered FAF5 highways.
+    tolerance : float, optional
+        Distance (in meters) within which link endpoints are taken to be the
+        same node. The default is DEFAULT_NODE_TOLERANCE.
 
     Returns
     -------
@@ -114,14 +159,85 @@ def createGraph(highways):
         Dictionary of geographic location of nodes in highway graph.
 
     """
-
-    graph = momepy.gdf_to_nx(highways, approach="primal")
+    startNodes, endNodes, nodeLonLat, _ = buildHighwayTopology(highways, tolerance)
+    nodeKeys = list(map(tuple, nodeLonLat.tolist()))
+
+    graph = nx.MultiGraph()
+    graph.add_nodes_from(nodeKeys)
+    graph.add_edges_from(
+        (nodeKeys[startNode], nodeKeys[endNode], attributes)
+        for startNode, endNode, attributes in zip(
+            startNodes, endNodes, highways.to_dict("records")
+        )
+    )
     positions = {n: [n[0], n[1]] for n in list(graph.nodes)}
     graph.remove_edges_from(list(nx.selfloop_edges(graph)))
 
     return graph, positions
 
 
+def buildHighwayTopology(highways, tolerance=DEFAULT_NODE_TOLERANCE):
+    """
+    Extracts the endpoints of every highway link as arrays, snaps together
+    endpoints within the tolerance of each other with a KD-tree, and assigns
+    integer node ids. Prints a summary of the connected components of the
+    resulting network.
+
+    Parameters
+    ----------
+    highways : Geopandas DataFrame
+        GeoDataFrame containing all of the filtered FAF5 highways.
+    tolerance : float, optional
+        Distance (in meters) within which link endpoints are taken to be the
+        same node. The default is DEFAULT_NODE_TOLERANCE.
+
+    Returns
+    -------
+    startNodes : numpy array
+        Node id of the start of each link.
+    endNodes : numpy array
+        Node id of the end of each link.
+    nodeLonLat : numpy array
+        Longitude and latitude of each node (averaged over its endpoints).
+    nodeCoords : numpy array
+        Coordinates of each node in PROJECTED_CRS (meters).
+
+    """
+    nLinks = len(highways)
+    startLonLat, endLonLat = get_link_endpoints(highways.to_crs("EPSG:4326"))
+    endpointLonLat = np.concatenate([startLonLat, endLonLat])
+
+    # Only the endpoints need to be projected to snap them together, rather
+    # than every vertex of the links
+    transformer = Transformer.from_crs("EPSG:4326", PROJECTED_CRS, always_xy=True)
+    endpointCoords = np.column_stack(
+        transformer.transform(endpointLonLat[:, 0], endpointLonLat[:, 1])
+    )
+    nodeCoords, endpointNodes = snap_points(endpointCoords, tolerance)
+    startNodes, endNodes = endpointNodes[:nLinks], endpointNodes[nLinks:]
+    nNodes = len(nodeCoords)
+
+    # Average the geographic coordinates of the endpoints of each node
+    nEndpoints = np.bincount(endpointNodes, minlength=nNodes)
+    nodeLonLat = np.column_stack(
+        [
+            np.bincount(endpointNodes, weights=endpointLonLat[:, i], minlength=nNodes)
+            / nEndpoints
+            for i in range(2)
+        ]
+    )
+
+    _, componentSizes = get_node_components(startNodes, endNodes, nNodes)
+    print(
+        f"Highway network has {nNodes} nodes, {len(startNodes)} links and "
+        f"{len(componentSizes)} connected components (the largest contains "
+        f"{componentSizes[0]} nodes, {nNodes - componentSizes[0]} nodes are "
+        "disconnected from it)"
+    )
+
+    return startNodes, endNodes, nodeLonLat, nodeCoords
+
+
 def saveGraph(filename, graph=None, load=True):
     """
     Saves or loads NX MultiGraph.
@@ -159,6 +275,721 @@ def saveGraph(filename, graph=None, load=True):
         return graph
 
 
+def createCSRGraph(highways, tolerance=DEFAULT_NODE_TOLERANCE):
+    """
+    Builds a compact sparse representation of the highway network, with integer
+    node ids, node coordinate arrays, per-edge attribute arrays and a CSR
+    adjacency matrix.
+
+    Parameters
+    ----------
+    highways : Geopandas DataFrame
+        GeoDataFrame containing all of the filtered FAF5 highways.
+    tolerance : float, optional
+        Distance (in meters) within which link endpoints are taken to be the
+        same node. The default is DEFAULT_NODE_TOLERANCE.
+
+    Returns
+    -------
+    csrGraph : Dict
+        Dictionary of arrays describing the graph:
+            node_coords: coordinates of each node in PROJECTED_CRS (meters)
+            node_lonlat: longitude and latitude of each node
+            edge_start_nodes, edge_end_nodes: node ids at the ends of each edge
+            edge_link_ids: row of highways that each edge comes from
+            edge_lengths, edge_tons, edge_scaled_tons: attributes of each edge
+            indptr, indices, data, entry_edge_ids: CSR adjacency matrix
+                weighted by DEFAULT_WEIGHT, and the edge that each of its
+                entries comes from
+
+    """
+    startNodes, endNodes, nodeLonLat, nodeCoords = buildHighwayTopology(
+        highways, tolerance
+    )
+
+    # Self-loops never lie on a shortest path, so drop them
+    linkIds = np.flatnonzero(startNodes != endNodes)
+
+    csrGraph = {
+        "node_coords": nodeCoords,
+        "node_lonlat": nodeLonLat,
+        "edge_start_nodes": startNodes[linkIds],
+        "edge_end_nodes": endNodes[linkIds],
+        "edge_link_ids": linkIds,
+        "edge_lengths": get_link_lengths(highways)[linkIds],
+        "edge_tons": highways["Tot Tons"].to_numpy(dtype=float)[linkIds],
+        "edge_scaled_tons": highways["Scaled Tot Tons"].to_numpy(dtype=float)[linkIds],
+    }
+
+    adjacency, entryEdgeIds = getCSRAdjacency(csrGraph, DEFAULT_WEIGHT)
+    csrGraph["indptr"] = adjacency.indptr
+    csrGraph["indices"] = adjacency.indices
+    csrGraph["data"] = adjacency.data
+    csrGraph["entry_edge_ids"] = entryEdgeIds
+
+    return csrGraph
+
+
+def getCSRAdjacency(csrGraph, weight=DEFAULT_WEIGHT):
+    """
+    Gets the undirected adjacency matrix of the sparse graph weighted by the
+    given edge attribute. The matrix stored with the graph is reused if it has
+    the same weight, and otherwise a new one is built from the edge arrays.
+
+    Parameters
+    ----------
+    csrGraph : Dict
+        Dictionary of arrays describing the graph, from createCSRGraph.
+    weight : str, optional
+        Edge attribute to weight the graph by (one of EDGE_WEIGHT_ARRAYS). The
+        default is DEFAULT_WEIGHT.
+
+    Returns
+    -------
+    adjacency : scipy.sparse.csr_matrix
+        Adjacency matrix weighted by the given edge attribute.
+    entryEdgeIds : numpy array
+        Edge that each entry of adjacency.data comes from.
+
+    """
+    nNodes = len(csrGraph["node_coords"])
+
+    if weight == DEFAULT_WEIGHT and "indptr" in csrGraph:
+        adjacency = scipy.sparse.csr_matrix(
+            (csrGraph["data"], csrGraph["indices"], csrGraph["indptr"]),
+            shape=(nNodes, nNodes),
+        )
+        return adjacency, csrGraph["entry_edge_ids"]
+
+    return build_csr_graph(
+        csrGraph["edge_start_nodes"],
+        csrGraph["edge_end_nodes"],
+        csrGraph[EDGE_WEIGHT_ARRAYS[weight]],
+        nNodes,
+        return_edge_ids=True,
+    )
+
+
+def saveCSRGraph(filename, csrGraph=None, load=True):
+    """
+    Saves or loads the sparse graph (or other arrays derived from it, such as
+    its landmarks) as an uncompressed .npz file. When loading, the arrays are
+    memory-mapped rather than read into memory.
+
+    Parameters
+    ----------
+    filename : str
+        Filename of saved graph.
+    csrGraph : Dict, optional
+        Dictionary of arrays describing the graph, from createCSRGraph. The
+        default is None.
+    load : bool, optional
+        Boolean defining whether to save or load graph. The default is True.
+
+    Returns
+    -------
+    csrGraph : Dict
+        Dictionary of (memory-mapped) arrays describing the graph.
+
+    """
+    # Create the directory to contain graphs if it doesn't exist
+    if not os.path.exists(f"{top_dir}/data/graphs"):
+        os.makedirs(f"{top_dir}/data/graphs")
+
+    if not load:
+        save_graph_arrays(f"{top_dir}/data/graphs/{filename}.npz", csrGraph)
+        print("Graph saved...")
+    else:
+        csrGraph = load_graph_arrays(f"{top_dir}/data/graphs/{filename}.npz")
+        print("Graph loaded...")
+        return csrGraph
+
+
+def defineCSRODPoints(csrGraph, centroids):
+    """
+    Parameters
+    ----------
+    csrGraph : Dict
+        Dictionary of arrays describing the graph, from createCSRGraph.
+    centroids : DataFrame
+        GeoDataFrame containing the centroids of all Census defined
+        Combined Statistical Areas.
+
+    Returns
+    -------
+    ret : Dict
+        Dictionary of CSAs with the id of the nearest node in the graph.
+
+    """
+    nodes, _ = snap_points_to_nodes(centroids, csrGraph["node_coords"])
+
+    return dict(zip(centroids["name"], nodes))
+
+
+def findCSRPath(csrGraph, orig, dest, weight=DEFAULT_WEIGHT):
+    """
+    Finds the shortest path between two nodes of the sparse graph with
+    scipy.sparse.csgraph.
+
+    Parameters
+    ----------
+    csrGraph : Dict
+        Dictionary of arrays describing the graph, from createCSRGraph.
+    orig : int
+        Node id of the origin.
+    dest : int
+        Node id of the destination.
+    weight : str, optional
+        Edge attribute to weight the graph by (one of EDGE_WEIGHT_ARRAYS). The
+        default is DEFAULT_WEIGHT.
+
+    Returns
+    -------
+    pathNodes : numpy array
+        Node ids along the path (empty if the destination can't be reached).
+    pathLinks : numpy array
+        Row of the highways GeoDataFrame of each link along the path.
+
+    """
+    adjacency, entryEdgeIds = getCSRAdjacency(csrGraph, weight)
+    _, predecessors = dijkstra(
+        adjacency, directed=False, indices=orig, return_predecessors=True
+    )
+
+    pathNodes = get_path_nodes(predecessors, orig, dest)
+    pathEdges = get_path_edge_ids(adjacency, entryEdgeIds, pathNodes)
+
+    return pathNodes, np.asarray(csrGraph["edge_link_ids"])[pathEdges]
+
+
+def csrPathToGeoDataFrame(highways, pathLinks):
+    """
+    Converts a path found in the sparse graph back to a GeoDataFrame of the
+    highway links along it.
+
+    Parameters
+    ----------
+    highways : Geopandas DataFrame
+        GeoDataFrame of the highways the graph was built from.
+    pathLinks : numpy array
+        Row of highways of each link along the path, from findCSRPath.
+
+    Returns
+    -------
+    path : Geopandas DataFrame
+        GeoDataFrame of the links along the path, in order.
+
+    """
+    return highways.iloc[np.asarray(pathLinks)].reset_index(drop=True)
+
+
+def getTreePaths(adjacency, entryEdgeIds, predecessors, orig, dests):
+    """
+    Extracts the paths to many destinations from a single-source shortest-path
+    tree at once, by walking back from all of the destinations in lockstep.
+
+    Parameters
+    ----------
+    adjacency : scipy.sparse.csr_matrix
+        Adjacency matrix the tree was found in.
+    entryEdgeIds : numpy array
+        Edge that each entry of adjacency.data comes from.
+    predecessors : numpy array
+        Predecessor of each node in the shortest-path tree from orig, as
+        returned by scipy.sparse.csgraph.dijkstra.
+    orig : int
+        Node id of the origin.
+    dests : numpy array
+        Node ids of the destinations.
+
+    Returns
+    -------
+    pathEdges : List
+        Edge ids along the path to each destination, in order from the origin
+        (empty if the destination is the origin or can't be reached).
+    reachable : numpy array
+        Boolean defining whether each destination can be reached.
+
+    """
+    dests = np.asarray(dests, dtype=np.int64)
+    reachable = (dests == orig) | (predecessors[dests] >= 0)
+
+    # Step back towards the origin from all reachable destinations together,
+    # recording the nodes at either end of every step
+    noSteps = np.zeros(0, dtype=np.int64)
+    stepPaths = [noSteps]
+    stepStarts = [noSteps]
+    stepEnds = [noSteps]
+    stepCounts = [noSteps]
+    current = dests[reachable]
+    pathIds = np.flatnonzero(reachable)
+    nSteps = 0
+    while len(current) > 0:
+        walking = current != orig
+        current, pathIds = current[walking], pathIds[walking]
+        previous = predecessors[current]
+        stepPaths.append(pathIds)
+        stepStarts.append(previous)
+        stepEnds.append(current)
+        stepCounts.append(np.full(len(current), nSteps))
+        current = previous
+        nSteps += 1
+
+    stepPaths = np.concatenate(stepPaths)
+    stepStarts = np.concatenate(stepStarts)
+    stepEnds = np.concatenate(stepEnds)
+
+    # Put the steps of each path in order from the origin
+    order = np.lexsort((-np.concatenate(stepCounts), stepPaths))
+
+    # Look up the edge of every step with a single binary search over the
+    # (row-major sorted) entries of the adjacency matrix
+    nNodes = adjacency.shape[0]
+    entryKeys = (
+        np.repeat(np.arange(nNodes), np.diff(adjacency.indptr)) * nNodes
+        + adjacency.indices
+    )
+    stepKeys = stepStarts[order] * nNodes + stepEnds[order]
+    stepEdges = entryEdgeIds[np.searchsorted(entryKeys, stepKeys)]
+
+    pathLengths = np.bincount(stepPaths, minlength=len(dests))
+    pathEdges = np.split(stepEdges, np.cumsum(pathLengths)[:-1])
+
+    return pathEdges, reachable
+
+
+@functools.lru_cache(maxsize=None)
+def loadRoutingGraph(graphPath, weight=DEFAULT_WEIGHT):
+    """
+    Loads a saved sparse graph and its adjacency matrix for the given weight,
+    keeping them for later calls in the same process.
+
+    Parameters
+    ----------
+    graphPath : str
+        Path to the .npz file of the graph, saved by saveCSRGraph.
+    weight : str, optional
+        Edge attribute to weight the graph by (one of EDGE_WEIGHT_ARRAYS). The
+        default is DEFAULT_WEIGHT.
+
+    Returns
+    -------
+    csrGraph : Dict
+        Dictionary of (memory-mapped) arrays describing the graph.
+    adjacency : scipy.sparse.csr_matrix
+        Adjacency matrix weighted by the given edge attribute.
+    entryEdgeIds : numpy array
+        Edge that each entry of adjacency.data comes from.
+
+    """
+    csrGraph = load_graph_arrays(graphPath)
+    adjacency, entryEdgeIds = getCSRAdjacency(csrGraph, weight)
+
+    return csrGraph, adjacency, entryEdgeIds
+
+
+def findCSRPathsFromOrigin(graphPath, orig, dests, weight=DEFAULT_WEIGHT):
+    """
+    Finds the shortest paths from one origin to many destinations with a single
+    shortest-path tree.
+
+    Parameters
+    ----------
+    graphPath : str
+        Path to the .npz file of the graph, saved by saveCSRGraph.
+    orig : int
+        Node id of the origin.
+    dests : numpy array
+        Node ids of the destinations.
+    weight : str, optional
+        Edge attribute to weight the graph by (one of EDGE_WEIGHT_ARRAYS). The
+        default is DEFAULT_WEIGHT.
+
+    Returns
+    -------
+    pathWeights : numpy array
+        Total weight along the path to each destination (inf if the
+        destination can't be reached).
+    pathLinks : List
+        Row of the highways GeoDataFrame of each link along the path to each
+        destination.
+
+    """
+    csrGraph, adjacency, entryEdgeIds = loadRoutingGraph(graphPath, weight)
+    distances, predecessors = dijkstra(
+        adjacency, directed=False, indices=orig, return_predecessors=True
+    )
+
+    pathEdges, _ = getTreePaths(adjacency, entryEdgeIds, predecessors, orig, dests)
+    edgeLinkIds = np.asarray(csrGraph["edge_link_ids"])
+
+    return distances[dests], [edgeLinkIds[edges] for edges in pathEdges]
+
+
+def findAllCSRPaths(graphPath, origins, weight=DEFAULT_WEIGHT, numProcesses=None):
+    """
+    Finds the shortest paths between every pair of origins, with one
+    shortest-path tree per origin, in parallel across processes. Since the
+    graph is undirected, each pair is only routed once.
+
+    Parameters
+    ----------
+    graphPath : str
+        Path to the .npz file of the graph, saved by saveCSRGraph. Each process
+        memory-maps the graph rather than receiving a copy of it.
+    origins : Dict
+        Dictionary of CSAs with the id of the nearest node in the graph, from
+        defineCSRODPoints.
+    weight : str, optional
+        Edge attribute to weight the graph by (one of EDGE_WEIGHT_ARRAYS). The
+        default is DEFAULT_WEIGHT.
+    numProcesses : int, optional
+        Number of processes to use. The default is the number of CPUs.
+
+    Returns
+    -------
+    routes : Pandas DataFrame
+        Route table with one row per pair of origins, containing the names and
+        node ids of the origin and destination, the total weight along the
+        path ('Path Weight'), the number of links along it and the rows of the
+        highways GeoDataFrame of the links along it ('Link IDs').
+
+    """
+    names = sorted(origins)
+    nodes = np.array([origins[name] for name in names], dtype=np.int64)
+
+    routeTables = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=numProcesses) as executor:
+        futures = [
+            executor.submit(
+                findCSRPathsFromOrigin, graphPath, nodes[i], nodes[i + 1 :], weight
+            )
+            for i in range(len(names) - 1)
+        ]
+        for i, future in enumerate(futures):
+            pathWeights, pathLinks = future.result()
+            routeTables.append(
+                pd.DataFrame(
+                    {
+                        "Origin": names[i],
+                        "Destination": names[i + 1 :],
+                        "Origin Node": nodes[i],
+                        "Destination Node": nodes[i + 1 :],
+                        "Path Weight": pathWeights,
+                        "N Links": [len(links) for links in pathLinks],
+                        "Link IDs": pathLinks,
+                    }
+                )
+            )
+
+    return pd.concat(routeTables, ignore_index=True)
+
+
+def routesToGeoDataFrame(highways, routes):
+    """
+    Merges the links along each route into a single MultiLineString.
+
+    Parameters
+    ----------
+    highways : Geopandas DataFrame
+        GeoDataFrame of the highways the graph was built from.
+    routes : Pandas DataFrame
+        Route table from findAllCSRPaths.
+
+    Returns
+    -------
+    routeGeometries : Geopandas DataFrame
+        GeoDataFrame with one row per route, containing the route table
+        (without the link ids) and the geometry of each route (None for
+        routes without any links).
+
+    """
+    linkIds = np.concatenate(
+        [np.zeros(0, dtype=np.int64)] + [np.asarray(ids) for ids in routes["Link IDs"]]
+    )
+    linkRoutes = np.repeat(np.arange(len(routes)), routes["N Links"].to_numpy())
+
+    # Build all of the route geometries at once from the parts of their links
+    parts, partLinks = shapely.get_parts(
+        highways.geometry.values[linkIds], return_index=True
+    )
+    _, partRoutes = np.unique(linkRoutes[partLinks], return_inverse=True)
+    geometries = np.full(len(routes), None, dtype=object)
+    geometries[np.unique(linkRoutes)] = shapely.multilinestrings(
+        parts, indices=partRoutes
+    )
+
+    return gpd.GeoDataFrame(
+        routes.drop(columns=["Link IDs"]), geometry=geometries, crs=highways.crs
+    )
+
+
+def createLandmarks(csrGraph, weight=DEFAULT_WEIGHT, nLandmarks=N_LANDMARKS, seed=None):
+    """
+    Selects landmark nodes spread out over the graph by farthest-point
+    selection, and evaluates the shortest distance from each landmark to every
+    node. By the triangle inequality, these give a lower bound on the distance
+    between any two nodes (the ALT heuristic).
+
+    Parameters
+    ----------
+    csrGraph : Dict
+        Dictionary of arrays describing the graph, from createCSRGraph.
+    weight : str, optional
+        Edge attribute to weight the graph by (one of EDGE_WEIGHT_ARRAYS). The
+        landmarks can only be used for queries with the same weight. The
+        default is DEFAULT_WEIGHT.
+    nLandmarks : int, optional
+        Number of landmarks. The default is N_LANDMARKS.
+    seed : int, optional
+        Seed for the random choice of the node the selection starts from. The
+        default is None.
+
+    Returns
+    -------
+    landmarks : Dict
+        Dictionary of arrays containing the node id of each landmark
+        ('landmarks') and the distance from each landmark to every node
+        ('landmark_distances', of shape (nLandmarks, number of nodes)).
+
+    NOTE: Landmarks are only placed in the connected component of the starting
+    node (almost always the main network). Queries elsewhere still return the
+    shortest path, but without any speedup.
+
+    """
+    adjacency, _ = getCSRAdjacency(csrGraph, weight)
+    nNodes = adjacency.shape[0]
+
+    # Start from the farthest node from a randomly chosen node, then keep
+    # adding the node farthest from all of the landmarks chosen so far
+    rng = np.random.default_rng(seed)
+    distances = dijkstra(adjacency, directed=False, indices=rng.integers(nNodes))
+    minDistances = np.where(np.isfinite(distances), distances, -1)
+
+    landmarkNodes = np.zeros(nLandmarks, dtype=np.int64)
+    landmarkDistances = np.zeros((nLandmarks, nNodes))
+    for i in range(nLandmarks):
+        landmarkNodes[i] = np.argmax(minDistances)
+        landmarkDistances[i] = dijkstra(
+            adjacency, directed=False, indices=landmarkNodes[i]
+        )
+        minDistances = np.minimum(minDistances, landmarkDistances[i])
+
+    return {"landmarks": landmarkNodes, "landmark_distances": landmarkDistances}
+
+
+def getLandmarkLowerBounds(landmarks, dest):
+    """
+    Evaluates a lower bound on the distance from every node to the destination
+    with the landmark distances.
+
+    Parameters
+    ----------
+    landmarks : Dict
+        Dictionary of landmark arrays, from createLandmarks.
+    dest : int
+        Node id of the destination.
+
+    Returns
+    -------
+    lowerBounds : numpy array
+        Lower bound on the distance from each node to the destination.
+
+    """
+    landmarkDistances = np.asarray(landmarks["landmark_distances"])
+    destDistances = landmarkDistances[:, dest, np.newaxis]
+
+    # Landmarks that can't reach both nodes don't give any bound
+    with np.errstate(invalid="ignore"):
+        bounds = np.abs(landmarkDistances - destDistances)
+    bounds[~(np.isfinite(landmarkDistances) & np.isfinite(destDistances))] = 0
+
+    return np.max(bounds, axis=0)
+
+
+def searchCSRGraph(adjacency, orig, dest, lowerBounds=None):
+    """
+    Searches for the shortest path between two nodes with A*, guided by lower
+    bounds on the distance to the destination. Without any lower bounds, this
+    is a plain Dijkstra search that stops once the destination is reached.
+
+    Parameters
+    ----------
+    adjacency : scipy.sparse.csr_matrix
+        Adjacency matrix of the graph.
+    orig : int
+        Node id of the origin.
+    dest : int
+        Node id of the destination.
+    lowerBounds : numpy array, optional
+        Lower bound on the distance from each node to the destination, from
+        getLandmarkLowerBounds. The default is None.
+
+    Returns
+    -------
+    pathNodes : numpy array
+        Node ids along the path (empty if the destination can't be reached).
+    pathEntries : numpy array
+        Entry of adjacency.data for each step along the path.
+    pathWeight : float
+        Total weight along the path (inf if the destination can't be reached).
+    nSettled : int
+        Number of nodes settled during the search.
+
+    """
+    if lowerBounds is None:
+        lowerBounds = np.zeros(adjacency.shape[0])
+    indptr, indices, data = adjacency.indptr, adjacency.indices, adjacency.data
+
+    distances = {orig: 0.0}
+    predecessors = {}
+    settled = set()
+    queue = [(lowerBounds[orig], orig)]
+    while queue:
+        _, node = heapq.heappop(queue)
+        if node in settled:
+            continue
+        settled.add(node)
+        if node == dest:
+            break
+
+        # Relax all the edges out of the node
+        first, last = indptr[node], indptr[node + 1]
+        for entry, neighbor, edgeWeight in zip(
+            range(first, last), indices[first:last].tolist(), data[first:last].tolist()
+        ):
+            distance = distances[node] + edgeWeight
+            if distance < distances.get(neighbor, np.inf):
+                distances[neighbor] = distance
+                predecessors[neighbor] = (node, entry)
+                heapq.heappush(queue, (distance + lowerBounds[neighbor], neighbor))
+
+    if dest not in settled:
+        noPath = np.zeros(0, dtype=np.int64)
+        return noPath, noPath, np.inf, len(settled)
+
+    # Walk back from the destination to the origin
+    pathNodes, pathEntries = [dest], []
+    while pathNodes[-1] != orig:
+        node, entry = predecessors[pathNodes[-1]]
+        pathNodes.append(node)
+        pathEntries.append(entry)
+
+    return (
+        np.array(pathNodes[::-1], dtype=np.int64),
+        np.array(pathEntries[::-1], dtype=np.int64),
+        distances[dest],
+        len(settled),
+    )
+
+
+def findALTPath(csrGraph, landmarks, orig, dest, weight=DEFAULT_WEIGHT):
+    """
+    Finds the shortest path between two nodes of the sparse graph with A*,
+    using the landmark (ALT) lower bounds as the heuristic. This returns the
+    same paths as findCSRPath, but only explores the part of the network
+    between the origin and destination.
+
+    Parameters
+    ----------
+    csrGraph : Dict
+        Dictionary of arrays describing the graph, from createCSRGraph.
+    landmarks : Dict
+        Dictionary of landmark arrays, from createLandmarks with the same
+        weight.
+    orig : int
+        Node id of the origin.
+    dest : int
+        Node id of the destination.
+    weight : str, optional
+        Edge attribute to weight the graph by (one of EDGE_WEIGHT_ARRAYS). The
+        default is DEFAULT_WEIGHT.
+
+    Returns
+    -------
+    pathNodes : numpy array
+        Node ids along the path (empty if the destination can't be reached).
+    pathLinks : numpy array
+        Row of the highways GeoDataFrame of each link along the path.
+
+    """
+    adjacency, entryEdgeIds = getCSRAdjacency(csrGraph, weight)
+    pathNodes, pathEntries, _, _ = searchCSRGraph(
+        adjacency, orig, dest, getLandmarkLowerBounds(landmarks, dest)
+    )
+    pathEdges = np.asarray(entryEdgeIds)[pathEntries]
+
+    return pathNodes, np.asarray(csrGraph["edge_link_ids"])[pathEdges]
+
+
+def benchmarkALT(csrGraph, landmarks, nQueries=20, weight=DEFAULT_WEIGHT, seed=None):
+    """
+    Compares the time taken by landmark A* queries with plain Dijkstra, both as
+    a full scipy.sparse.csgraph shortest-path tree and as the same search as
+    the A* queries but without any lower bounds, for randomly chosen pairs of
+    nodes in the main network.
+
+    Parameters
+    ----------
+    csrGraph : Dict
+        Dictionary of arrays describing the graph, from createCSRGraph.
+    landmarks : Dict
+        Dictionary of landmark arrays, from createLandmarks with the same
+        weight.
+    nQueries : int, optional
+        Number of origin-destination pairs to query. The default is 20.
+    weight : str, optional
+        Edge attribute to weight the graph by (one of EDGE_WEIGHT_ARRAYS). The
+        default is DEFAULT_WEIGHT.
+    seed : int, optional
+        Seed for the random choice of origins and destinations. The default is
+        None.
+
+    Returns
+    -------
+    benchmark : Pandas DataFrame
+        Dataframe with one row per query, containing the time taken by each
+        method, the number of nodes settled by the plain and landmark searches,
+        and whether all methods found paths of the same total weight.
+
+    """
+    adjacency, _ = getCSRAdjacency(csrGraph, weight)
+
+    # Choose pairs of nodes that the landmarks can reach, so that they're connected
+    rng = np.random.default_rng(seed)
+    mainNodes = np.flatnonzero(np.isfinite(landmarks["landmark_distances"][0]))
+    origs, dests = rng.choice(mainNodes, size=(2, nQueries))
+
+    rows = []
+    for orig, dest in zip(origs, dests):
+        t0 = time.perf_counter()
+        distances = dijkstra(adjacency, directed=False, indices=orig)
+        t1 = time.perf_counter()
+        _, _, plainWeight, plainSettled = searchCSRGraph(adjacency, orig, dest)
+        t2 = time.perf_counter()
+        _, _, altWeight, altSettled = searchCSRGraph(
+            adjacency, orig, dest, getLandmarkLowerBounds(landmarks, dest)
+        )
+        t3 = time.perf_counter()
+
+        rows.append(
+            {
+                "Origin Node": orig,
+                "Destination Node": dest,
+                "Path Weight": distances[dest],
+                "csgraph Dijkstra Time (s)": t1 - t0,
+                "Dijkstra Time (s)": t2 - t1,
+                "ALT Time (s)": t3 - t2,
+                "Dijkstra Settled": plainSettled,
+                "ALT Settled": altSettled,
+                "Same Weight": np.isclose(plainWeight, distances[dest])
+                and np.isclose(altWeight, distances[dest]),
+            }
+        )
+
+    return pd.DataFrame(rows)
+
+
 def defineODPoints(graph, centroids, positions):
     """
     Parameters
@@ -237,31 +1068,44 @@ def visualize(visual, positions=None, isnx=False):
 
     """
 
+    fig, ax = plt.subplots(figsize=(10, 10))
+
     if isnx:
-        if positions is not None:
-            nx.draw(visual, positions, node_color="tab:blue", node_size=1)
+        if positions is None:
+            positions = {n: [n[0], n[1]] for n in list(visual.nodes)}
+            node_color = "red"
         else:
-            nx.draw(
-                visual,
-                {n: [n[0], n[1]] for n in list(visual.nodes)},
-                node_color="red",
-                node_size=1,
-            )
+            node_color = "tab:blue"
+
+        # Draw all the edges as a single line collection rather than one by one
+        node_ids = {n: i for i, n in enumerate(visual.nodes)}
+        node_coords = np.array([positions[n] for n in visual.nodes], dtype=float)
+        edges = np.array(
+            [(node_ids[u], node_ids[v]) for u, v in visual.edges()], dtype=np.int64
+        ).reshape(-1, 2)
+        draw_graph(
+            ax,
+            node_coords,
+            edges[:, 0],
+            edges[:, 1],
+            node_color=node_color,
+            node_size=1,
+        )
+        ax.set_axis_off()
     else:
-        visual.plot()
+        draw_lines(ax, visual)
 
 
 def toShapefile(graph, filename):
     """
-    Converts NetworkX Graph to GeoDataFrame and saves as shapefile.
-    TODO: Had to manually change method references in module 'networkx' from
-        'to_scipy_sparse_matrix' to 'to_scipy_sparse_array' => find out which
-        library needs to be updated.
+    Converts NetworkX Graph to GeoDataFrame and saves as shapefile. Paths found
+    in the sparse graph can be passed directly as a GeoDataFrame (see
+    csrPathToGeoDataFrame).
 
     Parameters
     ----------
-    graph : MultiGraph
-        NX MultiGraph of path.
+    graph : MultiGraph or Geopandas DataFrame
+        NX MultiGraph of path, or GeoDataFrame of the links along it.
     filename : str
         Filename of shapefile.
 
@@ -274,58 +1118,133 @@ def toShapefile(graph, filename):
     if not os.path.exists(f"{top_dir}/data/paths_of_interest"):
         os.makedirs(f"{top_dir}/data/paths_of_interest")
 
-    nodes, edges, sw = momepy.nx_to_gdf(
-        graph, points=True, lines=True, spatial_weights=True
-    )
+    if isinstance(graph, gpd.GeoDataFrame):
+        edges = graph
+    else:
+        # Each edge carries the attributes and geometry of its highway link
+        edges = gpd.GeoDataFrame(
+            [attributes for _, _, attributes in graph.edges(data=True)],
+            geometry="geometry",
+            crs="EPSG:4326",
+        )
     edges.to_file(f"{top_dir}/data/paths_of_interest/{filename}.shp")
 
 
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "-l",
+    "--load",
+    action="store_true",
+    help="Load the saved graph and origins rather than building them from scratch",
+)
+parser.add_argument(
+    "-a",
+    "--all_pairs",
+    action="store_true",
+    help="Route between every pair of Combined Statistical Area centroids rather than only the example routes",
+)
+parser.add_argument(
+    "-w",
+    "--weight",
+    default=DEFAULT_WEIGHT,
+    choices=list(EDGE_WEIGHT_ARRAYS),
+    help="Edge attribute to weight the highway graph by",
+)
+parser.add_argument(
+    "-n",
+    "--num_processes",
+    default=None,
+    type=int,
+    help="Number of processes to use for all-pairs routing (default is the number of CPUs)",
+)
+parser.add_argument(
+    "-b",
+    "--benchmark",
+    default=0,
+    type=int,
+    help="Number of random queries to benchmark landmark A* against plain Dijkstra with",
+)
+parser.add_argument(
+    "-g",
+    "--geoparquet",
+    action="store_true",
+    help="For all-pairs routing, also save the merged geometry of every route as GeoParquet",
+)
+
+
 if __name__ == "__main__":
-    #The user should change this value based upon whether or not they are starting fresh
-    load = False
-    
-    #Can be modified based on needs/testing
-    if not load:
+    args = parser.parse_args()
+
+    # Can be modified based on needs/testing
+    highways = extractHighways()
+    if not args.load:
         centroids = combinedStatisticalAreasCentroids()
-        highways = extractHighways()
-        graph, positions = createGraph(highways)
-        origins = defineODPoints(graph, centroids, positions)
+        csrGraph = createCSRGraph(highways)
+        origins = defineCSRODPoints(csrGraph, centroids)
 
-        saveGraph("centroids", centroids, load=False)
-        saveGraph("graph", graph, load=False)
-        saveGraph("positions", positions, load=False)
+        saveCSRGraph("highway_graph", csrGraph, load=False)
         saveGraph("origins", origins, load=False)
 
     else:
-        centroids = saveGraph('centroids', load=True)
-        graph = saveGraph('graph', load=True)
-        positions = saveGraph('positions', load=True)
-        origins = saveGraph('origins', load=True)
-
-    
-    # path, pathgraph = findPath(graph, origins['San Jose-San Francisco-Oakland, CA'], origins['Seattle-Tacoma, WA'])
-    # newpath, newpathgraph = findPath(graph, origins['Cape Coral-Fort Myers-Naples, FL'], origins['Tallahassee-Bainbridge, FL-GA'])
-    # ultranewpath, ultranewpathgraph = findPath(graph, origins['Seattle-Tacoma, WA'], origins['Tallahassee-Bainbridge, FL-GA'])
-    
-    
-    path, pathgraph = findPath(graph, origins['Houston-Pasadena, TX'], origins['Los Angeles-Long Beach, CA'])
-    newpath, newpathgraph = findPath(graph, origins['Salt Lake City-Provo-Orem, UT-ID'], origins['Duluth-Grand Rapids, MN-WI'])
-    ultranewpath, ultranewpathgraph = findPath(graph, origins['Boston-Worcester-Providence, MA-RI-NH'], origins['Miami-Port St. Lucie-Fort Lauderdale, FL'])
-    
-    end = time.time()
-    print(end - start)
-    
-    
-    # visualize(graph, positions, isnx=True)
-    # visualize(pathgraph, isnx=True)
-    
-    # toShapefile(pathgraph, 'BayToSea')
-    
-    toShapefile(pathgraph, 'TXCA')
-    toShapefile(newpathgraph, 'UTMN')
-    toShapefile(ultranewpathgraph, 'MAFL')
-    
-    # return centroids, graph, positions, origins, path, pathgraph
-
-
-# centroids, graph, positions, origins, path, pathgraph = main()
+        csrGraph = saveCSRGraph("highway_graph", load=True)
+        origins = saveGraph("origins", load=True)
+
+    # Landmarks are specific to the edge weight, so they're saved separately for each one
+    landmarksName = f"highway_graph_landmarks_{EDGE_WEIGHT_ARRAYS[args.weight]}"
+    if args.load and os.path.exists(f"{top_dir}/data/graphs/{landmarksName}.npz"):
+        landmarks = saveCSRGraph(landmarksName, load=True)
+    else:
+        landmarks = createLandmarks(csrGraph, weight=args.weight)
+        saveCSRGraph(landmarksName, landmarks, load=False)
+
+    if args.benchmark > 0:
+        benchmark = benchmarkALT(
+            csrGraph, landmarks, nQueries=args.benchmark, weight=args.weight
+        )
+        benchmark.to_csv(f"{top_dir}/data/graphs/alt_benchmark.csv", index=False)
+        print(benchmark.describe())
+
+    if args.all_pairs:
+        # Create the directory to contain the routes if it doesn't exist
+        routeDir = f"{top_dir}/data/paths_of_interest"
+        if not os.path.exists(routeDir):
+            os.makedirs(routeDir)
+
+        routes = findAllCSRPaths(
+            f"{top_dir}/data/graphs/highway_graph.npz",
+            origins,
+            weight=args.weight,
+            numProcesses=args.num_processes,
+        )
+        routes.to_parquet(f"{routeDir}/csa_routes.parquet", index=False)
+        if args.geoparquet:
+            routesToGeoDataFrame(highways, routes).to_parquet(
+                f"{routeDir}/csa_route_geometries.parquet", index=False
+            )
+
+        end = time.time()
+        print(f"Routed {len(routes)} pairs in {end - start:.1f} s")
+
+    else:
+        routes = {
+            "TXCA": ("Houston-Pasadena, TX", "Los Angeles-Long Beach, CA"),
+            "UTMN": ("Salt Lake City-Provo-Orem, UT-ID", "Duluth-Grand Rapids, MN-WI"),
+            "MAFL": (
+                "Boston-Worcester-Providence, MA-RI-NH",
+                "Miami-Port St. Lucie-Fort Lauderdale, FL",
+            ),
+        }
+        paths = {}
+        for routeName, (orig, dest) in routes.items():
+            pathNodes, pathLinks = findALTPath(
+                csrGraph, landmarks, origins[orig], origins[dest], weight=args.weight
+            )
+            paths[routeName] = csrPathToGeoDataFrame(highways, pathLinks)
+
+        end = time.time()
+        print(end - start)
+
+        # visualize(paths["TXCA"])
+
+        for routeName, path in paths.items():
+            toShapefile(path, routeName)
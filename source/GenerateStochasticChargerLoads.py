@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Created on Mon Oct 19 19:10:00 2026
+
+@author: danikam
+
+Generates stochastic full-year hourly load traces for every charging site. Truck arrivals at each site are sampled hour by hour from a Poisson process, whose rate follows the average power demand of the site and the daily (and optionally weekly and seasonal) charging profile, and the energy delivered in each charging session is sampled from a gamma distribution. The traces are stored as a memory-mapped array, and the coincident peak load in each zone is compared with the peak loads of its individual sites.
+"""
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import argparse
+import os
+
+from CommonTools import get_top_dir
+from EvaluateHourlyTruckingEnergyDemand import (
+    get_hourly_daily_profile,
+    make_annual_profile,
+)
+
+KWH_PER_MWH = 1000.0
+
+# Average energy delivered per charging session (kWh), taken to be roughly 2/3 of the ~900 kWh battery of the Tesla Semi
+SESSION_ENERGY_KWH = 600.0
+
+# Shape parameter of the gamma distribution of session energies (the coefficient of variation is 1/sqrt(shape))
+SESSION_ENERGY_SHAPE = 4.0
+
+# Number of charging sites whose load traces are sampled together in each batch
+BATCH_SIZE = 512
+
+# Zone assigned to charging sites that don't fall in any zone
+NO_ZONE_LABEL = "none"
+
+
+def get_charger_zones(chargers_df):
+    """
+    Gets the zone of each charging site
+
+    Parameters
+    ----------
+    chargers_df (pd.DataFrame): Charging sites, optionally with their zone ('zone')
+
+    Returns
+    -------
+    charger_zones (np.array): Zone of each charging site, or NO_ZONE_LABEL for sites without a zone
+    """
+    if "zone" not in chargers_df.columns:
+        return np.full(len(chargers_df), NO_ZONE_LABEL, dtype=object)
+    return chargers_df["zone"].fillna(NO_ZONE_LABEL).to_numpy(dtype=object)
+
+
+def sample_charger_loads(
+    rng,
+    av_power_demands,
+    annual_profile,
+    session_energy_kwh=SESSION_ENERGY_KWH,
+    session_energy_shape=SESSION_ENERGY_SHAPE,
+):
+    """
+    Samples the hourly load of each charging site over the full year, given its average power demand
+
+    Parameters
+    ----------
+    rng (np.random.Generator): Random number generator
+    av_power_demands (np.array): Average power demand of each charging site (MW)
+    annual_profile (np.array): Fraction of the annual energy demand falling in each hour of the year (sums to 1)
+    session_energy_kwh (float): Average energy delivered per charging session (kWh)
+    session_energy_shape (float): Shape parameter of the gamma distribution of session energies
+
+    Returns
+    -------
+    charger_loads (np.array): Array of shape (number of charging sites, hours in the year) containing the energy delivered by each site in each hour (in MWh, equivalently the average power in MW over the hour)
+
+    NOTE: The energy of each session is counted in the hour the truck arrives, which assumes that sessions are short compared with an hour.
+    """
+    n_hours = len(annual_profile)
+    annual_demand = np.asarray(av_power_demands, dtype=float) * n_hours
+
+    # Expected number of arrivals at each site in each hour of the year
+    arrival_rates = (
+        annual_demand[:, np.newaxis]
+        * annual_profile[np.newaxis, :]
+        * KWH_PER_MWH
+        / session_energy_kwh
+    )
+    n_arrivals = rng.poisson(arrival_rates)
+
+    # The sum of n gamma-distributed session energies is itself gamma-distributed with n times the shape, so the energy in each hour can be sampled in one draw
+    hourly_energy_kwh = rng.gamma(
+        n_arrivals * session_energy_shape, session_energy_kwh / session_energy_shape
+    )
+
+    return hourly_energy_kwh / KWH_PER_MWH
+
+
+def generate_stochastic_charger_loads(
+    chargers_df,
+    annual_profile,
+    save_path,
+    seed=None,
+    batch_size=BATCH_SIZE,
+    session_energy_kwh=SESSION_ENERGY_KWH,
+    session_energy_shape=SESSION_ENERGY_SHAPE,
+):
+    """
+    Samples the full-year hourly load trace of every charging site in batches, storing the traces as a memory-mapped array and adding them up over each zone as they're sampled
+
+    Parameters
+    ----------
+    chargers_df (pd.DataFrame): Charging sites, with their average power demand ('Av P Dem', in MW) and optionally their zone ('zone')
+    annual_profile (np.array): Fraction of the annual energy demand falling in each hour of the year (sums to 1)
+    save_path (string): Path to the .npy file to store the load traces in
+    seed (int): Seed for the random number generator
+    batch_size (int): Number of charging sites to sample together
+    session_energy_kwh (float): Average energy delivered per charging session (kWh)
+    session_energy_shape (float): Shape parameter of the gamma distribution of session energies
+
+    Returns
+    -------
+    charger_loads (np.memmap): Memory-mapped array of shape (number of charging sites, hours in the year) containing the hourly load of each site (MW), ordered as in chargers_df
+    zones (np.array): Name of each zone
+    zone_loads (np.array): Array of shape (number of zones, hours in the year) containing the total hourly load in each zone (MW)
+    zone_sum_peaks (np.array): Sum of the peak loads of the individual charging sites in each zone (MW)
+
+    NOTE: The traces depend on the batch size as well as the seed, since each batch gets its own random number stream.
+    """
+    save_dir = os.path.dirname(save_path)
+    if not os.path.exists(save_dir):
+        os.makedirs(save_dir)
+
+    av_power_demands = chargers_df["Av P Dem"].to_numpy(dtype=float)
+    zone_codes, zones = pd.factorize(get_charger_zones(chargers_df), sort=True)
+
+    n_chargers = len(av_power_demands)
+    n_hours = len(annual_profile)
+    charger_loads = np.lib.format.open_memmap(
+        save_path, mode="w+", dtype=np.float32, shape=(n_chargers, n_hours)
+    )
+    zone_loads = np.zeros((len(zones), n_hours))
+    zone_sum_peaks = np.zeros(len(zones))
+
+    # Give each batch its own independent random number stream
+    batch_starts = np.arange(0, n_chargers, batch_size)
+    batch_seeds = np.random.SeedSequence(seed).spawn(len(batch_starts))
+    for batch_start, batch_seed in zip(batch_starts, batch_seeds):
+        batch = slice(batch_start, min(batch_start + batch_size, n_chargers))
+        batch_loads = sample_charger_loads(
+            np.random.default_rng(batch_seed),
+            av_power_demands[batch],
+            annual_profile,
+            session_energy_kwh,
+            session_energy_shape,
+        )
+        charger_loads[batch] = batch_loads
+
+        # Add the batch to the zone totals with a single indicator-matrix product
+        zone_indicator = (
+            zone_codes[batch][np.newaxis, :] == np.arange(len(zones))[:, np.newaxis]
+        ).astype(float)
+        zone_loads += zone_indicator @ batch_loads
+        zone_sum_peaks += zone_indicator @ np.max(batch_loads, axis=1)
+
+    charger_loads.flush()
+
+    return charger_loads, np.asarray(zones), zone_loads, zone_sum_peaks
+
+
+def evaluate_coincident_peak_stats(
+    zones, zone_loads, zone_sum_peaks, timestamps, n_chargers_by_zone
+):
+    """
+    Evaluates statistics of the coincident peak load in each zone
+
+    Parameters
+    ----------
+    zones (np.array): Name of each zone
+    zone_loads (np.array): Array of shape (number of zones, hours in the year) containing the total hourly load in each zone (MW)
+    zone_sum_peaks (np.array): Sum of the peak loads of the individual charging sites in each zone (MW)
+    timestamps (pd.DatetimeIndex): Start of each hour of the year
+    n_chargers_by_zone (np.array): Number of charging sites in each zone
+
+    Returns
+    -------
+    peak_stats_df (pd.DataFrame): Dataframe with one row per zone, containing the number of charging sites, the mean and 99th percentile hourly load, the coincident peak load and the hour it occurs in, the sum of the individual peak loads, the coincidence factor (coincident peak / sum of individual peaks) and the load factor (mean / coincident peak)
+    """
+    peak_hours = np.argmax(zone_loads, axis=1)
+    peak_loads = zone_loads[np.arange(len(zones)), peak_hours]
+    mean_loads = np.mean(zone_loads, axis=1)
+
+    return pd.DataFrame(
+        {
+            "zone": zones,
+            "N Chargers": np.asarray(n_chargers_by_zone),
+            "Mean Load (MW)": mean_loads,
+            "P99 Load (MW)": np.percentile(zone_loads, 99, axis=1),
+            "Peak Load (MW)": peak_loads,
+            "Peak Hour": timestamps[peak_hours],
+            "Sum Ind Peaks (MW)": zone_sum_peaks,
+            "Coincidence Factor": peak_loads / zone_sum_peaks,
+            "Load Factor": mean_loads / peak_loads,
+        }
+    )
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "-f",
+    "--charger_locations",
+    default=None,
+    help="Path to a geojson or shapefile containing the charging sites, with their average power demand (Av P Dem, in MW) and optionally their ERCOT weather zone (zone). Defaults to the Texas charging sites produced by TT_charging_analysis.py.",
+)
+parser.add_argument(
+    "-s",
+    "--seed",
+    default=None,
+    type=int,
+    help="Seed for the random number generator",
+)
+parser.add_argument(
+    "-e",
+    "--session_energy",
+    default=SESSION_ENERGY_KWH,
+    type=float,
+    help="Average energy delivered per charging session (kWh)",
+)
+parser.add_argument(
+    "-k",
+    "--session_energy_shape",
+    default=SESSION_ENERGY_SHAPE,
+    type=float,
+    help="Shape parameter of the gamma distribution of session energies",
+)
+parser.add_argument(
+    "-b",
+    "--batch_size",
+    default=BATCH_SIZE,
+    type=int,
+    help="Number of charging sites to sample together",
+)
+
+
+def main():
+    args = parser.parse_args()
+
+    # Get the path to the top level of the Git repo
+    top_dir = get_top_dir()
+
+    charger_locations_path = args.charger_locations
+    if charger_locations_path is None:
+        charger_locations_path = f"{top_dir}/data/TT_charger_locations.json"
+    chargers_df = gpd.read_file(charger_locations_path).drop(columns=["geometry"])
+
+    # Combine the daily charging profile into a full-year hourly profile
+    daily_profile = get_hourly_daily_profile(top_dir)
+    timestamps, annual_profile = make_annual_profile(daily_profile)
+
+    # Sample the load trace of every charging site
+    save_dir = f"{top_dir}/data/stochastic_charger_loads"
+    charger_loads, zones, zone_loads, zone_sum_peaks = (
+        generate_stochastic_charger_loads(
+            chargers_df,
+            annual_profile,
+            f"{save_dir}/charger_loads.npy",
+            seed=args.seed,
+            batch_size=args.batch_size,
+            session_energy_kwh=args.session_energy,
+            session_energy_shape=args.session_energy_shape,
+        )
+    )
+
+    # Save the charging sites in the same order as the rows of the load traces
+    chargers_df.to_csv(f"{save_dir}/chargers.csv", index=False)
+
+    # Save the total hourly load in each zone
+    zone_loads_df = pd.DataFrame(zone_loads.T, columns=zones)
+    zone_loads_df.insert(0, "Hour Beginning", timestamps)
+    zone_loads_df.to_csv(f"{save_dir}/zone_loads.csv", index=False)
+
+    # Evaluate and save the coincident peak statistics for each zone
+    n_chargers_by_zone = (
+        pd.Series(get_charger_zones(chargers_df)).value_counts().reindex(zones)
+    )
+    peak_stats_df = evaluate_coincident_peak_stats(
+        zones, zone_loads, zone_sum_peaks, timestamps, n_chargers_by_zone
+    )
+    peak_stats_df.to_csv(f"{save_dir}/zone_peak_stats.csv", index=False)
+    print(peak_stats_df)
+
+
+if __name__ == "__main__":
+    main()
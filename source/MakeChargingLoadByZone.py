@@ -9,6 +9,7 @@ Created on Wed May 30 20:31:00 2024
 
 import numpy as np
 import pandas as pd
+import argparse
 
 import geopandas as gpd
 from CommonTools import get_top_dir
@@ -17,10 +18,27 @@ from scipy.interpolate import UnivariateSpline
 
 import matplotlib.pyplot as plt
 
+# Number of points in the smoothed daily load profiles
+N_PROFILE_POINTS = 300
 
-def get_ev_load_profile(top_dir, load_profile_path):
-    load_profile_df = pd.read_csv(load_profile_path)
+# Label of the rows containing the total load over all charging sites in a zone
+TOTAL_LABEL = "Total"
+
+
+def smooth_load_profile(load_profile_df, n_points=N_PROFILE_POINTS):
+    """
+    Smooths a daily load profile with a spline interpolation, evaluated at evenly spaced times over the day
 
+    Parameters
+    ----------
+    load_profile_df (pd.DataFrame): Dataframe containing the load profile, with columns 'Hours' and 'Power (kW)'
+    n_points (int): Number of evenly spaced times to evaluate the smoothed profile at
+
+    Returns
+    -------
+    hours_fine (np.array): Times over the day (hours) that the smoothed profile is evaluated at
+    power_smooth (np.array): Smoothed power (kW) at each time
+    """
     # Sort the DataFrame based on the 'Hours' column
     load_profile_df = load_profile_df.sort_values(by="Hours", ascending=True)
 
@@ -31,9 +49,18 @@ def get_ev_load_profile(top_dir, load_profile_path):
     spline = UnivariateSpline(
         load_profile_df["Hours"], load_profile_df["Power (kW)"], s=500, ext=3
     )
-    hours_fine = np.linspace(0, 24, 300)
+    hours_fine = np.linspace(0, 24, n_points)
     power_smooth = spline(hours_fine)
 
+    return hours_fine, power_smooth
+
+
+def get_ev_load_profile(top_dir, load_profile_path):
+    load_profile_df = pd.read_csv(load_profile_path)
+
+    # Get a spline interpolation
+    hours_fine, power_smooth = smooth_load_profile(load_profile_df)
+
     fig, ax = plt.subplots(figsize=(10, 8))
     ax.set_ylabel("Power (kW)", fontsize=20)
     ax.set_xlabel("Hours", fontsize=20)
@@ -59,48 +86,231 @@ def get_ev_load_profile(top_dir, load_profile_path):
 
     # Save the normalized load profile to a file
     load_profile_smooth_df = pd.DataFrame({"Hours": hours_fine, "Power": power_smooth})
-    load_profile_smooth_df.to_csv("data/extreme_load_profile_smooth.csv")
+    load_profile_smooth_df.to_csv(f"{top_dir}/data/extreme_load_profile_smooth.csv")
 
     return load_profile_smooth_df
 
 
-def get_daily_ev_demands(top_dir, ev_load_data_gpd, ev_daily_load_profile_df):
-    # Drop the geometry data (we don't care about it anymore)
-    ev_load_data_df = ev_load_data_gpd.drop(columns=["geometry"])
+def read_load_profile(load_profile_path):
+    """
+    Reads in a daily load profile and smooths it, without producing any plots
+
+    Parameters
+    ----------
+    load_profile_path (string): Path to a csv file containing the load profile, with columns 'Hours' and 'Power (kW)'
 
-    zones = ev_load_data_df["zone"].unique()
-
-    for zone in zones:
-        ev_load_data_zone_df = ev_load_data_df[ev_load_data_df["zone"] == zone]
-        daily_ev_load_dict = {}
-        for center in ev_load_data_zone_df["Nearest Center"]:
-            daily_ev_load_dict[center] = (
-                float(
-                    ev_load_data_zone_df["Av P Dem"][
-                        ev_load_data_zone_df["Nearest Center"] == center
-                    ].iloc[0]
-                )
-                * ev_daily_load_profile_df["Power"]
+    Returns
+    -------
+    load_profile_smooth_df (pd.DataFrame): Dataframe containing the smoothed load profile, with columns 'Hours' and 'Power'
+    """
+    hours_fine, power_smooth = smooth_load_profile(pd.read_csv(load_profile_path))
+    return pd.DataFrame({"Hours": hours_fine, "Power": power_smooth})
+
+
+def make_profile_bank(load_profile_dfs, n_points=N_PROFILE_POINTS):
+    """
+    Collects daily load profiles into a single array, evaluated at the same evenly spaced times over the day and each normalized such that its average is 1
+
+    Parameters
+    ----------
+    load_profile_dfs (dict of pd.DataFrames): Dataframe containing each named load profile, with columns 'Hours' and 'Power'
+    n_points (int): Number of evenly spaced times over the day to evaluate the profiles at
+
+    Returns
+    -------
+    hours (np.array): Times over the day (hours) that the profiles are evaluated at
+    profile_names (list of strings): Name of each profile
+    profiles (np.array): Array of shape (number of profiles, number of times) containing the normalized profiles
+    """
+    hours = np.linspace(0, 24, n_points)
+    profile_names = list(load_profile_dfs)
+    profiles = np.array(
+        [
+            np.interp(
+                hours,
+                load_profile_dfs[name]["Hours"].to_numpy(dtype=float),
+                load_profile_dfs[name]["Power"].to_numpy(dtype=float),
             )
+            for name in profile_names
+        ]
+    ).reshape(len(profile_names), n_points)
+
+    # Normalize each profile such that its average is 1
+    profiles = profiles / np.mean(profiles, axis=1, keepdims=True)
+
+    return hours, profile_names, profiles
+
+
+def synthesize_charger_loads(av_power_demands, profiles):
+    """
+    Evaluates the daily load of every charging site for every profile in one go
+
+    Parameters
+    ----------
+    av_power_demands (np.array): Average power demand of each charging site (MW)
+    profiles (np.array): Array of shape (number of profiles, number of times) containing the normalized profiles
+
+    Returns
+    -------
+    charger_loads (np.array): Array of shape (number of charging sites, number of profiles, number of times) containing the load of each site (MW)
+    """
+    return (
+        np.asarray(av_power_demands, dtype=float)[:, np.newaxis, np.newaxis]
+        * profiles[np.newaxis, :, :]
+    )
+
+
+def sum_loads_by_zone(charger_loads, charger_zones):
+    """
+    Adds up the loads of all charging sites in each zone
 
-        daily_ev_load_df = pd.DataFrame(daily_ev_load_dict)
-        daily_ev_load_df["Hours"] = ev_daily_load_profile_df["Hours"]
-        daily_ev_load_df["Total (MW)"] = daily_ev_load_df.sum(axis=1)
+    Parameters
+    ----------
+    charger_loads (np.array): Array of shape (number of charging sites, number of profiles, number of times) containing the load of each site
+    charger_zones (array-like): Zone of each charging site
 
-        daily_ev_load_df.to_csv(f"{top_dir}/data/daily_ev_load_{zone}.csv", index=False)
+    Returns
+    -------
+    zones (np.array): Name of each zone
+    zone_loads (np.array): Array of shape (number of zones, number of profiles, number of times) containing the total load in each zone
+    """
+    zone_codes, zones = pd.factorize(np.asarray(charger_zones), sort=True)
+
+    # Sum over the sites in each zone with a single matrix product
+    zone_indicator = (
+        zone_codes[np.newaxis, :] == np.arange(len(zones))[:, np.newaxis]
+    ).astype(float)
+    zone_loads = (
+        zone_indicator @ charger_loads.reshape(len(charger_loads), -1)
+    ).reshape((len(zones),) + charger_loads.shape[1:])
+
+    return np.asarray(zones), zone_loads
+
+
+def make_tidy_loads_df(zones, centers, hours, profile_names, loads):
+    """
+    Flattens an array of daily loads into a tidy dataframe with one row per zone, center, profile and time
+
+    Parameters
+    ----------
+    zones (array-like): Zone of each row of loads
+    centers (array-like): Charging site (or TOTAL_LABEL) of each row of loads
+    hours (np.array): Times over the day (hours)
+    profile_names (list of strings): Name of each profile
+    loads (np.array): Array of shape (number of rows, number of profiles, number of times) containing the loads (MW)
+
+    Returns
+    -------
+    loads_df (pd.DataFrame): Tidy dataframe with columns 'zone', 'Nearest Center', 'Profile', 'Hours' and 'Power (MW)'
+    """
+    n_rows, n_profiles, n_times = loads.shape
+    return pd.DataFrame(
+        {
+            "zone": np.repeat(np.asarray(zones), n_profiles * n_times),
+            "Nearest Center": np.repeat(np.asarray(centers), n_profiles * n_times),
+            "Profile": np.tile(np.repeat(np.asarray(profile_names), n_times), n_rows),
+            "Hours": np.tile(hours, n_rows * n_profiles),
+            "Power (MW)": loads.ravel(),
+        }
+    )
+
+
+def get_daily_ev_demands(
+    top_dir, ev_load_data_gpd, hours, profile_names, profiles, save_path=None
+):
+    """
+    Evaluates the daily load from each charging site and the total over each ERCOT weather zone, for every profile in the bank, and saves them to a single tidy csv file
+
+    Parameters
+    ----------
+    top_dir (string): Path to top-level directory of the repository
+    ev_load_data_gpd (gpd.GeoDataFrame): Charging sites, with their average power demand ('Av P Dem', in MW) and ERCOT weather zone ('zone')
+    hours (np.array): Times over the day (hours) that the profiles are evaluated at
+    profile_names (list of strings): Name of each profile
+    profiles (np.array): Array of shape (number of profiles, number of times) containing the normalized profiles
+    save_path (string): Path to save the csv file to. Defaults to data/daily_ev_load_by_zone.csv.
+
+    Returns
+    -------
+    daily_ev_load_df (pd.DataFrame): Tidy dataframe with columns 'zone', 'Nearest Center', 'Profile', 'Hours' and 'Power (MW)'. The total load over each zone is given in the rows with 'Nearest Center' set to TOTAL_LABEL.
+
+    NOTE: Charging sites that don't fall within any ERCOT weather zone are left out.
+    """
+    if save_path is None:
+        save_path = f"{top_dir}/data/daily_ev_load_by_zone.csv"
+
+    # Drop the geometry data (we don't care about it anymore), along with any sites outside the ERCOT zones
+    ev_load_data_df = ev_load_data_gpd.drop(columns=["geometry"])
+    ev_load_data_df = ev_load_data_df[ev_load_data_df["zone"].notna()]
+
+    # Evaluate the load of every charging site for every profile, and add them up over each zone
+    charger_loads = synthesize_charger_loads(
+        ev_load_data_df["Av P Dem"].to_numpy(dtype=float), profiles
+    )
+    zones, zone_loads = sum_loads_by_zone(charger_loads, ev_load_data_df["zone"])
+
+    daily_ev_load_df = pd.concat(
+        [
+            make_tidy_loads_df(
+                ev_load_data_df["zone"],
+                ev_load_data_df["Nearest Center"],
+                hours,
+                profile_names,
+                charger_loads,
+            ),
+            make_tidy_loads_df(
+                zones,
+                np.full(len(zones), TOTAL_LABEL),
+                hours,
+                profile_names,
+                zone_loads,
+            ),
+        ],
+        ignore_index=True,
+    )
+    daily_ev_load_df = daily_ev_load_df.sort_values(
+        ["zone", "Profile"], kind="stable", ignore_index=True
+    )
+
+    daily_ev_load_df.to_csv(save_path, index=False)
+
+    return daily_ev_load_df
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "-p",
+    "--profiles",
+    nargs="*",
+    default=[],
+    help="Additional daily load profiles to evaluate, each given as NAME=PATH to a csv file with columns 'Hours' and 'Power (kW)' (e.g. weekday, weekend or seasonal profiles)",
+)
 
 
 def main():
+    args = parser.parse_args()
+
     # Get the path to the top level of the Git repo
     top_dir = get_top_dir()
 
     ev_load_data_gpd = gpd.read_file(f"{top_dir}/data/TT_charger_locations.json")
 
-    ev_daily_load_profile_df = get_ev_load_profile(
-        top_dir, f"{top_dir}/data/Borlaug_et_al_most_extreme_HDEV_load_profile.csv"
-    )
+    # Collect the bank of daily load profiles: the most extreme profile from Borlaug et al., a flat profile for reference, and any additional profiles provided
+    load_profile_dfs = {
+        "extreme": get_ev_load_profile(
+            top_dir,
+            f"{top_dir}/data/Borlaug_et_al_most_extreme_HDEV_load_profile.csv",
+        ),
+        "flat": pd.DataFrame({"Hours": [0.0, 24.0], "Power": [1.0, 1.0]}),
+    }
+    for profile in args.profiles:
+        name, path = profile.split("=", 1)
+        load_profile_dfs[name] = read_load_profile(path)
+
+    hours, profile_names, profiles = make_profile_bank(load_profile_dfs)
 
-    get_daily_ev_demands(top_dir, ev_load_data_gpd, ev_daily_load_profile_df)
+    get_daily_ev_demands(top_dir, ev_load_data_gpd, hours, profile_names, profiles)
 
 
-main()
+if __name__ == "__main__":
+    main()
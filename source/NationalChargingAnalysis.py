@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Created on Mon Oct 19 18:40:00 2026
+
+@author: danikam
+
+Generalizes the charger energy demand evaluation in TT_charging_analysis.py from Texas to any list of states. The US highway links are partitioned by state once, and each state is evaluated in its own worker process, which only reads in its own partition. The charger demands are saved for each state, along with a national rollup.
+
+NOTE: Each state only includes the highway links within the state, so chargers near state borders don't pick up demand from links across the border.
+"""
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import concurrent.futures
+import argparse
+import os
+
+from CommonTools import get_top_dir, get_stage_key
+from AnalyzeTruckStopCharging import get_min_chargers_save_path
+from TT_charging_analysis import (
+    make_charger_circles,
+    build_link_charger_network_incidence,
+    get_scaled_highway_links_in_circles,
+    evaluate_average_payload,
+    evaluate_average_mileage,
+    evaluate_annual_e_demand_link,
+    evaluate_annual_e_demand_charger,
+)
+
+# Abbreviations of the contiguous US states (and DC)
+CONTIGUOUS_STATES = (
+    "AL AZ AR CA CO CT DE DC FL GA ID IL IN IA KS KY LA ME MD MA MI MN MS MO MT NE NV "
+    "NH NJ NM NY NC ND OH OK OR PA RI SC SD TN TX UT VT VA WA WV WI WY"
+).split()
+
+
+def partition_links_by_state(us_links_path, cache_dir, state_column="STATE"):
+    """
+    Partitions the US highway links by state into one GeoParquet file per state. The partitions are keyed by the contents of the input links and the source code of this function, so the links are only partitioned again if either changes.
+
+    Parameters
+    ----------
+    us_links_path (string): Path to the shapefile containing the US highway links
+    cache_dir (string): Directory to save the partitions in
+    state_column (string): Name of the column containing the state abbreviation for each link
+
+    Returns
+    -------
+    partition_dir (string): Directory containing the partitions, named links_[state].parquet
+    """
+    partition_key = get_stage_key(
+        input_paths=[us_links_path],
+        params={"state_column": state_column},
+        functions=[partition_links_by_state],
+    )
+    partition_dir = f"{cache_dir}/links_by_state_{partition_key[:16]}"
+    if os.path.isdir(partition_dir):
+        return partition_dir
+
+    print(f"Partitioning {us_links_path} by state")
+    us_links_gdf = gpd.read_file(us_links_path)
+
+    # Write to a temporary directory first so that an interrupted run doesn't leave an incomplete set of partitions
+    temp_partition_dir = f"{partition_dir}.{os.getpid()}.tmp"
+    os.makedirs(temp_partition_dir)
+    for state, state_links_gdf in us_links_gdf.groupby(state_column):
+        state_links_gdf.to_parquet(f"{temp_partition_dir}/links_{state}.parquet")
+    os.replace(temp_partition_dir, partition_dir)
+
+    return partition_dir
+
+
+def read_charger_locations(charger_locations_path):
+    """
+    Reads in charger locations from either a csv file with Latitude and Longitude columns, or any point layer readable by geopandas
+
+    Parameters
+    ----------
+    charger_locations_path (string): Path to the charger locations
+
+    Returns
+    -------
+    charger_locations_gdf (gpd.GeoDataFrame): Charger locations, in EPSG:4326
+    """
+    if charger_locations_path.endswith(".csv"):
+        charger_locations_df = pd.read_csv(charger_locations_path)
+        return gpd.GeoDataFrame(
+            charger_locations_df,
+            geometry=gpd.points_from_xy(
+                charger_locations_df.Longitude, charger_locations_df.Latitude
+            ),
+            crs="EPSG:4326",
+        )
+    elif charger_locations_path.endswith(".parquet"):
+        return gpd.read_parquet(charger_locations_path).to_crs("EPSG:4326")
+    else:
+        return gpd.read_file(charger_locations_path).to_crs("EPSG:4326")
+
+
+def assign_chargers_to_states(charger_locations_gdf, state_boundaries_path):
+    """
+    Assigns each charger to the state it lies in
+
+    Parameters
+    ----------
+    charger_locations_gdf (gpd.GeoDataFrame): Charger locations, in EPSG:4326
+    state_boundaries_path (string): Path to the shapefile containing US state boundaries
+
+    Returns
+    -------
+    charger_locations_gdf (gpd.GeoDataFrame): Charger locations with the state (STUSPS column) each lies in. If the chargers don't already have a 'Nearest Center' identifier, one is added.
+    """
+    state_boundaries_gdf = gpd.read_file(state_boundaries_path)[
+        ["STUSPS", "geometry"]
+    ].to_crs("EPSG:4326")
+
+    charger_locations_gdf = gpd.sjoin(
+        charger_locations_gdf.drop(columns=["STUSPS"], errors="ignore"),
+        state_boundaries_gdf,
+        how="left",
+        predicate="within",
+    ).drop(columns=["index_right"])
+
+    # Drop any duplicates from chargers lying exactly on a state border
+    charger_locations_gdf = charger_locations_gdf[
+        ~charger_locations_gdf.index.duplicated()
+    ].reset_index(drop=True)
+
+    if "Nearest Center" not in charger_locations_gdf.columns:
+        charger_locations_gdf["Nearest Center"] = [
+            f"{state}_{i_charger}"
+            for i_charger, state in enumerate(charger_locations_gdf["STUSPS"])
+        ]
+
+    return charger_locations_gdf
+
+
+def evaluate_state_charger_demand(
+    top_dir,
+    state,
+    links_path,
+    charger_locations_gdf,
+    radius=100.0,
+    catchment="circle",
+    length_weighted=False,
+    save_dir=None,
+):
+    """
+    Evaluates the annual energy demand on each charger in a state from the highway links in its catchment, as in TT_charging_analysis.py
+
+    Parameters
+    ----------
+    top_dir (string): Path to top-level directory of the repository
+    state (string): State abbreviation
+    links_path (string): Path to the GeoParquet file containing the highway links in the state
+    charger_locations_gdf (gpd.GeoDataFrame): Charger locations in the state, in EPSG:4326
+    radius (float): Catchment radius (miles) of each charger
+    catchment (string): 'circle' to assign links to every charger within the radius in a straight line, or 'network' to assign them to the nearest charger by driving distance up to the radius
+    length_weighted (bool): For circle catchments, weight the contribution of each link to each charger by the fraction of its length inside the charger's circle
+    save_dir (string): Directory to save the charger demands for the state to
+
+    Returns
+    -------
+    charger_locations_gdf (gpd.GeoDataFrame): Charger locations in the state, with the annual energy demand (An E Dem, in MWh) and average power demand (Av P Dem, in MW) of each
+    """
+    state_highways_gdf = gpd.read_parquet(links_path).to_crs("EPSG:4326")
+    charger_locations_gdf = charger_locations_gdf.reset_index(drop=True)
+
+    # Evaluate circles around each charger of the given radius to contain highway links contributing to the charger's annual energy demand
+    charger_circles_gdf = make_charger_circles(charger_locations_gdf, radius=radius)
+
+    incidence = None
+    if catchment == "network":
+        incidence = build_link_charger_network_incidence(
+            state_highways_gdf, charger_locations_gdf, max_distance=radius
+        )
+
+    filtered_highways_gdf, filtered_incidence = get_scaled_highway_links_in_circles(
+        charger_circles_gdf,
+        state_highways_gdf,
+        length_weighted=length_weighted,
+        incidence=incidence,
+    )
+
+    # Evaluate the annual energy demand associated with trucks passing over each link if they're all electrified
+    filtered_highways_gdf = evaluate_average_payload(filtered_highways_gdf)
+    filtered_highways_gdf = evaluate_average_mileage(top_dir, filtered_highways_gdf)
+    filtered_highways_gdf = evaluate_annual_e_demand_link(
+        top_dir, filtered_highways_gdf
+    )
+
+    # Add up the total annual energy demand associated with fully electrifying highway links in the vicinity of each charger
+    charger_locations_gdf = evaluate_annual_e_demand_charger(
+        filtered_highways_gdf,
+        charger_circles_gdf,
+        charger_locations_gdf,
+        incidence=filtered_incidence,
+    )
+
+    if save_dir is not None:
+        charger_locations_gdf.to_file(
+            f"{save_dir}/charger_demand_{state}.geojson", driver="GeoJSON"
+        )
+
+    return charger_locations_gdf
+
+
+def evaluate_national_charger_demand(
+    top_dir,
+    charger_locations_gdf,
+    states=CONTIGUOUS_STATES,
+    radius=100.0,
+    catchment="circle",
+    length_weighted=False,
+    save_dir=None,
+    num_processes=None,
+):
+    """
+    Evaluates the annual energy demand on each charger for each of the given states in parallel, with one task per state
+
+    Parameters
+    ----------
+    top_dir (string): Path to top-level directory of the repository
+    charger_locations_gdf (gpd.GeoDataFrame): Charger locations, in EPSG:4326
+    states (list of strings): Abbreviations of the states to evaluate
+    radius (float): Catchment radius (miles) of each charger
+    catchment (string): 'circle' or 'network' (see evaluate_state_charger_demand())
+    length_weighted (bool): For circle catchments, weight the contribution of each link by the fraction of its length inside each charger's circle
+    save_dir (string): Directory to save the per-state and national outputs to. Defaults to data/national_charging_analysis.
+    num_processes (int): Number of processes to use (default is the number of CPUs)
+
+    Returns
+    -------
+    national_chargers_gdf (gpd.GeoDataFrame): Charger locations in all states, with the annual energy and average power demand of each
+    state_summary_df (pd.DataFrame): Number of chargers and total charger demands in each state
+    """
+    if save_dir is None:
+        save_dir = f"{top_dir}/data/national_charging_analysis"
+    if not os.path.exists(save_dir):
+        os.makedirs(save_dir)
+
+    # Partition the US highway links by state (only if this hasn't already been done for the current links)
+    partition_dir = partition_links_by_state(
+        f"{top_dir}/data/highway_assignment_links/highway_assignment_links_nomin.shp",
+        f"{top_dir}/data/cache",
+    )
+
+    charger_locations_gdf = assign_chargers_to_states(
+        charger_locations_gdf, f"{top_dir}/data/state_boundaries/tl_2012_us_state.shp"
+    )
+
+    # Only evaluate states with both highway links and chargers
+    links_paths = {state: f"{partition_dir}/links_{state}.parquet" for state in states}
+    states = [
+        state
+        for state in states
+        if os.path.isfile(links_paths[state])
+        and np.any(charger_locations_gdf["STUSPS"] == state)
+    ]
+
+    # Start the states with the most highway links first, so the longest tasks don't hold up the end of the run
+    states = sorted(states, key=lambda state: -os.path.getsize(links_paths[state]))
+
+    state_chargers_gdfs = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=num_processes) as executor:
+        futures = [
+            executor.submit(
+                evaluate_state_charger_demand,
+                top_dir,
+                state,
+                links_paths[state],
+                charger_locations_gdf[charger_locations_gdf["STUSPS"] == state],
+                radius,
+                catchment,
+                length_weighted,
+                save_dir,
+            )
+            for state in states
+        ]
+        for state, future in zip(states, futures):
+            state_chargers_gdfs.append(future.result())
+            print(f"Evaluated charger demand for {state}")
+
+    # Roll up the charger demands for all states
+    national_chargers_gdf = gpd.GeoDataFrame(
+        pd.concat(state_chargers_gdfs, ignore_index=True), crs="EPSG:4326"
+    )
+    national_chargers_gdf.to_file(
+        f"{save_dir}/charger_demand_national.geojson", driver="GeoJSON"
+    )
+
+    state_summary_df = (
+        national_chargers_gdf.groupby("STUSPS")
+        .agg(
+            **{
+                "N Chargers": ("Nearest Center", "size"),
+                "Tot An E Dem": ("An E Dem", "sum"),
+                "Tot Av P Dem": ("Av P Dem", "sum"),
+            }
+        )
+        .reset_index()
+    )
+    state_summary_df.to_csv(f"{save_dir}/charger_demand_by_state.csv", index=False)
+
+    return national_chargers_gdf, state_summary_df
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "-s",
+    "--states",
+    nargs="+",
+    default=CONTIGUOUS_STATES,
+    help="Abbreviations of the states to evaluate (default is the contiguous US)",
+)
+parser.add_argument(
+    "-f",
+    "--charger_locations",
+    default=None,
+    help="Path to the charger locations (csv file with Latitude and Longitude columns, or a point layer). Defaults to the truck stops selected by AnalyzeTruckStopCharging.py with its default options.",
+)
+parser.add_argument(
+    "-r",
+    "--radius",
+    default="100",
+    type=float,
+    help="Catchment radius of each charger (miles)",
+)
+parser.add_argument(
+    "-c",
+    "--catchment",
+    default="circle",
+    choices=["circle", "network"],
+    help="How highway links are assigned to chargers (see TT_charging_analysis.py)",
+)
+parser.add_argument(
+    "-l",
+    "--length_weighted",
+    action="store_true",
+    help="Weight the contribution of each highway link to each charger by the fraction of its length inside the charger's circle. Only applies to circle catchments, so it can't be combined with -c network.",
+)
+parser.add_argument(
+    "-p",
+    "--num_processes",
+    default=None,
+    type=int,
+    help="Number of worker processes",
+)
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    if args.length_weighted and args.catchment != "circle":
+        parser.error("-l/--length_weighted only applies to circle catchments")
+
+    # Get the path to the top level of the Git repo
+    top_dir = get_top_dir()
+
+    charger_locations_path = args.charger_locations
+    if charger_locations_path is None:
+        charger_locations_path = (
+            f"{get_min_chargers_save_path(top_dir, 200.0, 4.0, 1.0)}.shp"
+        )
+    charger_locations_gdf = read_charger_locations(charger_locations_path)
+
+    national_chargers_gdf, state_summary_df = evaluate_national_charger_demand(
+        top_dir,
+        charger_locations_gdf,
+        states=args.states,
+        radius=args.radius,
+        catchment=args.catchment,
+        length_weighted=args.length_weighted,
+        num_processes=args.num_processes,
+    )
+    print(state_summary_df)
@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Created on Mon Oct 19 17:10:00 2026
+
+@author: danikam
+
+Tools to represent highway link layers as sparse graphs (integer node ids, node coordinate arrays and scipy.sparse adjacency matrices), and to evaluate network distances over them with scipy.sparse.csgraph.
+"""
+
+import numpy as np
+import scipy.sparse
+import shapely
+import zipfile
+from scipy.sparse.csgraph import dijkstra, connected_components
+from scipy.spatial import cKDTree
+
+METERS_PER_MILE = 1609.34
+
+# Equal-area projected coordinate system (CONUS Albers) used to evaluate lengths and snap link endpoints, in meters
+PROJECTED_CRS = "EPSG:5070"
+
+# Default tolerance (in meters) within which link endpoints are taken to be the same node
+DEFAULT_NODE_TOLERANCE = 1.0
+
+
+def get_link_endpoints(links_gdf):
+    """
+    Gets the coordinates of the start and end points of each link
+
+    Parameters
+    ----------
+    links_gdf (gpd.GeoDataFrame): Geodataframe containing the (multi)linestring links
+
+    Returns
+    -------
+    start_coords (np.array): Array of shape (number of links, 2) containing the first coordinate of each link
+    end_coords (np.array): Array of shape (number of links, 2) containing the last coordinate of each link
+    """
+    coords, link_indices = shapely.get_coordinates(
+        links_gdf.geometry.values, return_index=True
+    )
+    n_coords = np.bincount(link_indices, minlength=len(links_gdf))
+    if np.any(n_coords == 0):
+        raise ValueError("All links need to have a non-empty geometry")
+
+    last_indices = np.cumsum(n_coords) - 1
+    first_indices = last_indices - n_coords + 1
+
+    return coords[first_indices], coords[last_indices]
+
+
+def snap_points(point_coords, tolerance=DEFAULT_NODE_TOLERANCE):
+    """
+    Snaps together points that lie within the given distance of each other, assigning each group of snapped points an integer node id
+
+    Parameters
+    ----------
+    point_coords (np.array): Array of shape (number of points, 2) containing the coordinates of each point, in units of meters
+    tolerance (float): Distance (in meters) within which points are taken to be the same node
+
+    Returns
+    -------
+    node_coords (np.array): Array of shape (number of nodes, 2) containing the coordinates of each node (the average over its points)
+    point_nodes (np.array): Node id of each point
+
+    NOTE: Points are merged transitively, so a chain of points each within the tolerance of the next all become the same node.
+    """
+    # Merge exactly coincident points first, so the KD-tree only has to handle distinct points
+    order = np.lexsort((point_coords[:, 1], point_coords[:, 0]))
+    sorted_coords = point_coords[order]
+    is_new = np.ones(len(order), dtype=bool)
+    is_new[1:] = np.any(sorted_coords[1:] != sorted_coords[:-1], axis=1)
+    point_distinct = np.empty(len(order), dtype=np.int64)
+    point_distinct[order] = np.cumsum(is_new) - 1
+    distinct_coords = sorted_coords[is_new]
+    n_distinct = len(distinct_coords)
+
+    # Link every pair of distinct points within the tolerance of each other, and take each group of linked points to be a single node
+    distinct_pairs = cKDTree(distinct_coords).query_pairs(
+        tolerance, output_type="ndarray"
+    )
+    distinct_links = scipy.sparse.csr_matrix(
+        (
+            np.ones(len(distinct_pairs)),
+            (distinct_pairs[:, 0], distinct_pairs[:, 1]),
+        ),
+        shape=(n_distinct, n_distinct),
+    )
+    n_nodes, distinct_nodes = connected_components(distinct_links, directed=False)
+    point_nodes = distinct_nodes[point_distinct].astype(np.int64)
+
+    # Place each node at the average of its points
+    n_points_per_node = np.bincount(point_nodes, minlength=n_nodes)
+    node_coords = np.column_stack(
+        [
+            np.bincount(point_nodes, weights=point_coords[:, i], minlength=n_nodes)
+            / n_points_per_node
+            for i in range(2)
+        ]
+    )
+
+    return node_coords, point_nodes
+
+
+def build_link_topology(links_gdf, tolerance=DEFAULT_NODE_TOLERANCE):
+    """
+    Builds the node topology of a link layer, snapping together link endpoints that lie within the given distance of each other into a single node
+
+    Parameters
+    ----------
+    links_gdf (gpd.GeoDataFrame): Geodataframe containing the links, in a projected coordinate system with units of meters
+    tolerance (float): Distance (in meters) within which link endpoints are taken to be the same node
+
+    Returns
+    -------
+    node_coords (np.array): Array of shape (number of nodes, 2) containing the coordinates of each node
+    start_nodes (np.array): Node id of the start of each link
+    end_nodes (np.array): Node id of the end of each link
+    """
+    start_coords, end_coords = get_link_endpoints(links_gdf)
+    node_coords, endpoint_nodes = snap_points(
+        np.concatenate([start_coords, end_coords]), tolerance
+    )
+
+    return (
+        node_coords,
+        endpoint_nodes[: len(links_gdf)],
+        endpoint_nodes[len(links_gdf) :],
+    )
+
+
+def get_link_lengths(links_gdf, length_column="len_miles"):
+    """
+    Gets the length of each link in miles, from the given column if available and otherwise from the geometry in an equal-area projection
+
+    Parameters
+    ----------
+    links_gdf (gpd.GeoDataFrame): Geodataframe containing the links
+    length_column (string): Name of the column containing the link lengths in miles
+
+    Returns
+    -------
+    link_lengths (np.array): Length of each link (miles)
+    """
+    if length_column in links_gdf.columns:
+        link_lengths = links_gdf[length_column].to_numpy(dtype=float)
+    else:
+        link_lengths = np.full(len(links_gdf), np.nan)
+
+    # Fill in any missing lengths from the geometry
+    missing = ~np.isfinite(link_lengths)
+    if np.any(missing):
+        link_lengths[missing] = (
+            shapely.length(links_gdf.to_crs(PROJECTED_CRS).geometry.values[missing])
+            / METERS_PER_MILE
+        )
+
+    return link_lengths
+
+
+def build_csr_graph(
+    start_nodes, end_nodes, weights, n_nodes, directed=False, return_edge_ids=False
+):
+    """
+    Builds a sparse adjacency matrix from arrays of edges, keeping the smallest weight wherever there are parallel edges between the same nodes
+
+    Parameters
+    ----------
+    start_nodes (np.array): Node id of the start of each edge
+    end_nodes (np.array): Node id of the end of each edge
+    weights (np.array): Weight of each edge
+    n_nodes (int): Total number of nodes
+    directed (bool): If False, each edge can be traversed in both directions
+    return_edge_ids (bool): If True, also return the edge that each entry of the adjacency matrix comes from
+
+    Returns
+    -------
+    graph (scipy.sparse.csr_matrix): Adjacency matrix of shape (n_nodes, n_nodes)
+    graph_edge_ids (np.array): Index (in the input edge arrays) of the edge that each entry of graph.data comes from. Only returned if return_edge_ids is True.
+
+    NOTE: Zero-weight edges are kept as explicit zeros, which scipy.sparse.csgraph treats as edges.
+    """
+    start_nodes = np.asarray(start_nodes, dtype=np.int64)
+    end_nodes = np.asarray(end_nodes, dtype=np.int64)
+    weights = np.asarray(weights, dtype=float)
+    edge_ids = np.arange(len(start_nodes))
+
+    if not directed:
+        reversed_start_nodes = end_nodes
+        end_nodes = np.concatenate([end_nodes, start_nodes])
+        start_nodes = np.concatenate([start_nodes, reversed_start_nodes])
+        weights = np.concatenate([weights, weights])
+        edge_ids = np.concatenate([edge_ids, edge_ids])
+
+    # Keep only the smallest weight for each pair of nodes (scipy.sparse would otherwise add them up)
+    order = np.lexsort((weights, end_nodes, start_nodes))
+    edge_keys = start_nodes[order] * n_nodes + end_nodes[order]
+    keep = np.ones(len(order), dtype=bool)
+    keep[1:] = edge_keys[1:] != edge_keys[:-1]
+    order = order[keep]
+
+    # The kept edges are sorted by start node and then end node, so they can be laid out directly in CSR format
+    indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(start_nodes[order], minlength=n_nodes), out=indptr[1:])
+    graph = scipy.sparse.csr_matrix(
+        (weights[order], end_nodes[order], indptr), shape=(n_nodes, n_nodes)
+    )
+
+    if return_edge_ids:
+        return graph, edge_ids[order]
+    return graph
+
+
+def get_node_components(start_nodes, end_nodes, n_nodes):
+    """
+    Finds the connected component of the graph that each node belongs to
+
+    Parameters
+    ----------
+    start_nodes (np.array): Node id of the start of each edge
+    end_nodes (np.array): Node id of the end of each edge
+    n_nodes (int): Total number of nodes
+
+    Returns
+    -------
+    node_components (np.array): Id of the connected component of each node, with components numbered from largest to smallest
+    component_sizes (np.array): Number of nodes in each component
+    """
+    edges = scipy.sparse.csr_matrix(
+        (np.ones(len(start_nodes)), (start_nodes, end_nodes)),
+        shape=(n_nodes, n_nodes),
+    )
+    n_components, node_components = connected_components(edges, directed=False)
+
+    # Renumber the components from largest to smallest
+    component_sizes = np.bincount(node_components, minlength=n_components)
+    size_order = np.argsort(-component_sizes, kind="stable")
+    component_ranks = np.empty(n_components, dtype=np.int64)
+    component_ranks[size_order] = np.arange(n_components)
+
+    return component_ranks[node_components], component_sizes[size_order]
+
+
+def build_highway_graph(
+    links_gdf, length_column="len_miles", tolerance=DEFAULT_NODE_TOLERANCE
+):
+    """
+    Builds an undirected sparse graph of a highway link layer, weighted by the link lengths
+
+    Parameters
+    ----------
+    links_gdf (gpd.GeoDataFrame): Geodataframe containing the highway links
+    length_column (string): Name of the column containing the link lengths in miles
+    tolerance (float): Distance (in meters) within which link endpoints are taken to be the same node
+
+    Returns
+    -------
+    graph (scipy.sparse.csr_matrix): Adjacency matrix weighted by the link lengths (miles)
+    node_coords (np.array): Coordinates of each node, in PROJECTED_CRS
+    start_nodes (np.array): Node id of the start of each link
+    end_nodes (np.array): Node id of the end of each link
+    link_lengths (np.array): Length of each link (miles)
+    """
+    node_coords, start_nodes, end_nodes = build_link_topology(
+        links_gdf.to_crs(PROJECTED_CRS), tolerance
+    )
+    link_lengths = get_link_lengths(links_gdf, length_column)
+    graph = build_csr_graph(start_nodes, end_nodes, link_lengths, len(node_coords))
+
+    return graph, node_coords, start_nodes, end_nodes, link_lengths
+
+
+def snap_points_to_nodes(points_gdf, node_coords):
+    """
+    Finds the nearest graph node to each point
+
+    Parameters
+    ----------
+    points_gdf (gpd.GeoDataFrame): Geodataframe containing the points
+    node_coords (np.array): Coordinates of each node, in PROJECTED_CRS
+
+    Returns
+    -------
+    point_nodes (np.array): Id of the nearest node to each point
+    snap_distances (np.array): Distance (miles) between each point and its nearest node
+    """
+    point_coords = shapely.get_coordinates(
+        points_gdf.to_crs(PROJECTED_CRS).geometry.values
+    )
+    snap_distances, point_nodes = cKDTree(node_coords).query(point_coords)
+
+    return point_nodes, snap_distances / METERS_PER_MILE
+
+
+def assign_links_to_nearest_source(
+    graph, start_nodes, end_nodes, link_lengths, source_nodes, max_distance=np.inf
+):
+    """
+    Assigns each link to the source (e.g. charger) nearest to it by network distance, with a single multi-source Dijkstra search from all sources at once
+
+    Parameters
+    ----------
+    graph (scipy.sparse.csr_matrix): Adjacency matrix weighted by the link lengths
+    start_nodes (np.array): Node id of the start of each link
+    end_nodes (np.array): Node id of the end of each link
+    link_lengths (np.array): Length of each link
+    source_nodes (np.array): Node id of each source
+    max_distance (float): Maximum network distance from a source to the middle of a link for the link to be assigned to it
+
+    Returns
+    -------
+    link_sources (np.array): Index (in source_nodes) of the nearest source to each link, or -1 for links with no source within the maximum distance
+    link_distances (np.array): Network distance from the nearest source to the middle of each link (inf for unassigned links)
+
+    NOTE: If several sources share a node, the links near that node are all assigned to the first of them.
+    """
+    source_nodes = np.asarray(source_nodes, dtype=np.int64)
+
+    # Distance from each node to its nearest source, and which source that is
+    node_distances, _, node_sources = dijkstra(
+        graph,
+        directed=False,
+        indices=source_nodes,
+        min_only=True,
+        limit=max_distance,
+        return_predecessors=True,
+    )
+
+    # Each link is reached through whichever of its ends is closer to a source
+    start_closer = node_distances[start_nodes] <= node_distances[end_nodes]
+    nearest_ends = np.where(start_closer, start_nodes, end_nodes)
+    link_distances = node_distances[nearest_ends] + 0.5 * link_lengths
+    link_source_nodes = node_sources[nearest_ends]
+
+    # Map the source nodes back to source indices (assigning in reverse so the first source at each node wins)
+    source_index_by_node = np.full(graph.shape[0], -1, dtype=np.int64)
+    source_index_by_node[source_nodes[::-1]] = np.arange(len(source_nodes))[::-1]
+
+    assigned = np.isfinite(link_distances) & (link_distances <= max_distance)
+    link_sources = np.full(len(start_nodes), -1, dtype=np.int64)
+    link_sources[assigned] = source_index_by_node[link_source_nodes[assigned]]
+    link_distances[~assigned] = np.inf
+
+    return link_sources, link_distances
+
+
+def get_path_nodes(predecessors, source_node, target_node):
+    """
+    Follows the predecessors from a shortest-path search back from the target node to the source node
+
+    Parameters
+    ----------
+    predecessors (np.array): Predecessor of each node in the shortest-path tree from the source node, as returned by scipy.sparse.csgraph (-9999 for unreachable nodes)
+    source_node (int): Node id of the source
+    target_node (int): Node id of the target
+
+    Returns
+    -------
+    path_nodes (np.array): Node ids along the path from the source to the target (empty if the target can't be reached)
+    """
+    path_nodes = [target_node]
+    while path_nodes[-1] != source_node:
+        predecessor = predecessors[path_nodes[-1]]
+        if predecessor < 0:
+            return np.array([], dtype=np.int64)
+        path_nodes.append(predecessor)
+
+    return np.array(path_nodes[::-1], dtype=np.int64)
+
+
+def get_path_edge_ids(graph, graph_edge_ids, path_nodes):
+    """
+    Gets the edge traversed between each consecutive pair of nodes along a path
+
+    Parameters
+    ----------
+    graph (scipy.sparse.csr_matrix): Adjacency matrix the path was found in
+    graph_edge_ids (np.array): Edge that each entry of graph.data comes from, as returned by build_csr_graph()
+    path_nodes (np.array): Node ids along the path
+
+    Returns
+    -------
+    path_edge_ids (np.array): Edge id of each step along the path
+    """
+    # Entries of the canonical CSR matrix are sorted by row and then column, so each step can be found with a binary search
+    entry_rows = np.repeat(np.arange(graph.shape[0]), np.diff(graph.indptr))
+    entry_keys = entry_rows * graph.shape[1] + graph.indices
+    step_keys = path_nodes[:-1] * graph.shape[1] + path_nodes[1:]
+
+    return graph_edge_ids[np.searchsorted(entry_keys, step_keys)]
+
+
+def save_graph_arrays(save_path, graph_arrays):
+    """
+    Saves the arrays describing a graph to an uncompressed .npz file, which allows them to be memory-mapped when loaded
+
+    Parameters
+    ----------
+    save_path (string): Path to the .npz file
+    graph_arrays (dict of np.arrays): Named arrays describing the graph
+
+    Returns
+    -------
+    None
+    """
+    np.savez(save_path, **graph_arrays)
+
+
+def load_graph_arrays(load_path, mmap_mode="r"):
+    """
+    Loads the arrays describing a graph from an uncompressed .npz file saved by save_graph_arrays(), memory-mapping each array rather than reading it in
+
+    Parameters
+    ----------
+    load_path (string): Path to the .npz file
+    mmap_mode (string): Mode to memory-map the arrays with (see np.memmap), or None to read them into memory
+
+    Returns
+    -------
+    graph_arrays (dict of np.arrays): Named arrays describing the graph
+    """
+    if mmap_mode is None:
+        with np.load(load_path) as graph_file:
+            return {name: graph_file[name] for name in graph_file.files}
+
+    graph_arrays = {}
+    with zipfile.ZipFile(load_path) as zip_file, open(load_path, "rb") as file:
+        for info in zip_file.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"Can't memory-map compressed array {info.filename}")
+
+            # Skip over the local zip header (whose extra field can differ from the central directory) to the .npy data
+            file.seek(info.header_offset + 26)
+            name_length, extra_length = np.frombuffer(file.read(4), dtype="<u2")
+            file.seek(info.header_offset + 30 + int(name_length) + int(extra_length))
+            if np.lib.format.read_magic(file) == (1, 0):
+                read_array_header = np.lib.format.read_array_header_1_0
+            else:
+                read_array_header = np.lib.format.read_array_header_2_0
+            shape, fortran_order, dtype = read_array_header(file)
+
+            name = info.filename[: -len(".npy")]
+            if np.prod(shape) == 0:
+                graph_arrays[name] = np.zeros(shape, dtype=dtype)
+            else:
+                graph_arrays[name] = np.memmap(
+                    load_path,
+                    dtype=dtype,
+                    mode=mmap_mode,
+                    offset=file.tell(),
+                    shape=shape,
+                    order="F" if fortran_order else "C",
+                )
+
+    return graph_arrays
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Created on Mon Oct 19 18:02:00 2026
+
+@author: danikam
+
+Chooses sites for a given number of chargers among candidate truck stops, to maximize the highway energy demand they cover. The energy demand on each highway link is aggregated into grid cells, and the chargers are chosen one at a time with lazy-greedy evaluation of a submodular objective over a sparse stop x cell matrix.
+"""
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+import scipy.sparse
+from scipy.spatial import cKDTree
+import heapq
+import argparse
+import os
+
+from CommonTools import get_top_dir, saveShapefile
+from NetworkTools import METERS_PER_MILE, PROJECTED_CRS
+from EvaluateTruckingEnergyDemand import (
+    evaluate_average_payload,
+    evaluate_average_mileage,
+    evaluate_annual_e_demand_link,
+)
+
+OBJECTIVES = ["coverage", "facility_location"]
+
+
+def aggregate_demand_to_cells(links_gdf, cell_size, demand_column="An E Dem"):
+    """
+    Aggregates the demand on each link into square grid cells, according to the midpoint of each link
+
+    Parameters
+    ----------
+    links_gdf (gpd.GeoDataFrame): Geodataframe containing the links with their demand
+    cell_size (float): Side length of each grid cell (miles)
+    demand_column (string): Name of the column containing the demand on each link
+
+    Returns
+    -------
+    cell_coords (np.array): Array of shape (number of cells, 2) containing the demand-weighted average midpoint of the links in each cell, in PROJECTED_CRS
+    cell_demand (np.array): Total demand of the links in each cell
+    """
+    link_demand = links_gdf[demand_column].fillna(0).to_numpy(dtype=float)
+
+    # Only links with demand need to be covered
+    has_demand = link_demand > 0
+    link_midpoints = shapely.get_coordinates(
+        shapely.line_interpolate_point(
+            links_gdf[has_demand].to_crs(PROJECTED_CRS).geometry.values,
+            0.5,
+            normalized=True,
+        )
+    )
+    link_demand = link_demand[has_demand]
+
+    # Assign each link to the grid cell containing its midpoint
+    link_cells = np.floor(link_midpoints / (cell_size * METERS_PER_MILE)).astype(
+        np.int64
+    )
+    _, link_cell_ids = np.unique(link_cells, axis=0, return_inverse=True)
+    link_cell_ids = link_cell_ids.ravel()
+
+    cell_demand = np.bincount(link_cell_ids, weights=link_demand)
+    cell_coords = np.column_stack(
+        [
+            np.bincount(link_cell_ids, weights=link_demand * link_midpoints[:, i])
+            / cell_demand
+            for i in range(2)
+        ]
+    )
+
+    return cell_coords, cell_demand
+
+
+def build_stop_cell_distances(stop_coords, cell_coords, radius):
+    """
+    Builds a sparse matrix of the straight-line distances between each candidate stop and each demand cell within the given radius
+
+    Parameters
+    ----------
+    stop_coords (np.array): Array of shape (number of stops, 2) containing the stop coordinates, in PROJECTED_CRS
+    cell_coords (np.array): Array of shape (number of cells, 2) containing the cell coordinates, in PROJECTED_CRS
+    radius (float): Maximum distance (miles) between a stop and a cell for the stop to cover the cell
+
+    Returns
+    -------
+    distances (scipy.sparse.csr_matrix): Matrix of shape (number of stops, number of cells) containing the distance (miles) between each stop and each cell within the radius. Cells at zero distance are stored as explicit zeros.
+    """
+    cells_tree = cKDTree(cell_coords)
+    cells_in_radius = cells_tree.query_ball_point(
+        stop_coords, radius * METERS_PER_MILE, return_sorted=True
+    )
+
+    n_cells_in_radius = np.array([len(cells) for cells in cells_in_radius])
+    indptr = np.concatenate([[0], np.cumsum(n_cells_in_radius)])
+    indices = np.concatenate(
+        [np.asarray(cells, dtype=np.int64) for cells in cells_in_radius]
+        + [np.zeros(0, dtype=np.int64)]
+    )
+    stop_indices = np.repeat(np.arange(len(stop_coords)), n_cells_in_radius)
+    data = (
+        np.linalg.norm(cell_coords[indices] - stop_coords[stop_indices], axis=1)
+        / METERS_PER_MILE
+    )
+
+    return scipy.sparse.csr_matrix(
+        (data, indices, indptr), shape=(len(stop_coords), len(cell_coords))
+    )
+
+
+def get_similarity(distances, radius, objective="coverage"):
+    """
+    Converts the distances between stops and cells into the similarity that the siting objective maximizes
+
+    Parameters
+    ----------
+    distances (scipy.sparse.csr_matrix): Sparse matrix of stop x cell distances (miles) within the radius, as produced by build_stop_cell_distances()
+    radius (float): Maximum distance (miles) between a stop and a cell for the stop to cover the cell
+    objective (string): 'coverage' to maximize the total demand within the radius of any charger (max-coverage), or 'facility_location' to also favour cells closer to chargers, by maximizing the demand-weighted (radius - distance) to the nearest charger (equivalent to the p-median problem with distances capped at the radius)
+
+    Returns
+    -------
+    similarity (scipy.sparse.csr_matrix): Matrix of stop x cell similarities, with the same sparsity structure as distances
+    """
+    if objective == "coverage":
+        similarity_data = np.ones(len(distances.data))
+    elif objective == "facility_location":
+        similarity_data = radius - distances.data
+    else:
+        raise ValueError(f"Unknown objective {objective}. Options are {OBJECTIVES}.")
+
+    return scipy.sparse.csr_matrix(
+        (similarity_data, distances.indices, distances.indptr), shape=distances.shape
+    )
+
+
+def lazy_greedy_siting(similarity, cell_demand, n_chargers):
+    """
+    Chooses the stops to site chargers at one at a time, each time choosing the stop that most increases the objective
+        sum over cells of cell_demand * (largest similarity between the cell and any chosen stop).
+
+    As the objective is submodular, the gain from adding a stop can only decrease as more stops are chosen. The gains are therefore kept in a priority queue, and only the gain at the top of the queue is re-evaluated until an up-to-date gain stays at the top.
+
+    Parameters
+    ----------
+    similarity (scipy.sparse.csr_matrix): Matrix of stop x cell similarities, as produced by get_similarity()
+    cell_demand (np.array): Demand in each cell
+    n_chargers (int): Number of chargers to site
+
+    Returns
+    -------
+    coverage_curve_df (pd.DataFrame): Dataframe with one row per charger sited, in the order they were chosen, containing the index of the chosen stop (Stop Index), the gain in the objective (Gain), the objective (Objective), and the total demand within the radius of any chosen stop (Covered Dem) and its fraction of the total demand (Covered Frac)
+
+    NOTE: The siting stops early if no remaining stop increases the objective.
+    """
+    similarity = similarity.tocsr()
+    indptr = similarity.indptr
+    indices = similarity.indices
+    similarity_data = similarity.data
+
+    best_similarity = np.zeros(len(cell_demand))
+    covered = np.zeros(len(cell_demand), dtype=bool)
+    total_demand = np.sum(cell_demand)
+
+    def evaluate_gain(stop):
+        cells = indices[indptr[stop] : indptr[stop + 1]]
+        return np.dot(
+            cell_demand[cells],
+            np.maximum(
+                similarity_data[indptr[stop] : indptr[stop + 1]]
+                - best_similarity[cells],
+                0.0,
+            ),
+        )
+
+    # Queue of (negative gain, stop, number of chargers sited when the gain was evaluated), starting with the gains with no chargers sited
+    initial_gains = similarity @ cell_demand
+    gain_queue = [(-gain, stop, 0) for stop, gain in enumerate(initial_gains)]
+    heapq.heapify(gain_queue)
+
+    chosen_stops = []
+    gains = []
+    objectives = []
+    covered_demands = []
+    objective = 0.0
+    covered_demand = 0.0
+    while len(chosen_stops) < n_chargers and len(gain_queue) > 0:
+        negative_gain, stop, n_sited = heapq.heappop(gain_queue)
+
+        # Re-evaluate out-of-date gains and put them back in the queue
+        if n_sited < len(chosen_stops):
+            heapq.heappush(gain_queue, (-evaluate_gain(stop), stop, len(chosen_stops)))
+            continue
+
+        if -negative_gain <= 0:
+            break
+
+        # Site a charger at the stop with the largest up-to-date gain
+        cells = indices[indptr[stop] : indptr[stop + 1]]
+        best_similarity[cells] = np.maximum(
+            best_similarity[cells], similarity_data[indptr[stop] : indptr[stop + 1]]
+        )
+        newly_covered = cells[~covered[cells]]
+        covered[newly_covered] = True
+
+        objective += -negative_gain
+        covered_demand += np.sum(cell_demand[newly_covered])
+        chosen_stops.append(stop)
+        gains.append(-negative_gain)
+        objectives.append(objective)
+        covered_demands.append(covered_demand)
+
+    coverage_curve_df = pd.DataFrame(
+        {
+            "K": np.arange(1, len(chosen_stops) + 1),
+            "Stop Index": chosen_stops,
+            "Gain": gains,
+            "Objective": objectives,
+            "Covered Dem": covered_demands,
+            "Covered Frac": np.array(covered_demands) / total_demand,
+        }
+    )
+
+    return coverage_curve_df
+
+
+def optimize_charger_siting(
+    truck_stops_gdf,
+    links_gdf,
+    n_chargers,
+    radius=100.0,
+    cell_size=10.0,
+    objective="coverage",
+):
+    """
+    Chooses sites for the given number of chargers among the candidate truck stops to maximize the energy demand on the highway links they cover
+
+    Parameters
+    ----------
+    truck_stops_gdf (gpd.GeoDataFrame): Candidate truck stops
+    links_gdf (gpd.GeoDataFrame): Highway links with their annual energy demand (An E Dem)
+    n_chargers (int): Number of chargers to site
+    radius (float): Maximum straight-line distance (miles) between a charger and a highway link for the charger to cover the link
+    cell_size (float): Side length (miles) of the grid cells the link demand is aggregated into
+    objective (string): Siting objective, either 'coverage' or 'facility_location' (see get_similarity())
+
+    Returns
+    -------
+    coverage_curve_df (pd.DataFrame): Coverage curve, as produced by lazy_greedy_siting()
+    chosen_stops_gdf (gpd.GeoDataFrame): Chosen truck stops, in the order they were chosen, with the number of chargers sited when each was chosen (K) and the fraction of the total demand covered at that point (Covered Frac)
+    """
+    cell_coords, cell_demand = aggregate_demand_to_cells(links_gdf, cell_size)
+    stop_coords = shapely.get_coordinates(
+        truck_stops_gdf.to_crs(PROJECTED_CRS).geometry.values
+    )
+
+    distances = build_stop_cell_distances(stop_coords, cell_coords, radius)
+    print(
+        f"Built coverage matrix for {distances.shape[0]} candidate stops and {distances.shape[1]} demand cells ({distances.nnz} stop-cell pairs within {radius:g} miles)"
+    )
+
+    similarity = get_similarity(distances, radius, objective)
+    coverage_curve_df = lazy_greedy_siting(similarity, cell_demand, n_chargers)
+
+    chosen_stops_gdf = truck_stops_gdf.iloc[coverage_curve_df["Stop Index"]].copy()
+    chosen_stops_gdf["K"] = coverage_curve_df["K"].to_numpy()
+    chosen_stops_gdf["Covered Frac"] = coverage_curve_df["Covered Frac"].to_numpy()
+
+    return coverage_curve_df, chosen_stops_gdf
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "-k", "--n_chargers", default="100", type=int, help="Number of chargers to site"
+)
+parser.add_argument(
+    "-r",
+    "--radius",
+    default="100",
+    type=float,
+    help="Maximum distance between a charger and the highway links it covers (miles)",
+)
+parser.add_argument(
+    "-g",
+    "--cell_size",
+    default="10",
+    type=float,
+    help="Side length of the grid cells the link demand is aggregated into (miles)",
+)
+parser.add_argument(
+    "-o",
+    "--objective",
+    default="coverage",
+    choices=OBJECTIVES,
+    help="Siting objective",
+)
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    # Get the path to the top level of the Git repo
+    top_dir = get_top_dir()
+
+    # Read in the candidate truck stops and the highway links
+    truck_stops_gdf = gpd.read_file(
+        f"{top_dir}/data/Truck_Stop_Parking/Truck_Stop_Parking.shp"
+    )
+    links_gdf = gpd.read_file(
+        f"{top_dir}/data/highway_assignment_links/highway_assignment_links_nomin.shp"
+    )
+
+    # Evaluate the annual energy demand associated with trucks passing over each link if they're all electrified
+    links_gdf = evaluate_average_payload(links_gdf)
+    links_gdf = evaluate_average_mileage(top_dir, links_gdf)
+    links_gdf = evaluate_annual_e_demand_link(top_dir, links_gdf)
+
+    coverage_curve_df, chosen_stops_gdf = optimize_charger_siting(
+        truck_stops_gdf,
+        links_gdf,
+        args.n_chargers,
+        radius=args.radius,
+        cell_size=args.cell_size,
+        objective=args.objective,
+    )
+
+    # Save the coverage curve and chosen truck stops
+    save_dir = f"{top_dir}/data/charger_siting"
+    if not os.path.exists(save_dir):
+        os.makedirs(save_dir)
+    save_path_base = f"{save_dir}/charger_siting_{args.objective}_n_{args.n_chargers}_radius_{args.radius}"
+    coverage_curve_df.to_csv(f"{save_path_base}.csv", index=False)
+    saveShapefile(chosen_stops_gdf, f"{save_path_base}.shp")
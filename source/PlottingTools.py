@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Created on Mon Oct 19 18:05:00 2026
+
+@author: danikam
+
+Tools to draw large geodataframes on static maps quickly, by batching all the geometries of a layer into a single matplotlib collection rather than drawing them row by row. The geometry arrays of base layers that are drawn on many figures (e.g. state boundaries, zones, highways) can be cached so they're only prepared once.
+"""
+
+import numpy as np
+import shapely
+from matplotlib.collections import LineCollection, PatchCollection
+from matplotlib.patches import PathPatch
+from matplotlib.path import Path
+
+# Line layers with at least this many segments are rasterized by default when saving to vector formats (e.g. pdf)
+RASTERIZE_MIN_SEGMENTS = 10000
+
+# Prepared geometry arrays of base layers, keyed by the layer name and a fingerprint of its geodataframe
+BASE_LAYER_CACHE = {}
+
+
+def get_line_segments(gdf):
+    """
+    Gets the vertex arrays of all (multi)linestrings in a geodataframe, splitting multilinestrings into their parts
+
+    Parameters
+    ----------
+    gdf (gpd.GeoDataFrame): Geodataframe containing the lines
+
+    Returns
+    -------
+    segments (list of np.arrays): Array of shape (number of vertices, 2) for each line part
+    segment_rows (np.array): Row in gdf that each line part comes from
+    """
+    parts, segment_rows = shapely.get_parts(gdf.geometry.values, return_index=True)
+    coords, part_indices = shapely.get_coordinates(parts, return_index=True)
+
+    # Split the coordinates wherever a new line part starts
+    split_indices = np.cumsum(np.bincount(part_indices, minlength=len(parts)))[:-1]
+    segments = np.split(coords, split_indices)
+
+    return segments, segment_rows
+
+
+def get_polygon_paths(gdf):
+    """
+    Gets a matplotlib path for each polygon part in a geodataframe, including any holes
+
+    Parameters
+    ----------
+    gdf (gpd.GeoDataFrame): Geodataframe containing the (multi)polygons
+
+    Returns
+    -------
+    paths (list of matplotlib.path.Path): Compound path (exterior and interior rings) for each polygon part
+    path_rows (np.array): Row in gdf that each polygon part comes from
+    """
+    parts, path_rows = shapely.get_parts(gdf.geometry.values, return_index=True)
+    rings, ring_parts = shapely.get_rings(parts, return_index=True)
+    coords, ring_indices = shapely.get_coordinates(rings, return_index=True)
+
+    # Start a new sub-path at the first vertex of each ring, and close it at the last
+    n_vertices = np.bincount(ring_indices, minlength=len(rings))
+    ring_ends = np.cumsum(n_vertices)
+    codes = np.full(len(coords), Path.LINETO, dtype=Path.code_type)
+    codes[ring_ends - n_vertices] = Path.MOVETO
+    codes[ring_ends - 1] = Path.CLOSEPOLY
+
+    # Group the rings of each polygon part into a single compound path
+    part_ends = np.searchsorted(
+        ring_indices, np.searchsorted(ring_parts, np.arange(1, len(parts) + 1))
+    )
+    part_starts = np.concatenate([[0], part_ends[:-1]])
+    paths = [
+        Path(coords[start:end], codes[start:end])
+        for start, end in zip(part_starts, part_ends)
+    ]
+
+    return paths, path_rows
+
+
+def get_layer_fingerprint(gdf):
+    """
+    Gets a cheap fingerprint of a geodataframe, used to tell whether a cached base layer is still valid
+
+    Parameters
+    ----------
+    gdf (gpd.GeoDataFrame): Geodataframe containing the layer
+
+    Returns
+    -------
+    fingerprint (tuple): Number of rows, bounds and coordinate reference system of the layer
+    """
+    return (len(gdf), tuple(np.round(gdf.total_bounds, 6)), str(gdf.crs))
+
+
+def get_cached_layer(layer_name, gdf, prepare):
+    """
+    Gets the prepared geometry arrays of a base layer, only preparing them the first time the layer is drawn
+
+    Parameters
+    ----------
+    layer_name (string): Name of the base layer (e.g. 'highways')
+    gdf (gpd.GeoDataFrame): Geodataframe containing the layer
+    prepare (function): Function that prepares the geometry arrays from the geodataframe (e.g. get_line_segments)
+
+    Returns
+    -------
+    prepared (tuple): Output of prepare for the layer
+    """
+    key = (layer_name, prepare.__name__) + get_layer_fingerprint(gdf)
+    if key not in BASE_LAYER_CACHE:
+        BASE_LAYER_CACHE[key] = prepare(gdf)
+    return BASE_LAYER_CACHE[key]
+
+
+def set_map_aspect(ax, gdf):
+    """
+    Sets the aspect ratio of the axes the same way as GeoDataFrame.plot: equal for projected coordinates, and corrected for the latitude for geographic coordinates
+
+    Parameters
+    ----------
+    ax (matplotlib.axes.Axes): Axes to set the aspect ratio of
+    gdf (gpd.GeoDataFrame): Geodataframe drawn on the axes
+
+    Returns
+    -------
+    None
+    """
+    if gdf.crs is not None and gdf.crs.is_geographic and len(gdf) > 0:
+        _, min_y, _, max_y = gdf.total_bounds
+        ax.set_aspect(1 / np.cos(np.deg2rad((min_y + max_y) / 2)))
+    else:
+        ax.set_aspect("equal")
+
+
+def expand_to_parts(values, part_rows):
+    """
+    Repeats per-row style values (e.g. line widths or colors) for each geometry part
+
+    Parameters
+    ----------
+    values (scalar, tuple or array-like): Value for each row of the geodataframe, or a single value (e.g. a color name or RGBA tuple) for all rows
+    part_rows (np.array): Row in the geodataframe that each geometry part comes from
+
+    Returns
+    -------
+    part_values (scalar or np.array): Value for each geometry part
+    """
+    if values is None or isinstance(values, (str, tuple)) or np.ndim(values) == 0:
+        return values
+    return np.asarray(values)[part_rows]
+
+
+def draw_lines(
+    ax,
+    gdf,
+    color="black",
+    linewidth=1,
+    alpha=None,
+    zorder=None,
+    label=None,
+    rasterized=None,
+    layer_name=None,
+):
+    """
+    Draws all the lines in a geodataframe as a single LineCollection
+
+    Parameters
+    ----------
+    ax (matplotlib.axes.Axes): Axes to draw on
+    gdf (gpd.GeoDataFrame): Geodataframe containing the (multi)linestrings
+    color (string, tuple or array-like): Line color, or a color for each row
+    linewidth (float or array-like): Line width, or a line width for each row
+    alpha (float): Transparency of the lines
+    zorder (float): Drawing order of the layer
+    label (string): Legend label of the layer
+    rasterized (bool): Whether to rasterize the layer when saving to vector formats. Defaults to True for layers with at least RASTERIZE_MIN_SEGMENTS line parts.
+    layer_name (string): If given, the line segments are cached under this name and reused by later figures
+
+    Returns
+    -------
+    collection (matplotlib.collections.LineCollection): The drawn collection
+    """
+    if layer_name is None:
+        segments, segment_rows = get_line_segments(gdf)
+    else:
+        segments, segment_rows = get_cached_layer(layer_name, gdf, get_line_segments)
+
+    if rasterized is None:
+        rasterized = len(segments) >= RASTERIZE_MIN_SEGMENTS
+
+    collection = LineCollection(
+        segments,
+        colors=expand_to_parts(color, segment_rows),
+        linewidths=expand_to_parts(linewidth, segment_rows),
+        alpha=alpha,
+        zorder=zorder,
+        label=label,
+        rasterized=rasterized,
+    )
+    ax.add_collection(collection)
+    ax.autoscale_view()
+    set_map_aspect(ax, gdf)
+
+    return collection
+
+
+def draw_polygons(
+    ax,
+    gdf,
+    facecolor="none",
+    edgecolor="black",
+    linewidth=1,
+    alpha=None,
+    zorder=None,
+    label=None,
+    rasterized=False,
+    layer_name=None,
+):
+    """
+    Draws all the polygons in a geodataframe as a single PatchCollection
+
+    Parameters
+    ----------
+    ax (matplotlib.axes.Axes): Axes to draw on
+    gdf (gpd.GeoDataFrame): Geodataframe containing the (multi)polygons
+    facecolor (string, tuple or array-like): Fill color, or a fill color for each row
+    edgecolor (string, tuple or array-like): Edge color, or an edge color for each row
+    linewidth (float or array-like): Edge width, or an edge width for each row
+    alpha (float): Transparency of the polygons
+    zorder (float): Drawing order of the layer
+    label (string): Legend label of the layer
+    rasterized (bool): Whether to rasterize the layer when saving to vector formats
+    layer_name (string): If given, the polygon paths are cached under this name and reused by later figures
+
+    Returns
+    -------
+    collection (matplotlib.collections.PatchCollection): The drawn collection
+    """
+    if layer_name is None:
+        paths, path_rows = get_polygon_paths(gdf)
+    else:
+        paths, path_rows = get_cached_layer(layer_name, gdf, get_polygon_paths)
+
+    collection = PatchCollection(
+        [PathPatch(path) for path in paths],
+        facecolors=expand_to_parts(facecolor, path_rows),
+        edgecolors=expand_to_parts(edgecolor, path_rows),
+        linewidths=expand_to_parts(linewidth, path_rows),
+        alpha=alpha,
+        zorder=zorder,
+        label=label,
+        rasterized=rasterized,
+    )
+    ax.add_collection(collection)
+    ax.autoscale_view()
+    set_map_aspect(ax, gdf)
+
+    return collection
+
+
+def draw_points(
+    ax,
+    gdf,
+    color="black",
+    markersize=None,
+    marker="o",
+    alpha=None,
+    zorder=None,
+    label=None,
+):
+    """
+    Draws all the points in a geodataframe with a single scatter call
+
+    Parameters
+    ----------
+    ax (matplotlib.axes.Axes): Axes to draw on
+    gdf (gpd.GeoDataFrame): Geodataframe containing the points
+    color (string, tuple or array-like): Marker color, or a marker color for each row
+    markersize (float or array-like): Marker area (points^2), or a marker area for each row
+    marker (string): Marker style
+    alpha (float): Transparency of the markers
+    zorder (float): Drawing order of the layer
+    label (string): Legend label of the layer
+
+    Returns
+    -------
+    collection (matplotlib.collections.PathCollection): The drawn collection
+    """
+    coords = shapely.get_coordinates(gdf.geometry.values)
+    set_map_aspect(ax, gdf)
+    return ax.scatter(
+        coords[:, 0],
+        coords[:, 1],
+        s=markersize,
+        c=color,
+        marker=marker,
+        alpha=alpha,
+        zorder=zorder,
+        label=label,
+    )
+
+
+def label_polygons(ax, gdf, labels, **text_kwargs):
+    """
+    Adds a text label at the centroid of each polygon in a geodataframe
+
+    Parameters
+    ----------
+    ax (matplotlib.axes.Axes): Axes to draw on
+    gdf (gpd.GeoDataFrame): Geodataframe containing the polygons
+    labels (array-like): Label for each row
+    text_kwargs: Keyword arguments passed on to ax.text
+
+    Returns
+    -------
+    None
+    """
+    centroids = shapely.get_coordinates(shapely.centroid(gdf.geometry.values))
+    for (x, y), label in zip(centroids, labels):
+        ax.text(x, y, label, **text_kwargs)
+
+
+def draw_graph(
+    ax,
+    node_coords,
+    start_nodes,
+    end_nodes,
+    edge_color="black",
+    edge_width=0.5,
+    node_color="tab:blue",
+    node_size=1,
+    zorder=None,
+    rasterized=None,
+):
+    """
+    Draws a graph given as arrays of node coordinates and edge endpoints, with all edges in a single LineCollection and all nodes in a single scatter
+
+    Parameters
+    ----------
+    ax (matplotlib.axes.Axes): Axes to draw on
+    node_coords (np.array): Array of shape (number of nodes, 2) containing the coordinates of each node
+    start_nodes (np.array): Node id of the start of each edge
+    end_nodes (np.array): Node id of the end of each edge
+    edge_color (string or tuple): Edge color
+    edge_width (float): Edge width
+    node_color (string or tuple): Node color
+    node_size (float): Node marker area (points^2). Nodes aren't drawn if this is 0.
+    zorder (float): Drawing order of the edges (nodes are drawn above them)
+    rasterized (bool): Whether to rasterize the graph when saving to vector formats. Defaults to True for graphs with at least RASTERIZE_MIN_SEGMENTS edges.
+
+    Returns
+    -------
+    None
+    """
+    node_coords = np.asarray(node_coords, dtype=float)
+    segments = np.stack(
+        [node_coords[np.asarray(start_nodes)], node_coords[np.asarray(end_nodes)]],
+        axis=1,
+    )
+
+    if rasterized is None:
+        rasterized = len(segments) >= RASTERIZE_MIN_SEGMENTS
+
+    ax.add_collection(
+        LineCollection(
+            segments,
+            colors=edge_color,
+            linewidths=edge_width,
+            zorder=zorder,
+            rasterized=rasterized,
+        )
+    )
+    if node_size > 0:
+        ax.scatter(
+            node_coords[:, 0],
+            node_coords[:, 1],
+            s=node_size,
+            c=node_color,
+            zorder=None if zorder is None else zorder + 0.1,
+            rasterized=rasterized,
+        )
+    ax.autoscale_view()
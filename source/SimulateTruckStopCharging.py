@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Created on Mon Oct 19 16:05:00 2026
+
+@author: danikam
+
+Discrete-event simulation of first-come-first-served charging at truck stops, used to validate the analytic wait model that AnalyzeTruckStopCharging.py uses to size the number of chargers. Trucks arrive as a Poisson process at the average rate implied by the charges per day, and each truck occupies a charger for the charging time.
+"""
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import concurrent.futures
+import argparse
+
+from CommonTools import get_top_dir
+from ChargingQueueTools import HOURS_PER_DAY, QUEUE_MODELS, average_wait_time_by_model
+from AnalyzeTruckStopCharging import get_min_chargers_save_path
+
+SERVICE_DISTRIBUTIONS = ["deterministic", "exponential", "gamma"]
+
+# Percentile of the wait time distribution reported for each truck stop
+WAIT_PERCENTILE = 95
+
+
+def generate_arrival_times(rng, charges_per_day, n_replicas, n_days):
+    """
+    Generates Poisson truck arrival times at a truck stop for independent replicas of the simulation
+
+    Parameters
+    ----------
+    rng (np.random.Generator): Random number generator
+    charges_per_day (float): Average number of truck charges at the station per day
+    n_replicas (int): Number of independent replicas to simulate
+    n_days (int): Number of consecutive days simulated in each replica
+
+    Returns
+    -------
+    arrival_times (np.array): Array of shape (n_replicas, max number of arrivals in any replica) containing the sorted arrival times (in hours) in each replica, padded with inf
+    """
+    n_arrivals = rng.poisson(charges_per_day * n_days, size=n_replicas)
+
+    # Given the number of arrivals, the arrival times of a Poisson process are uniformly distributed over the simulated period
+    arrival_times = rng.uniform(
+        0.0, n_days * HOURS_PER_DAY, size=(n_replicas, max(n_arrivals.max(), 1))
+    )
+    arrival_times[np.arange(arrival_times.shape[1]) >= n_arrivals[:, np.newaxis]] = (
+        np.inf
+    )
+
+    return np.sort(arrival_times, axis=1)
+
+
+def generate_service_times(
+    rng, shape, charging_time, service_distribution="deterministic", gamma_shape=4.0
+):
+    """
+    Generates the time each truck occupies a charger
+
+    Parameters
+    ----------
+    rng (np.random.Generator): Random number generator
+    shape (tuple): Shape of the array of service times to generate
+    charging_time (float): Average amount of time needed for each truck to charge (in hours)
+    service_distribution (string): Distribution of the charging times. One of 'deterministic', 'exponential' or 'gamma'.
+    gamma_shape (float): Shape parameter of the gamma distribution (its coefficient of variation is 1/sqrt(gamma_shape))
+
+    Returns
+    -------
+    service_times (np.array): Charging time (in hours) for each truck
+    """
+    if service_distribution == "deterministic":
+        return np.full(shape, float(charging_time))
+    elif service_distribution == "exponential":
+        return rng.exponential(charging_time, size=shape)
+    elif service_distribution == "gamma":
+        return rng.gamma(gamma_shape, charging_time / gamma_shape, size=shape)
+    else:
+        raise ValueError(
+            f"Unknown service distribution {service_distribution}. Options are {SERVICE_DISTRIBUTIONS}."
+        )
+
+
+def simulate_waits_deterministic(arrival_times, n_chargers, charging_time):
+    """
+    Evaluates the time each truck waits for a charger when every truck charges for the same amount of time
+
+    With equal charging times, trucks finish charging in the order they start, so truck k gets the charger freed by truck k - n_chargers and starts charging at
+        s_k = max(t_k, s_(k - n_chargers) + T).
+    The trucks therefore split into n_chargers interleaved sequences, each of which satisfies s_j - jT = max(t_j - jT, s_(j-1) - (j-1)T), so the start times follow from a cumulative maximum over each sequence.
+
+    Parameters
+    ----------
+    arrival_times (np.array): Sorted arrival times (in hours) of shape (number of replicas, number of arrivals), padded with inf
+    n_chargers (int): Number of chargers at the truck stop
+    charging_time (float): Amount of time needed for each truck to charge (in hours)
+
+    Returns
+    -------
+    wait_times (np.array): Time (in hours) each truck waits for a charger, with the same shape as arrival_times (NaN for padded arrivals)
+    """
+    n_replicas, n_arrivals = arrival_times.shape
+    n_chargers = max(int(n_chargers), 1)
+    n_per_charger = -(-n_arrivals // n_chargers)
+
+    # Pad the arrivals to fill every interleaved sequence, and arrange them as (replica, position in sequence, sequence)
+    padded_arrivals = np.full((n_replicas, n_per_charger * n_chargers), np.inf)
+    padded_arrivals[:, :n_arrivals] = arrival_times
+    padded_arrivals = padded_arrivals.reshape(n_replicas, n_per_charger, n_chargers)
+
+    offsets = charging_time * np.arange(n_per_charger)[np.newaxis, :, np.newaxis]
+    start_times = np.maximum.accumulate(padded_arrivals - offsets, axis=1) + offsets
+
+    with np.errstate(invalid="ignore"):
+        wait_times = (start_times - padded_arrivals).reshape(n_replicas, -1)
+
+    return wait_times[:, :n_arrivals]
+
+
+def simulate_waits_general(arrival_times, n_chargers, service_times):
+    """
+    Evaluates the time each truck waits for a charger for arbitrary charging times, stepping through the arrivals for all replicas at once
+
+    Parameters
+    ----------
+    arrival_times (np.array): Sorted arrival times (in hours) of shape (number of replicas, number of arrivals), padded with inf
+    n_chargers (int): Number of chargers at the truck stop
+    service_times (np.array): Charging time (in hours) for each truck, with the same shape as arrival_times
+
+    Returns
+    -------
+    wait_times (np.array): Time (in hours) each truck waits for a charger, with the same shape as arrival_times (NaN for padded arrivals)
+    """
+    n_replicas, n_arrivals = arrival_times.shape
+    replicas = np.arange(n_replicas)
+
+    # Time at which each charger next becomes free, for each replica
+    free_times = np.zeros((n_replicas, max(int(n_chargers), 1)))
+    wait_times = np.empty((n_replicas, n_arrivals))
+
+    with np.errstate(invalid="ignore"):
+        for i_arrival in range(n_arrivals):
+            # Each arriving truck takes the charger that frees up first
+            i_charger = np.argmin(free_times, axis=1)
+            start_times = np.maximum(
+                arrival_times[:, i_arrival], free_times[replicas, i_charger]
+            )
+            wait_times[:, i_arrival] = start_times - arrival_times[:, i_arrival]
+            free_times[replicas, i_charger] = start_times + service_times[:, i_arrival]
+
+    return wait_times
+
+
+def simulate_stop_waits(
+    charges_per_day,
+    n_chargers,
+    charging_time,
+    seed_sequences,
+    n_replicas=16,
+    n_days=8,
+    warmup_days=1,
+    service_distribution="deterministic",
+    gamma_shape=4.0,
+):
+    """
+    Simulates charging at each of a set of truck stops, and summarizes the distribution of wait times at each
+
+    Parameters
+    ----------
+    charges_per_day (np.array): Average number of truck charges at each station per day
+    n_chargers (np.array): Number of chargers at each truck stop
+    charging_time (float): Average amount of time needed for each truck to charge (in hours)
+    seed_sequences (list of np.random.SeedSequence): Seed for each truck stop
+    n_replicas (int): Number of independent replicas simulated for each truck stop
+    n_days (int): Number of consecutive days simulated in each replica, including the warm-up
+    warmup_days (int): Number of days at the start of each replica over which the waits are discarded, while the queue reaches its steady state
+    service_distribution (string): Distribution of the charging times. One of 'deterministic', 'exponential' or 'gamma'.
+    gamma_shape (float): Shape parameter of the gamma distribution of charging times
+
+    Returns
+    -------
+    mean_waits (np.array): Mean wait time (in hours) at each truck stop
+    percentile_waits (np.array): WAIT_PERCENTILE-th percentile of the wait time (in hours) at each truck stop
+    """
+    mean_waits = np.zeros(len(charges_per_day))
+    percentile_waits = np.zeros(len(charges_per_day))
+
+    for i_stop in range(len(charges_per_day)):
+        rng = np.random.default_rng(seed_sequences[i_stop])
+
+        arrival_times = generate_arrival_times(
+            rng, charges_per_day[i_stop], n_replicas, n_days
+        )
+        if service_distribution == "deterministic":
+            wait_times = simulate_waits_deterministic(
+                arrival_times, n_chargers[i_stop], charging_time
+            )
+        else:
+            service_times = generate_service_times(
+                rng,
+                arrival_times.shape,
+                charging_time,
+                service_distribution,
+                gamma_shape,
+            )
+            wait_times = simulate_waits_general(
+                arrival_times, n_chargers[i_stop], service_times
+            )
+
+        # Only keep the waits of trucks arriving after the warm-up
+        wait_times = wait_times[
+            np.isfinite(arrival_times) & (arrival_times >= warmup_days * HOURS_PER_DAY)
+        ]
+        if len(wait_times) > 0:
+            mean_waits[i_stop] = np.mean(wait_times)
+            percentile_waits[i_stop] = np.percentile(wait_times, WAIT_PERCENTILE)
+
+    return mean_waits, percentile_waits
+
+
+def simulate_truck_stop_waits(
+    truck_stops_gdf,
+    charging_time,
+    n_replicas=16,
+    n_days=8,
+    warmup_days=1,
+    service_distribution="deterministic",
+    gamma_shape=4.0,
+    queue_model="binomial",
+    seed=None,
+    num_processes=None,
+    chunk_size=64,
+):
+    """
+    Simulates charging at every truck stop with the minimum number of chargers evaluated by AnalyzeTruckStopCharging.py, in parallel over chunks of truck stops, and compares the simulated waits with the analytic model
+
+    Parameters
+    ----------
+    truck_stops_gdf (gpd.GeoDataFrame): Truck stops with the charges per day (CPD) and minimum number of chargers (Min_Charge)
+    charging_time (float): Average amount of time needed for each truck to charge (in hours)
+    n_replicas (int): Number of independent replicas simulated for each truck stop
+    n_days (int): Number of consecutive days simulated in each replica, including the warm-up
+    warmup_days (int): Number of days at the start of each replica over which the waits are discarded
+    service_distribution (string): Distribution of the charging times. One of 'deterministic', 'exponential' or 'gamma'.
+    gamma_shape (float): Shape parameter of the gamma distribution of charging times
+    queue_model (string): Queue model used to evaluate the analytic average wait (one of 'binomial', 'mmc' or 'mdc')
+    seed (int): Seed from which the seeds for each truck stop are spawned, to make the simulation reproducible
+    num_processes (int): Number of processes to use (default is the number of CPUs)
+    chunk_size (int): Number of truck stops simulated by each task
+
+    Returns
+    -------
+    truck_stops_gdf (gpd.GeoDataFrame): Truck stops with the charger utilization (Sim_Util), analytic average wait (An_Wait), simulated mean wait (Sim_Wait) and simulated WAIT_PERCENTILE-th percentile wait (Sim_P95) added, in hours
+
+    NOTE: Where the utilization (average number of trucks charging at once per charger) is at least 1, the queue never reaches a steady state, so the simulated waits grow with the number of simulated days.
+    """
+    charges_per_day = truck_stops_gdf["CPD"].to_numpy(dtype=float)
+    n_chargers = truck_stops_gdf["Min_Charge"].to_numpy(dtype=int)
+
+    # Spawn one seed per truck stop, so the results don't depend on how the stops are split between processes
+    stop_seeds = np.random.SeedSequence(seed).spawn(len(truck_stops_gdf))
+
+    # Simulate the stops with the most charges per day first, so the longest tasks don't hold up the end of the run
+    order = np.argsort(-charges_per_day, kind="stable")
+    chunks = [order[i : i + chunk_size] for i in range(0, len(order), chunk_size)]
+
+    mean_waits = np.zeros(len(truck_stops_gdf))
+    percentile_waits = np.zeros(len(truck_stops_gdf))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=num_processes) as executor:
+        futures = [
+            executor.submit(
+                simulate_stop_waits,
+                charges_per_day[chunk],
+                n_chargers[chunk],
+                charging_time,
+                [stop_seeds[i_stop] for i_stop in chunk],
+                n_replicas,
+                n_days,
+                warmup_days,
+                service_distribution,
+                gamma_shape,
+            )
+            for chunk in chunks
+        ]
+        for chunk, future in zip(chunks, futures):
+            mean_waits[chunk], percentile_waits[chunk] = future.result()
+
+    truck_stops_gdf["Sim_Util"] = (
+        charges_per_day * charging_time / (HOURS_PER_DAY * np.maximum(n_chargers, 1))
+    )
+    truck_stops_gdf["An_Wait"] = average_wait_time_by_model(
+        charges_per_day, n_chargers, charging_time, queue_model
+    )
+    truck_stops_gdf["Sim_Wait"] = mean_waits
+    truck_stops_gdf["Sim_P95"] = percentile_waits
+
+    return truck_stops_gdf
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "-c", "--charging_time", default="4", type=float, help="Charging time (hours)"
+)
+parser.add_argument(
+    "-m",
+    "--max_wait_time",
+    default="1",
+    type=float,
+    help="Maximum allowable wait time (hours)",
+)
+parser.add_argument(
+    "-r", "--range_miles", default="200", type=float, help="Truck range (miles)"
+)
+parser.add_argument(
+    "-d",
+    "--service_distribution",
+    default="deterministic",
+    choices=SERVICE_DISTRIBUTIONS,
+    help="Distribution of the charging times",
+)
+parser.add_argument(
+    "-q",
+    "--queue_model",
+    default="binomial",
+    choices=QUEUE_MODELS,
+    help="Queue model the minimum chargers were evaluated with",
+)
+parser.add_argument(
+    "-n",
+    "--n_replicas",
+    default="16",
+    type=int,
+    help="Number of independent replicas simulated for each truck stop",
+)
+parser.add_argument(
+    "--n_days",
+    default="8",
+    type=int,
+    help="Number of days simulated in each replica, including a one-day warm-up",
+)
+parser.add_argument(
+    "-s",
+    "--seed",
+    default=None,
+    type=int,
+    help="Seed for the simulation",
+)
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    # Get the path to the top level of the Git repo
+    top_dir = get_top_dir()
+
+    # Read in the truck stops with the minimum chargers evaluated by AnalyzeTruckStopCharging.py
+    save_path_base = get_min_chargers_save_path(
+        top_dir,
+        args.range_miles,
+        args.charging_time,
+        args.max_wait_time,
+        args.queue_model,
+    )
+    truck_stops_gdf = gpd.read_file(f"{save_path_base}.shp")
+
+    # Simulate the charging at each truck stop
+    truck_stops_gdf = simulate_truck_stop_waits(
+        truck_stops_gdf,
+        args.charging_time,
+        n_replicas=args.n_replicas,
+        n_days=args.n_days,
+        service_distribution=args.service_distribution,
+        queue_model=args.queue_model,
+        seed=args.seed,
+    )
+
+    # Save the simulated and analytic waits for each truck stop
+    truck_stops_df = pd.DataFrame(
+        truck_stops_gdf[
+            ["CPD", "Min_Charge", "Sim_Util", "An_Wait", "Sim_Wait", "Sim_P95"]
+        ]
+    )
+    truck_stops_df.to_csv(
+        f"{save_path_base}_simulated_{args.service_distribution}.csv",
+        index_label="Stop",
+    )
+
+    n_unstable = np.sum(truck_stops_df["Sim_Util"] >= 1)
+    print(
+        f"Chargers are utilized at or above capacity (so the queue grows without bound) at {n_unstable} of {len(truck_stops_df)} truck stops"
+    )
+    n_exceeding = np.sum(truck_stops_df["Sim_Wait"] > args.max_wait_time)
+    print(
+        f"Simulated mean wait exceeds the maximum allowable wait at {n_exceeding} of {len(truck_stops_df)} truck stops"
+    )
+    print(truck_stops_df[["An_Wait", "Sim_Wait", "Sim_P95"]].describe())
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Created on Mon Oct 19 15:20:00 2026
+
+@author: danikam
+
+Evaluates the minimum number of chargers at truck stops over the full grid of truck ranges, maximum wait times and charging times in a single run. The truck stops are loaded and sparsified once, the neighbour counts for every truck range are evaluated once, and the grid is evaluated by a pool of worker processes.
+"""
+
+import numpy as np
+import concurrent.futures
+import argparse
+import os
+
+from CommonTools import get_top_dir, saveShapefile
+from ChargingQueueTools import QUEUE_MODELS, set_queue_wait_table_path
+from AnalyzeTruckStopCharging import (
+    DEFAULT_RADII_MILES,
+    get_truck_stops_with_trips,
+    select_truck_stops,
+    count_truck_stops_within_radius,
+    evaluate_charger_needs,
+    get_min_chargers_save_path,
+)
+
+TRUCK_RANGES = [400.0, 300.0, 200.0, 100.0]
+MAX_WAIT_TIMES = [0.25, 0.5, 1.0, 2.0]
+CHARGING_TIMES = [0.5, 1.0, 2.0, 4.0]
+
+
+def init_sweep_worker(table_path):
+    """
+    Initializes a sweep worker process to share the persisted queue wait table
+
+    Parameters
+    ----------
+    table_path (string): Path to the .npy file containing the normalized queue wait table
+
+    Returns
+    -------
+    None
+    """
+    set_queue_wait_table_path(table_path)
+
+
+def evaluate_charging_time_grid(
+    truck_stops_gdf,
+    charging_time,
+    truck_ranges,
+    max_wait_times,
+    top_dir,
+    queue_model="binomial",
+):
+    """
+    Evaluates the minimum chargers for every truck range and maximum wait time at the given charging time, and saves a shapefile for each
+
+    Parameters
+    ----------
+    truck_stops_gdf (gpd.GeoDataFrame): Sparsified truck stops, with the neighbour counts already evaluated for every truck range
+    charging_time (float): Average amount of time needed for each truck to charge (in hours)
+    truck_ranges (list of floats): Truck ranges (miles)
+    max_wait_times (list of floats): Maximum allowable average wait times (in hours)
+    top_dir (string): Path to top-level directory of the repository
+    queue_model (string): Queue model used to evaluate the average wait time (one of 'binomial', 'mmc' or 'mdc')
+
+    Returns
+    -------
+    save_paths (list of strings): Paths to the saved shapefiles
+
+    NOTE: All grid points for a given charging time are evaluated in the same process so that they share the process's memo of minimum chargers already solved for.
+    """
+    save_paths = []
+    for range_miles in truck_ranges:
+        for max_wait_time in max_wait_times:
+            print(
+                f"Evaluating range {range_miles}, charging time {charging_time}, max wait {max_wait_time}"
+            )
+
+            # For each truck stop, calculate the number of chargers needed to keep quick charging wait times below the maximum, for both the full and half highway flows
+            grid_gdf = evaluate_charger_needs(
+                truck_stops_gdf, range_miles, charging_time, max_wait_time, queue_model
+            )
+
+            save_path = f"{get_min_chargers_save_path(top_dir, range_miles, charging_time, max_wait_time, queue_model)}.shp"
+            saveShapefile(grid_gdf, save_path)
+            save_paths.append(save_path)
+
+    return save_paths
+
+
+def sweep_truck_stop_charging(
+    truck_stops_gdf,
+    top_dir,
+    truck_ranges=TRUCK_RANGES,
+    max_wait_times=MAX_WAIT_TIMES,
+    charging_times=CHARGING_TIMES,
+    queue_model="binomial",
+    seed=None,
+    num_processes=None,
+    table_path=None,
+):
+    """
+    Evaluates the minimum chargers at truck stops over the full grid of truck ranges, maximum wait times and charging times
+
+    Parameters
+    ----------
+    truck_stops_gdf (gpd.GeoDataFrame): Truck stops along interstates with the trips per day, before sparsification
+    top_dir (string): Path to top-level directory of the repository
+    truck_ranges (list of floats): Truck ranges (miles)
+    max_wait_times (list of floats): Maximum allowable average wait times (in hours)
+    charging_times (list of floats): Average amounts of time needed for each truck to charge (in hours)
+    queue_model (string): Queue model used to evaluate the average wait time (one of 'binomial', 'mmc' or 'mdc')
+    seed (int): Seed for the random selection of truck stops, which is shared by all grid points
+    num_processes (int): Number of worker processes. Defaults to the number of CPUs, capped at the number of charging times.
+    table_path (string): Path to the .npy file that the normalized queue wait table is shared through
+
+    Returns
+    -------
+    save_paths (list of strings): Paths to the saved shapefiles
+    """
+    # Sparsify the truck stops once, so every grid point is evaluated for the same selection
+    truck_stops_gdf = select_truck_stops(truck_stops_gdf, seed=seed)
+    truck_stops_gdf = truck_stops_gdf.reset_index(drop=True).to_crs("EPSG:3857")
+
+    # Count the neighbouring truck stops for every truck range at once
+    truck_stops_gdf = count_truck_stops_within_radius(
+        truck_stops_gdf, np.union1d(DEFAULT_RADII_MILES, truck_ranges)
+    )
+
+    if num_processes is None:
+        num_processes = min(os.cpu_count() or 1, len(charging_times))
+
+    # Evaluate each charging time in its own worker
+    save_paths = []
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=num_processes,
+        initializer=init_sweep_worker,
+        initargs=(table_path,),
+    ) as executor:
+        futures = [
+            executor.submit(
+                evaluate_charging_time_grid,
+                truck_stops_gdf,
+                float(charging_time),
+                [float(range_miles) for range_miles in truck_ranges],
+                [float(max_wait_time) for max_wait_time in max_wait_times],
+                top_dir,
+                queue_model,
+            )
+            for charging_time in charging_times
+        ]
+        for future in futures:
+            save_paths.extend(future.result())
+
+    return save_paths
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "-c",
+    "--charging_times",
+    nargs="+",
+    default=CHARGING_TIMES,
+    type=float,
+    help="Charging times (hours)",
+)
+parser.add_argument(
+    "-m",
+    "--max_wait_times",
+    nargs="+",
+    default=MAX_WAIT_TIMES,
+    type=float,
+    help="Maximum allowable wait times (hours)",
+)
+parser.add_argument(
+    "-r",
+    "--truck_ranges",
+    nargs="+",
+    default=TRUCK_RANGES,
+    type=float,
+    help="Truck ranges (miles)",
+)
+parser.add_argument(
+    "-q",
+    "--queue_model",
+    default="binomial",
+    choices=QUEUE_MODELS,
+    help="Queue model used to evaluate the average wait time",
+)
+parser.add_argument(
+    "-s",
+    "--seed",
+    default=None,
+    type=int,
+    help="Seed for the random selection of truck stops",
+)
+parser.add_argument(
+    "-p",
+    "--num_processes",
+    default=None,
+    type=int,
+    help="Number of worker processes",
+)
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    # Get the path to the top level of the Git repo
+    top_dir = get_top_dir()
+
+    # Persist the tabulated queue wait times so they can be shared between the workers and reused between runs
+    table_path = f"{top_dir}/data/queue_wait_table.npy"
+
+    # Get the truck stops along interstates with the trips per day
+    truck_stops_gdf = get_truck_stops_with_trips(top_dir)
+
+    # Evaluate the minimum chargers over the full grid of options
+    save_paths = sweep_truck_stop_charging(
+        truck_stops_gdf,
+        top_dir,
+        truck_ranges=args.truck_ranges,
+        max_wait_times=args.max_wait_times,
+        charging_times=args.charging_times,
+        queue_model=args.queue_model,
+        seed=args.seed,
+        num_processes=args.num_processes,
+        table_path=table_path,
+    )
+    print(f"Saved {len(save_paths)} shapefiles")
@@ -10,11 +10,21 @@ Created on Wed May 8 15:43:00 2024
 import numpy as np
 import pandas as pd
 import os
+import argparse
 
 import geopandas as gpd
+import shapely
+import scipy.sparse
 from shapely.geometry import Point
 from CommonTools import get_top_dir
+from NetworkTools import (
+    build_highway_graph,
+    snap_points_to_nodes,
+    assign_links_to_nearest_source,
+)
+from PlottingTools import draw_lines, draw_polygons, draw_points, label_polygons
 import matplotlib.lines as mlines
+import matplotlib.colors as mcolors
 
 import matplotlib.pyplot as plt
 
@@ -180,35 +190,129 @@ def make_charger_circles(charger_locations_gdf, radius):
     return charger_circles_gdf.to_crs("EPSG:4326")
 
 
-def get_scaled_highway_links_in_circles(charger_circles_gdf, texas_highways_gdf):
-    # Manually keep the original index from texas_highways_gdf in a new column to retain it through the join
-    texas_highways_gdf["original_index"] = texas_highways_gdf.index
+def build_link_charger_incidence(
+    highways_gdf, charger_circles_gdf, length_weighted=False
+):
+    """
+    Builds a sparse incidence matrix between highway links and charger circles with a single bulk query of a spatial index of the circles
 
-    # Perform spatial join
-    overlapping_links = gpd.sjoin(
-        texas_highways_gdf, charger_circles_gdf, how="inner", predicate="intersects"
+    Parameters
+    ----------
+    highways_gdf (gpd.GeoDataFrame): Geodataframe containing the highway links
+    charger_circles_gdf (gpd.GeoDataFrame): Geodataframe containing the circles around each charger, in the same coordinate reference system as highways_gdf
+    length_weighted (bool): If True, each entry is the fraction of the link's length lying inside the circle. Otherwise, each entry is 1.
+
+    Returns
+    -------
+    incidence (scipy.sparse.csr_matrix): Matrix of shape (number of links, number of circles), which is nonzero wherever a link intersects a circle
+    """
+    links = np.asarray(highways_gdf.geometry.values)
+    circles = np.asarray(charger_circles_gdf.geometry.values)
+
+    # Find all pairs of intersecting links and circles in one go
+    circles_tree = shapely.STRtree(circles)
+    link_indices, circle_indices = circles_tree.query(links, predicate="intersects")
+
+    if length_weighted:
+        # Clip each link to each circle it intersects, and evaluate the fraction of its length inside the circle
+        link_lengths = shapely.length(links[link_indices])
+        clipped_lengths = shapely.length(
+            shapely.intersection(links[link_indices], circles[circle_indices])
+        )
+        weights = np.divide(
+            clipped_lengths,
+            link_lengths,
+            out=np.ones(len(link_indices)),
+            where=link_lengths > 0,
+        )
+    else:
+        weights = np.ones(len(link_indices))
+
+    return scipy.sparse.csr_matrix(
+        (weights, (link_indices, circle_indices)), shape=(len(links), len(circles))
+    )
+
+
+def build_link_charger_network_incidence(
+    highways_gdf, charger_locations_gdf, max_distance
+):
+    """
+    Builds a sparse incidence matrix assigning each highway link to the charger nearest to it by driving distance along the highway network, with a single multi-source shortest path search from all chargers at once
+
+    Parameters
+    ----------
+    highways_gdf (gpd.GeoDataFrame): Geodataframe containing the highway links
+    charger_locations_gdf (gpd.GeoDataFrame): Geodataframe containing the charger locations
+    max_distance (float): Maximum driving distance (in miles) from a charger to the middle of a link for the link to contribute to the charger's energy demand
+
+    Returns
+    -------
+    incidence (scipy.sparse.csr_matrix): Matrix of shape (number of links, number of chargers), which is 1 where a link is assigned to a charger and 0 otherwise. Each link is assigned to at most one charger.
+    """
+    graph, node_coords, start_nodes, end_nodes, link_lengths = build_highway_graph(
+        highways_gdf
     )
 
-    # Drop duplicates to get unique highway links
-    unique_highways = overlapping_links.drop_duplicates(subset="original_index")
+    # Start the search from the nearest highway node to each charger
+    charger_nodes, snap_distances = snap_points_to_nodes(
+        charger_locations_gdf.set_crs("EPSG:4326", allow_override=True), node_coords
+    )
+    print(
+        f"Chargers snapped to the highway network within {snap_distances.max():.2f} miles"
+    )
 
-    # Retrieve only the original highway data that overlaps at least one circle using the preserved index
-    filtered_highways_gdf = texas_highways_gdf.loc[unique_highways["original_index"]]
+    link_chargers, _ = assign_links_to_nearest_source(
+        graph, start_nodes, end_nodes, link_lengths, charger_nodes, max_distance
+    )
 
-    # Count overlaps by original index
-    overlap_count = overlapping_links.groupby("original_index").size()
-    filtered_highways_gdf = filtered_highways_gdf.join(
-        overlap_count.rename("overlap_count"), how="left"
+    assigned = link_chargers >= 0
+    return scipy.sparse.csr_matrix(
+        (
+            np.ones(np.sum(assigned)),
+            (np.flatnonzero(assigned), link_chargers[assigned]),
+        ),
+        shape=(len(highways_gdf), len(charger_locations_gdf)),
     )
 
-    # Scale Tot Tons and Tot Trips based on the count of overlaps
-    filtered_highways_gdf["Tot Tons"] /= filtered_highways_gdf["overlap_count"]
-    filtered_highways_gdf["Tot Trips"] /= filtered_highways_gdf["overlap_count"]
 
-    # Clean up by removing the temporary index column
-    filtered_highways_gdf.drop(columns=["original_index"], inplace=True)
+def get_scaled_highway_links_in_circles(
+    charger_circles_gdf, texas_highways_gdf, length_weighted=False, incidence=None
+):
+    """
+    Filters for highway links overlapping with at least one charger circle, and scales down the freight flows of links overlapping with more than one circle to avoid double counting their contributions to nearby chargers
+
+    Parameters
+    ----------
+    charger_circles_gdf (gpd.GeoDataFrame): Geodataframe containing the circles around each charger
+    texas_highways_gdf (gpd.GeoDataFrame): Geodataframe containing the highway links
+    length_weighted (bool): If True, each link contributes to each circle in proportion to the fraction of its length inside the circle. Otherwise, each link contributes fully to every circle it overlaps with. Only used when the incidence matrix is built here, so it has no effect if incidence is provided (e.g. for network catchments).
+    incidence (scipy.sparse.csr_matrix): Link x circle incidence matrix, as produced by build_link_charger_incidence() or build_link_charger_network_incidence(). Built here if not provided.
+
+    Returns
+    -------
+    filtered_highways_gdf (gpd.GeoDataFrame): Highway links overlapping with at least one circle, with Tot Tons and Tot Trips divided by the total overlap with circles (overlap_count column) where this exceeds 1
+    filtered_incidence (scipy.sparse.csr_matrix): Rows of the incidence matrix for the filtered highway links
+    """
+    if incidence is None:
+        incidence = build_link_charger_incidence(
+            texas_highways_gdf, charger_circles_gdf, length_weighted
+        )
 
-    return filtered_highways_gdf
+    # Total overlap of each link with circles (i.e. the number of overlapping circles, if not length weighted)
+    overlap_count = np.asarray(incidence.sum(axis=1)).ravel()
+
+    # Retrieve only the highway links that overlap at least one circle
+    overlapping = incidence.getnnz(axis=1) > 0
+    filtered_highways_gdf = texas_highways_gdf[overlapping].copy()
+    filtered_incidence = incidence[overlapping]
+    filtered_highways_gdf["overlap_count"] = overlap_count[overlapping]
+
+    # Scale Tot Tons and Tot Trips based on the overlap with circles
+    flow_scale = 1.0 / np.maximum(overlap_count[overlapping], 1.0)
+    filtered_highways_gdf["Tot Tons"] *= flow_scale
+    filtered_highways_gdf["Tot Trips"] *= flow_scale
+
+    return filtered_highways_gdf, filtered_incidence
 
 
 def evaluate_average_payload(highway_data_gdf):
@@ -292,7 +396,7 @@ def evaluate_annual_e_demand_link(top_dir, highway_data_gdf, charging_efficiency
 
 
 def evaluate_annual_e_demand_charger(
-    filtered_highways_gdf, charger_circles_gdf, charger_locations_gdf
+    filtered_highways_gdf, charger_circles_gdf, charger_locations_gdf, incidence=None
 ):
     """
     Aggregates the annual energy demand for all highway links in the circle around each charger to evaluate the total annual energy demand on the charger if all highway links within its circle get electrified
@@ -302,31 +406,35 @@ def evaluate_annual_e_demand_charger(
     filtered_highways_gdf (GeoPandas DataFrame): Pandas geodataframe containing the info for each link falling within the circle of at least one charger
     charger_circles_gdf (GeoPandas DataFrame): Pandas geodataframe containing the circles around each charger
     charger_locations_gdf (GeoPandas DataFrame): Pandas geodataframe containing the charger locations
+    incidence (scipy.sparse.csr_matrix): Incidence matrix between the filtered links and the circles, as returned by get_scaled_highway_links_in_circles(). Built here if not provided.
 
     Returns
     -------
     highway_data_gdf (Pandas DataFrame): Pandas dataframe read in, with an additional column containing the annual energy demand
     """
+    if incidence is None:
+        incidence = build_link_charger_incidence(
+            filtered_highways_gdf, charger_circles_gdf
+        )
 
-    # Join highways to circles based on geometry, thereby linking highways to nearest centers
-    joined_gdf = gpd.sjoin(
-        filtered_highways_gdf, charger_circles_gdf, how="left", predicate="intersects"
-    )
+    # Sum up 'An E Dem' over the links overlapping each circle
+    circle_e_dem = incidence.T @ filtered_highways_gdf["An E Dem"].to_numpy(dtype=float)
 
     # Sum up 'An E Dem' for each 'Nearest Center'
     aggregated_data = (
-        joined_gdf.groupby("Nearest Center")["An E Dem"].sum().reset_index()
+        pd.Series(circle_e_dem, name="An E Dem")
+        .groupby(charger_circles_gdf["Nearest Center"].to_numpy())
+        .sum()
+        .rename_axis("Nearest Center")
+        .reset_index()
     )
 
     # Add the summed 'An E Dem' values to the respective charger locations
-    print(charger_locations_gdf.columns)
-    print(aggregated_data.columns)
     charger_locations_gdf = charger_locations_gdf.merge(
         aggregated_data, on="Nearest Center", how="left"
     )
 
     # Fill any NaNs with 0 if any location did not have any overlapping highways
-    print(charger_locations_gdf.columns)
     charger_locations_gdf["An E Dem"] = charger_locations_gdf["An E Dem"].fillna(0)
 
     # Also evaluate average power demand over the year
@@ -337,63 +445,92 @@ def evaluate_annual_e_demand_charger(
     return charger_locations_gdf
 
 
-def visualize_ercot_zones(top_dir, ercot_boundary_gdf, texas_highways_gdf):
-    # Set up the plot
-    fig, ax = plt.subplots(figsize=(10, 10))
+def get_highway_line_widths(highways_gdf, max_tons, min_width=0.5, max_width=10):
+    """
+    Scales the line width of each highway link with its total annual freight flow
 
-    # Plot texas_highways_gdf first, with texas_boundary_gdf above it, and charger_locations_gdf on top
-    min_width = 0.5
-    max_width = 10
+    Parameters
+    ----------
+    highways_gdf (gpd.GeoDataFrame): Geodataframe containing the highway links
+    max_tons (float): Freight flow (tons) drawn at the maximum line width
+    min_width (float): Line width of links with no freight flow
+    max_width (float): Line width of links with the maximum freight flow
 
-    texas_highways_gdf["line_width"] = (
-        texas_highways_gdf["Tot Tons"]
-        / texas_highways_gdf["Tot Tons"].max()
+    Returns
+    -------
+    line_widths (np.array): Line width of each link
+    """
+    return (
+        highways_gdf["Tot Tons"].to_numpy(dtype=float)
+        / max_tons
         * (max_width - min_width)
         + min_width
     )
-    texas_highways_gdf.plot(
-        ax=ax,
+
+
+def draw_ercot_zones(ax, ercot_boundary_gdf, highlight_zone=None):
+    """
+    Draws the ERCOT weather zones with a different color for each zone, labelled at the centroid of each zone polygon
+
+    Parameters
+    ----------
+    ax (matplotlib.axes.Axes): Axes to draw on
+    ercot_boundary_gdf (gpd.GeoDataFrame): Geodataframe containing the boundaries of the ERCOT weather zones
+    highlight_zone (string): If given, this zone is drawn in red
+
+    Returns
+    -------
+    None
+    """
+    # Create a unique color for each zone using a colormap
+    zones = np.sort(ercot_boundary_gdf["zone"].unique())
+    cmap = plt.get_cmap("tab20c", len(zones))
+    zone_colors = {zone: cmap(idx) for idx, zone in enumerate(zones)}
+    if highlight_zone is not None:
+        zone_colors[highlight_zone] = mcolors.to_rgba("red")
+
+    draw_polygons(
+        ax,
+        ercot_boundary_gdf,
+        facecolor=[zone_colors[zone] for zone in ercot_boundary_gdf["zone"]],
+        edgecolor="black",
+        linewidth=1,
+        zorder=1,
+        layer_name="ercot_zones",
+    )
+
+    # Add labels at the centroid of each polygon
+    label_polygons(
+        ax,
+        ercot_boundary_gdf,
+        ercot_boundary_gdf["zone"].str.upper().str.replace("_", " "),
+        fontsize=16,
+        fontweight="bold",
+        ha="center",
+        va="center",
+    )
+
+
+def visualize_ercot_zones(top_dir, ercot_boundary_gdf, texas_highways_gdf):
+    # Set up the plot
+    fig, ax = plt.subplots(figsize=(10, 10))
+
+    # Plot texas_highways_gdf first, with the ERCOT zones below it
+    draw_lines(
+        ax,
+        texas_highways_gdf,
         color="black",
-        linewidth=texas_highways_gdf["line_width"],
+        linewidth=get_highway_line_widths(
+            texas_highways_gdf, texas_highways_gdf["Tot Tons"].max()
+        ),
         label="Highways",
         zorder=2,
         alpha=0.3,
+        layer_name="texas_highways",
     )  # Highways
 
-    # Create a unique color for each zone using a colormap
-    num_zones = len(ercot_boundary_gdf["zone"].unique())
-    cmap = plt.cm.get_cmap(
-        "tab20c", num_zones
-    )  # You can change 'viridis' to any other colormap
-
     # Plot each zone with a different color and add a label
-    for idx, (zone, group) in enumerate(ercot_boundary_gdf.groupby("zone")):
-        color = cmap(idx)
-        if zone == "coast":
-            color = "red"
-        group.plot(
-            ax=ax,
-            color=color,
-            edgecolor="black",
-            alpha=1,
-            linewidth=1,
-            label=zone,
-            zorder=1,
-        )
-
-        # Add labels at the centroid of each polygon
-        for _, row in group.iterrows():
-            # Calculate the centroid of each polygon
-            centroid = row.geometry.centroid
-            ax.text(
-                centroid.x,
-                centroid.y,
-                zone.upper().replace("_", " "),
-                fontsize=16,
-                fontweight="bold",
-                ha="center",
-                va="center",
-            )
+    draw_ercot_zones(ax, ercot_boundary_gdf, highlight_zone="coast")
 
     # Remove x and y axis ticks
     ax.set_xticks([])
@@ -405,6 +542,7 @@ def visualize_ercot_zones(top_dir, ercot_boundary_gdf, texas_highways_gdf):
     # Show the plot
     plt.savefig(f"{top_dir}/plots/ERCOT_Weather_Zones.png")
     plt.savefig(f"{top_dir}/plots/ERCOT_Weather_Zones.pdf")
+    plt.close(fig)
 
 
 def visualize_chargers(
@@ -419,97 +557,57 @@ def visualize_chargers(
     fig, ax = plt.subplots(figsize=(10, 10))
 
     # Plot texas_highways_gdf first, with texas_boundary_gdf above it, and charger_locations_gdf on top
-    min_width = 0.5
-    max_width = 10
     min_size = 10
     max_size = 150
     min_Av_P_Dem = charger_locations_gdf["Av P Dem"].min()
     max_Av_P_Dem = charger_locations_gdf["Av P Dem"].max()
+    max_tons = texas_highways_gdf["Tot Tons"].max()
 
-    texas_highways_gdf["line_width"] = (
-        texas_highways_gdf["Tot Tons"]
-        / texas_highways_gdf["Tot Tons"].max()
-        * (max_width - min_width)
-        + min_width
-    )
     size_scale = max_size / (max_Av_P_Dem - min_Av_P_Dem)
-    charger_locations_gdf["scaled_size"] = (
+    scaled_sizes = (
         min_size + (charger_locations_gdf["Av P Dem"] - min_Av_P_Dem) * size_scale
     )
 
-    texas_highways_gdf.plot(
-        ax=ax,
+    draw_lines(
+        ax,
+        texas_highways_gdf,
         color="black",
-        linewidth=texas_highways_gdf["line_width"],
+        linewidth=get_highway_line_widths(texas_highways_gdf, max_tons),
         label="Highways",
         zorder=2,
         alpha=0.3,
+        layer_name="texas_highways",
     )  # Highways
     if filtered_highways_gdf is not None:
-        filtered_highways_gdf["line_width"] = (
-            filtered_highways_gdf["Tot Tons"]
-            / texas_highways_gdf["Tot Tons"].max()
-            * (max_width - min_width)
-            + min_width
-        )
-        filtered_highways_gdf.plot(
-            ax=ax,
+        draw_lines(
+            ax,
+            filtered_highways_gdf,
             color="red",
-            linewidth=filtered_highways_gdf["line_width"],
+            linewidth=get_highway_line_widths(filtered_highways_gdf, max_tons),
             label="Highways",
             zorder=3,
         )  # Highways overlapping with circles
-    charger_locations_gdf.plot(
-        ax=ax,
+    draw_points(
+        ax,
+        charger_locations_gdf,
         marker="o",
         color="red",
-        markersize=charger_locations_gdf["scaled_size"],
+        markersize=scaled_sizes,
         label="Average Power Demand",
         zorder=4,
     )  # Chargers
-    charger_circles_gdf.plot(
-        ax=ax,
-        color="none",
+    draw_polygons(
+        ax,
+        charger_circles_gdf,
+        facecolor=mcolors.to_rgba("red", 0.15),
         edgecolor="red",
         linewidth=0.6,
-        alpha=1,
         label="Charger Coverage",
         zorder=5,
     )
-    charger_circles_gdf.plot(ax=ax, color="red", edgecolor="none", alpha=0.15, zorder=5)
-
-    # Create a unique color for each zone using a colormap
-    num_zones = len(ercot_boundary_gdf["zone"].unique())
-    cmap = plt.cm.get_cmap(
-        "tab20c", num_zones
-    )  # You can change 'viridis' to any other colormap
 
     # Plot each zone with a different color and add a label
-    for idx, (zone, group) in enumerate(ercot_boundary_gdf.groupby("zone")):
-        color = cmap(idx)
-        group.plot(
-            ax=ax,
-            color=color,
-            edgecolor="black",
-            alpha=1,
-            linewidth=1,
-            label=zone,
-            zorder=1,
-        )
-
-        # Add labels at the centroid of each polygon
-        for _, row in group.iterrows():
-            # Calculate the centroid of each polygon
-            centroid = row.geometry.centroid
-            ax.text(
-                centroid.x,
-                centroid.y,
-                zone.upper().replace("_", " "),
-                fontsize=16,
-                fontweight="bold",
-                ha="center",
-                va="center",
-            )
+    draw_ercot_zones(ax, ercot_boundary_gdf)
 
     # Add labels and title
     # ax.set_title('Map of Texas with Charger Locations', fontsize=24)
@@ -553,6 +651,7 @@ def visualize_chargers(
     # Show the plot
     plt.savefig(f"{top_dir}/plots/Texas_charger_locations.png")
     plt.savefig(f"{top_dir}/plots/Texas_charger_locations.pdf")
+    plt.close(fig)
 
 
 def assign_zones(charger_gdf, boundary_gdf):
@@ -588,7 +687,34 @@ def assign_zones(charger_gdf, boundary_gdf):
     return merged_gdf
 
 
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "-r",
+    "--radius",
+    default="100",
+    type=float,
+    help="Radius of the circle around each charger containing the highway links that contribute to its energy demand (miles)",
+)
+parser.add_argument(
+    "-c",
+    "--catchment",
+    default="circle",
+    choices=["circle", "network"],
+    help="How highway links are assigned to chargers: to every charger within the radius in a straight line (circle), or to the nearest charger by driving distance along the highway network, up to the radius (network)",
+)
+parser.add_argument(
+    "-l",
+    "--length_weighted",
+    action="store_true",
+    help="Weight the contribution of each highway link to each charger by the fraction of its length inside the charger's circle. Only applies to circle catchments, so it can't be combined with -c network.",
+)
+
+
 def main():
+    args = parser.parse_args()
+    if args.length_weighted and args.catchment != "circle":
+        parser.error("-l/--length_weighted only applies to circle catchments")
+
     # Get the path to the top level of the Git repo
     top_dir = get_top_dir()
 
@@ -629,11 +755,23 @@ def main():
     visualize_ercot_zones(top_dir, ercot_boundaries_gdf, texas_highways_gdf)
 
     # Evaluate circles around each charger of the given radius to contain highway links contributing to the charger's annual energy demand
-    charger_circles_gdf = make_charger_circles(charger_locations_gdf, radius=100)
+    charger_circles_gdf = make_charger_circles(
+        charger_locations_gdf, radius=args.radius
+    )
+
+    # For network catchments, assign each highway link to its nearest charger by driving distance, which partitions the links between chargers
+    incidence = None
+    if args.catchment == "network":
+        incidence = build_link_charger_network_incidence(
+            texas_highways_gdf, charger_locations_gdf, max_distance=args.radius
+        )
 
     # Filter the highways to consider only those overlapping with at least one circle. For links with more than one overlapping circle, the freight flow rate is scaled down by the number of overlapping circles to avoid double counting contributions of their associated energy demand to nearby chargers.
-    filtered_highways_gdf = get_scaled_highway_links_in_circles(
-        charger_circles_gdf, texas_highways_gdf
+    filtered_highways_gdf, filtered_incidence = get_scaled_highway_links_in_circles(
+        charger_circles_gdf,
+        texas_highways_gdf,
+        length_weighted=args.length_weighted,
+        incidence=incidence,
     )
 
     # Evaluate the average payload carried per trip for each link
@@ -649,7 +787,10 @@ def main():
 
     # Add up the total annual energy demand associated with fully electrifying highway links in the vicinity of each charger
     charger_locations_gdf = evaluate_annual_e_demand_charger(
-        filtered_highways_gdf, charger_circles_gdf, charger_locations_gdf
+        filtered_highways_gdf,
+        charger_circles_gdf,
+        charger_locations_gdf,
+        incidence=filtered_incidence,
     )
 
     # Plot the state boundary, charger locations and highways together
@@ -666,4 +807,5 @@ def main():
     charger_locations_gdf.to_file(charger_location_geojson_path)
 
 
-main()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The analysis scripts in source/ import each other by module name
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "source"))
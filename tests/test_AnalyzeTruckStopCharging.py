@@ -0,0 +1,47 @@
+import numpy as np
+import geopandas as gpd
+import shapely
+
+from AnalyzeTruckStopCharging import assign_nearest_link_attributes
+
+
+def make_links_gdf():
+    return gpd.GeoDataFrame(
+        {"Name": ["I-10", "I-45"], "Tot Trips": [5.0, 7.0]},
+        geometry=[
+            shapely.LineString([(0, 0), (10, 0)]),
+            shapely.LineString([(0, 5), (10, 5)]),
+        ],
+    )
+
+
+def make_points_gdf():
+    return gpd.GeoDataFrame(
+        geometry=[shapely.Point(1, 1), shapely.Point(2, 4), shapely.Point(50, 50)],
+        index=[10, 11, 12],
+    )
+
+
+def test_assign_string_attribute_from_nearest_link():
+    points_gdf = assign_nearest_link_attributes(
+        make_points_gdf(), make_links_gdf(), ["Name", "Tot Trips"], max_distance=3
+    )
+
+    assert points_gdf.loc[10, "Name"] == "I-10"
+    assert points_gdf.loc[11, "Name"] == "I-45"
+    assert points_gdf["Name"].isna().tolist() == [False, False, True]
+    assert points_gdf["Name"].dtype == make_links_gdf()["Name"].dtype
+    np.testing.assert_array_equal(points_gdf["Tot Trips"], [5.0, 7.0, np.nan])
+
+
+def test_aggregate_k_nearest_links():
+    points_gdf = assign_nearest_link_attributes(
+        make_points_gdf(),
+        make_links_gdf(),
+        "Tot Trips",
+        max_distance=10,
+        k_nearest=2,
+        aggfunc="sum",
+    )
+
+    np.testing.assert_array_equal(points_gdf["Tot Trips"], [12.0, 12.0, np.nan])